@@ -0,0 +1,5 @@
+"""
+Benchmarks of the matching pipeline on synthetic NSW licence data.
+
+Run ``python -m benchmarks.harness --help`` from the repository root.
+"""
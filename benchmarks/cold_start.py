@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# Repository root, the working directory of the measured interpreters
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each Lambda handler module used to import when it was loaded,
+# before its pipeline imports were deferred to the first invocation
+EAGER_IMPORTS = {
+    'lambda_function': [
+        'pandas', 'config', 'filter_functions', 'history',
+        'lambda_match_cer_inv', 'match_cer_inv', 'result_io', 'schemas',
+        's3_upload', 'streaming', 'reinsw_index',
+    ],
+    'lambda_match_cer_inv': [
+        'pandas', 'config', 'result_io', 's3_upload',
+    ],
+}
+
+# Heaviest imports listed per measurement
+TOP_IMPORTS = 10
+
+# Times the statement in the interpreter it runs in
+TIMED_STATEMENT = """\
+import time
+start = time.perf_counter()
+{imports}
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parses the output of `python -X importtime`.
+
+    Returns
+    -------
+    list
+        (module, self microseconds, cumulative microseconds) tuples, in
+        import order.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((module.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure_imports(modules, runs=5):
+    """
+    Imports modules in fresh interpreters, as a Lambda cold start does.
+
+    Parameters
+    ----------
+    modules : list
+        The modules to import, in order.
+    runs : int
+        The interpreters to start.
+
+    Returns
+    -------
+    dict
+        The median and every import time in seconds, and the heaviest
+        imports of the last run by self time.
+    """
+    statement = TIMED_STATEMENT.format(
+        imports='\n'.join(f"import {module}" for module in modules))
+
+    seconds = []
+    imports = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            cwd=ROOT_DIRECTORY, capture_output=True, text=True, check=True)
+        seconds.append(float(completed.stdout.strip().splitlines()[-1]))
+        imports = parse_importtime(completed.stderr)
+
+    heaviest = sorted(imports, key=lambda entry: entry[1], reverse=True)
+    return {
+        'modules': modules,
+        'median_seconds': statistics.median(seconds),
+        'seconds': seconds,
+        'imported_modules': len(imports),
+        'heaviest_imports': [
+            {'module': module, 'self_us': self_us,
+             'cumulative_us': cumulative_us}
+            for module, self_us, cumulative_us in heaviest[:TOP_IMPORTS]],
+    }
+
+
+def run_cold_start(handlers=tuple(EAGER_IMPORTS), runs=5):
+    """
+    Measures the cold-start import time of every Lambda handler module as
+    it is ('deferred') and with the imports it used to load eagerly
+    ('eager').
+
+    Returns
+    -------
+    dict
+        Handler module names to their 'deferred' and 'eager' measurements
+        and the time the deferred imports save.
+    """
+    results = {}
+    for handler in handlers:
+        deferred = measure_imports([handler], runs)
+        eager = measure_imports(EAGER_IMPORTS[handler] + [handler], runs)
+        results[handler] = {
+            'deferred': deferred,
+            'eager': eager,
+            'saved_seconds': eager['median_seconds']
+            - deferred['median_seconds'],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure the cold-start import time of the Lambda '
+                    'handler modules.')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='fresh interpreters per measurement')
+    parser.add_argument('--output', default='cold_start_results.json',
+                        help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    results = run_cold_start(runs=args.runs)
+    for handler, result in results.items():
+        print(f"{handler:<24} deferred "
+              f"{result['deferred']['median_seconds'] * 1000:>8.1f} ms   "
+              f"eager {result['eager']['median_seconds'] * 1000:>8.1f} ms")
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': args.runs,
+            'handlers': results,
+        }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
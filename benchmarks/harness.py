@@ -0,0 +1,235 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import filter_functions
+import main as _main
+import reinsw_index_file
+from benchmarks import synthetic
+from reinsw_index import ReinswIndex
+
+# Rows fed to the scalar parse_addresses and extract_first_last_name,
+# which would take minutes on millions of rows
+SCALAR_ROWS = 20_000
+
+
+def build_reinsw_index(reinsw_df):
+    """
+    Builds the ReinswIndex of the REINSW report with the key table of
+    every merge tier, as the merges of a run build them.
+    """
+    reinsw_index = ReinswIndex(reinsw_df)
+    for merging_on_list, drop_duplicates in reinsw_index_file.tier_key_tables():
+        reinsw_index.key_table(merging_on_list, drop_duplicates)
+    return reinsw_index
+
+
+def measure(name, rows, func, *args, repeat=3):
+    """
+    Times a call and measures its peak memory.
+
+    The call is timed `repeat` times and the fastest run is kept. It is
+    then run once more under tracemalloc for its peak memory, which counts
+    the memory allocated through Python and NumPy but not by Arrow.
+
+    Parameters
+    ----------
+    name : str
+        The name the result is stored under.
+    rows : int
+        The input rows the call processes, for the throughput.
+    func : callable
+        The function to call with `args`.
+    repeat : int
+        How many timed runs to make.
+
+    Returns
+    -------
+    dict
+        'name', 'rows', 'seconds', 'rows_per_second' and
+        'peak_memory_bytes' of the call.
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else None,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def run_main(directory):
+    """
+    Runs the full main() pipeline on the input files under `directory`.
+    """
+    working_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        _main.main()
+    finally:
+        os.chdir(working_directory)
+
+
+def benchmark_functions(dataset, repeat=3, scalar_rows=SCALAR_ROWS):
+    """
+    Times the parsing, merging and column merging functions of
+    filter_functions on a generated dataset.
+
+    Returns
+    -------
+    list
+        One measure() result per function.
+    """
+    certificate_df = dataset['certificate']
+    scalar_df = certificate_df.head(scalar_rows)
+    addresses = scalar_df['Address'].tolist()
+    licensees = scalar_df['Licensee'].tolist()
+
+    results = [
+        measure('parse_addresses', len(addresses),
+                filter_functions.parse_addresses, addresses, repeat=repeat),
+        measure('extract_first_last_name', len(licensees),
+                lambda: [filter_functions.extract_first_last_name(licensee)
+                         for licensee in licensees],
+                repeat=repeat),
+        measure('parse_address_columns', len(certificate_df),
+                filter_functions.parse_address_columns,
+                certificate_df['Address'], repeat=repeat),
+        measure('extract_first_last_names', len(certificate_df),
+                filter_functions.extract_first_last_names,
+                certificate_df['Licensee'], repeat=repeat),
+    ]
+
+    # The merges run on the prepared dataframes, as in main()
+    fairtrade_df = filter_functions.preprocess_lname_fname_address_rename_column_df(
+        certificate_df.copy())
+    fairtrade_df, reinsw_df = filter_functions.normalize_join_keys(
+        fairtrade_df, dataset['reinsw'])
+    rows = len(fairtrade_df) + len(reinsw_df)
+
+    # The index is measured with its key tables, so the merges below only
+    # probe them
+    results.append(measure('ReinswIndex', len(reinsw_df), build_reinsw_index,
+                           reinsw_df, repeat=repeat))
+    reinsw_index = build_reinsw_index(reinsw_df)
+
+    merged_df = None
+    for merge_func in filter_functions.merge_keys:
+        results.append(measure(merge_func.__name__, rows, merge_func,
+                               fairtrade_df, reinsw_index, repeat=repeat))
+        if merge_func is filter_functions.merge_on_licencee_fname_lname_address:
+            merged_df = merge_func(fairtrade_df, reinsw_index)
+
+    results.append(measure('merge_columns_and_drop', len(merged_df),
+                           filter_functions.merge_columns_and_drop, merged_df,
+                           filter_functions.merge_columns_dict,
+                           repeat=repeat))
+    return results
+
+
+def run_benchmarks(rows, seed=0, repeat=3, scalar_rows=SCALAR_ROWS,
+                   pipeline=True):
+    """
+    Generates a synthetic dataset and benchmarks it.
+
+    Parameters
+    ----------
+    rows : int
+        Rows of the generated certificate register (see
+        synthetic.generate_dataset).
+    seed : int
+        Seed of the generated dataset.
+    repeat : int
+        Timed runs of every function.
+    scalar_rows : int
+        Rows fed to the scalar functions.
+    pipeline : bool
+        Also time the full main() pipeline, once.
+
+    Returns
+    -------
+    dict
+        The dataset sizes and the list of measure() results.
+    """
+    dataset = synthetic.generate_dataset(rows, seed)
+    results = benchmark_functions(dataset, repeat, scalar_rows)
+
+    if pipeline:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic.write_dataset(dataset, directory)
+            input_rows = sum(len(dataframe) for dataframe in dataset.values())
+            results.append(measure('main', input_rows, run_main, directory,
+                                   repeat=1))
+
+    return {
+        'rows': rows,
+        'seed': seed,
+        'dataset_rows': {name: len(dataframe)
+                         for name, dataframe in dataset.items()},
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the matching pipeline on synthetic NSW '
+                    'licence data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000],
+                        help='certificate register sizes to benchmark, '
+                             'e.g. 10000 100000 1000000 5000000')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs of every function')
+    parser.add_argument('--scalar-rows', type=int, default=SCALAR_ROWS,
+                        help='rows fed to the scalar functions')
+    parser.add_argument('--no-pipeline', action='store_true',
+                        help='skip the full main() pipeline')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'runs': [],
+    }
+    for rows in args.rows:
+        run = run_benchmarks(rows, args.seed, args.repeat, args.scalar_rows,
+                             pipeline=not args.no_pipeline)
+        report['runs'].append(run)
+        for result in run['results']:
+            print(f"{rows:>9} {result['name']:<55} "
+                  f"{result['seconds']:>9.3f}s "
+                  f"{result['peak_memory_bytes'] / 2 ** 20:>9.1f} MiB")
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import config as _config
+import schemas
+
+# Sizes of the individual register and the REINSW report, relative to the
+# certificate register
+INDIVIDUAL_RATIO = 0.5
+REINSW_RATIO = 0.75
+
+# Fair Trading rows of a person who is also in the REINSW report
+MATCH_RATE = 0.7
+
+# Rows repeating a person already drawn, e.g. a licence listed at several
+# addresses or a REINSW member of several companies
+DUPLICATE_RATE = 0.1
+
+# Fair Trading rows without an address, and REINSW rows without a suburb,
+# state and postcode, as in the real files
+FAIR_TRADING_MISSING_ADDRESS_RATE = 0.1
+REINSW_MISSING_ADDRESS_RATE = 0.44
+
+# REINSW rows without a licence number (written as floats, e.g. 998454.0)
+REINSW_MISSING_LICENCE_RATE = 0.4
+
+# REINSW rows whose licensee is filled in, besides the first and last name
+REINSW_LICENSEE_RATE = 0.12
+
+# Licensees written with a preferred name, e.g. '(Ricky) Lac Long Tran'
+PREFERRED_NAME_RATE = 0.02
+
+# REINSW suburbs written in mixed case, e.g. 'Rhodes' for 'RHODES'
+MIXED_CASE_SUBURB_RATE = 0.45
+
+# REINSW postcodes that are not Australian, e.g. 'V6E0C3'
+FOREIGN_POSTCODE_RATE = 0.001
+
+FIRST_NAMES = [
+    'Aaron', 'Alice', 'Amelia', 'Andrew', 'Ann-Maree', 'Ava', 'Ben', 'Chloe',
+    'Chris', 'Daniel', 'David', 'Emily', 'Emma', 'Ethan', 'Grace', 'Hannah',
+    'Isla', 'Jack', 'James', 'Jessica', 'John', 'Joshua', 'Kate', 'Kevin',
+    'Lachlan', 'Lac', 'Liam', 'Lily', 'Lucas', 'Mary', 'Matthew', 'Mia',
+    'Michael', 'Nannan', 'Noah', 'Olivia', 'Oliver', 'Peter', 'Rachel',
+    'Robert', 'Ruby', 'Ryan', 'Samuel', 'Sarah', 'Sophie', 'Thomas',
+    'Tzu-Hsuan', 'William', 'Wei', 'Zoe',
+]
+
+PREFERRED_NAMES = ['Ricky', 'Bill', 'Kate', 'Max', 'Sam', 'Tom']
+
+# Last names are built from two or three of these, e.g. 'Marwood'
+LAST_NAME_SYLLABLES = [
+    'ab', 'al', 'an', 'ar', 'bel', 'ber', 'bro', 'car', 'chen', 'dal', 'den',
+    'dor', 'el', 'far', 'ford', 'gar', 'hal', 'har', 'hill', 'ing', 'jin',
+    'ken', 'lan', 'ley', 'mar', 'mor', 'nel', 'ney', 'or', 'pen', 'ric',
+    'ros', 'sel', 'son', 'ston', 'tan', 'ton', 'tran', 'vin', 'wood',
+]
+
+# Localities of the addresses: LOCALITIES, then ones with generated
+# suburb names, about as many as there are NSW postcodes
+LOCALITY_COUNT = 600
+
+# (suburb, state, postcode) of real localities
+LOCALITIES = [
+    ('BANKSTOWN', 'NSW', 2200), ('BONDI', 'NSW', 2026),
+    ('CHATSWOOD', 'NSW', 2067), ('EPPING', 'NSW', 2121),
+    ('HORNSBY', 'NSW', 2077), ('LIVERPOOL', 'NSW', 2170),
+    ('MANLY', 'NSW', 2095), ('MASCOT', 'NSW', 2020),
+    ('NEUTRAL BAY', 'NSW', 2089), ('NEWCASTLE', 'NSW', 2300),
+    ('NORTH SYDNEY', 'NSW', 2060), ('PARRAMATTA', 'NSW', 2150),
+    ('PENRITH', 'NSW', 2750), ('RHODES', 'NSW', 2138),
+    ('RYDE', 'NSW', 2112), ('SYDNEY', 'NSW', 2000),
+    ('TUMBARUMBA', 'NSW', 2653), ('WOLLONGONG', 'NSW', 2500),
+    ('ARMIDALE', 'NSW', 2350), ('ALBURY', 'NSW', 2640),
+    ('BELCONNEN', 'ACT', 2617), ('CANBERRA', 'ACT', 2600),
+    ('TWEED HEADS', 'NSW', 2485), ('COOLANGATTA', 'QLD', 4225),
+    ('WODONGA', 'VIC', 3690),
+]
+
+SUBURB_SUFFIXES = ['', '', '', ' HEIGHTS', ' PARK', ' WEST', ' VALE']
+
+STREETS = ['Chapel Rd', 'Oxford St', 'George St', 'Pacific Hwy',
+           'Victoria Rd', 'King St', 'Church St', 'Station St']
+
+COMPANIES = ['Ray White', 'LJ Hooker', 'McGrath', 'Belle Property',
+             'Raine & Horne', 'Harcourts', 'PRD', 'First National']
+
+LICENCE_TYPES = ['Property - Certificate', 'Property - Individual']
+
+LICENCE_STATUSES = ['Not Verified', 'Expired', 'Current', 'Surrendered']
+
+
+def _last_names(rng, size):
+    """
+    Returns `size` last names of two or three syllables, one in twenty
+    hyphenated, e.g. 'Townley-Jones'.
+    """
+    syllables = np.array(LAST_NAME_SYLLABLES, dtype=object)
+    names = syllables[rng.integers(len(syllables), size=size)] \
+        + syllables[rng.integers(len(syllables), size=size)]
+    three = rng.random(size) < 0.5
+    names[three] += syllables[rng.integers(len(syllables), size=three.sum())]
+    names = pd.Series(names, dtype=object).str.capitalize()
+
+    hyphenated = rng.random(size) < 0.05
+    other_names = pd.Series(
+        syllables[rng.integers(len(syllables), size=size)]
+        + syllables[rng.integers(len(syllables), size=size)],
+        dtype=object).str.capitalize()
+    return names.where(~hyphenated, names + '-' + other_names)
+
+
+def _format_dates(start, offsets, unit, date_format):
+    """
+    Formats `start` plus every offset, formatting each distinct offset once.
+    """
+    codes, uniques = pd.factorize(offsets)
+    dates = (pd.Timestamp(start) + pd.to_timedelta(uniques, unit=unit)) \
+        .strftime(date_format)
+    return pd.Series(np.asarray(dates, dtype=object)[codes])
+
+
+def generate_localities(rng, size=LOCALITY_COUNT):
+    """
+    Returns `size` (suburb, state, postcode) localities: LOCALITIES, then
+    generated NSW suburbs such as 'MARWOOD PARK' with postcodes between
+    2000 and 2999.
+
+    Returns
+    -------
+    pandas.DataFrame
+        'suburb', 'state' and 'post_code' columns.
+    """
+    localities = pd.DataFrame(LOCALITIES,
+                              columns=['suburb', 'state', 'post_code'])
+    generated = max(0, size - len(localities))
+
+    syllables = np.array(LAST_NAME_SYLLABLES, dtype=object)
+    suffixes = np.array(SUBURB_SUFFIXES, dtype=object)
+    suburbs = pd.Series(
+        syllables[rng.integers(len(syllables), size=generated)]
+        + syllables[rng.integers(len(syllables), size=generated)]
+        + suffixes[rng.integers(len(suffixes), size=generated)],
+        dtype=object).str.upper()
+
+    return pd.concat([localities, pd.DataFrame({
+        'suburb': suburbs,
+        'state': 'NSW',
+        'post_code': rng.integers(2000, 3000, size=generated),
+    })], ignore_index=True).head(size)
+
+
+def generate_people(rng, size, localities):
+    """
+    Generates `size` distinct licence holders, living in `localities`
+    (see generate_localities).
+
+    Returns
+    -------
+    pandas.DataFrame
+        'first_name', 'last_name', 'licensee', 'street', 'suburb', 'state',
+        'post_code' and 'license_number' columns, one row per person.
+    """
+    first_names = pd.Series(
+        np.array(FIRST_NAMES, dtype=object)[
+            rng.integers(len(FIRST_NAMES), size=size)], dtype=object)
+    last_names = _last_names(rng, size)
+
+    licensees = first_names + ' ' + last_names
+    preferred = rng.random(size) < PREFERRED_NAME_RATE
+    preferred_names = np.array(PREFERRED_NAMES, dtype=object)[
+        rng.integers(len(PREFERRED_NAMES), size=size)]
+    licensees = licensees.where(
+        ~preferred, '(' + preferred_names + ') ' + licensees)
+
+    localities = localities.take(
+        rng.integers(len(localities), size=size)).reset_index(drop=True)
+
+    streets = pd.Series(rng.integers(1, 400, size=size)).astype(str) + ' ' \
+        + pd.Series(np.array(STREETS, dtype=object)[
+            rng.integers(len(STREETS), size=size)], dtype=object)
+
+    # Distinct licence numbers between 1,000,000 and 30,000,000 or beyond
+    span = max(29_000_000, 2 * size)
+    license_numbers = 1_000_000 + rng.choice(span, size=size, replace=False)
+
+    return pd.DataFrame({
+        'first_name': first_names,
+        'last_name': last_names,
+        'licensee': licensees,
+        'street': streets,
+        'suburb': localities['suburb'],
+        'state': localities['state'],
+        'post_code': localities['post_code'],
+        'license_number': license_numbers,
+    })
+
+
+def _draw(rng, people, size, duplicate_rate=DUPLICATE_RATE):
+    """
+    Draws `size` rows of people, a `duplicate_rate` share of them repeating
+    a person already drawn.
+    """
+    positions = rng.permutation(len(people))[:size]
+    if len(positions) < size:
+        positions = rng.integers(len(people), size=size)
+
+    repeated = rng.random(size) < duplicate_rate
+    positions[repeated] = positions[
+        rng.integers(max(1, size), size=repeated.sum())]
+    return people.take(positions).reset_index(drop=True)
+
+
+def generate_fair_trading(rng, people, reinsw_people, size):
+    """
+    Generates a Fair Trading register of `size` rows.
+
+    A MATCH_RATE share of the rows are people of the REINSW report, the
+    others are not in it. Addresses read like '366 Chapel Rd, BANKSTOWN,
+    NSW 2200'; FAIR_TRADING_MISSING_ADDRESS_RATE of them are missing.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The register, with the columns of schemas.FAIR_TRADING_SCHEMA.
+    """
+    matched = rng.random(size) < MATCH_RATE
+    rows = _draw(rng, people, size)
+    rows.loc[matched] = _draw(rng, reinsw_people, matched.sum()).to_numpy()
+
+    addresses = (rows['street'] + ', ' + rows['suburb'] + ', '
+                 + rows['state'] + ' ' + rows['post_code'].astype(str))
+    missing_address = rng.random(size) < FAIR_TRADING_MISSING_ADDRESS_RATE
+
+    issue_days = rng.integers(0, 8000, size=size)
+    expiry_days = issue_days + rng.integers(365, 3650, size=size)
+
+    return pd.DataFrame({
+        'Licence Number': rows['license_number'].astype('int64'),
+        'Issue Date': _format_dates('2000-01-01', issue_days, 'D', '%d-%b-%Y'),
+        'Expiry Date': _format_dates('2000-01-01', expiry_days, 'D',
+                                     '%d-%b-%Y'),
+        'Licensee': rows['licensee'],
+        'Address Type': 'Business',
+        'Address': addresses.where(~missing_address),
+        'Birth Year': pd.Series(
+            rng.integers(1940, 2005, size=size)).where(
+                rng.random(size) < 0.5).astype('Int64'),
+        'ACN': None,
+        'ABN': None,
+        'Classes': 'Real Estate - Sales or Leasing',
+    })
+
+
+def generate_reinsw(rng, reinsw_people, size):
+    """
+    Generates a REINSW report of `size` rows, with the quirks of the real
+    report: licence numbers and postcodes written as floats, missing
+    licence numbers and addresses, mixed-case suburbs, a few foreign
+    postcodes, and a licensee only filled in for some rows.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The report, with the columns of config.CSV_HEADER plus the company,
+        iMIS id, 'new' and 'is_change' columns.
+    """
+    rows = _draw(rng, reinsw_people, size)
+
+    license_numbers = rows['license_number'].astype(float).where(
+        rng.random(size) >= REINSW_MISSING_LICENCE_RATE)
+
+    missing_address = rng.random(size) < REINSW_MISSING_ADDRESS_RATE
+    suburbs = rows['suburb'].where(
+        rng.random(size) >= MIXED_CASE_SUBURB_RATE, rows['suburb'].str.title())
+    post_codes = rows['post_code'].astype(float).astype(object).where(
+        rng.random(size) >= FOREIGN_POSTCODE_RATE, 'V6E0C3')
+
+    has_licence = license_numbers.notna()
+    row_ids = pd.Series(np.arange(size)).astype(str)
+    licence_numbers_text = license_numbers.map(
+        lambda number: f"{int(number)}", na_action='ignore')
+    history = ('[{licenceID: 1475-' + row_ids
+               + ', licenceNumber: ' + licence_numbers_text + '}]')
+
+    updated_at = _format_dates('2023-05-03',
+                               rng.integers(0, 86_400, size=size), 's',
+                               '%Y-%m-%dT%H:%M:%S.%f')
+    licence_dates = _format_dates('2020-01-01',
+                                  rng.integers(0, 3000, size=size), 'D',
+                                  '%Y-%m-%dT%H:%M:%S')
+    companies = np.array(COMPANIES, dtype=object)[
+        rng.integers(len(COMPANIES), size=size)] + ' ' + rows['suburb'].str.title()
+
+    return pd.DataFrame({
+        'company': companies.where(rng.random(size) < 0.3),
+        'licensee': rows['licensee'].where(
+            rng.random(size) < REINSW_LICENSEE_RATE),
+        'imis_id': rng.integers(10_000, 200_000, size=size).astype(float),
+        'state': rows['state'].where(~missing_address),
+        'suburb': suburbs.where(~missing_address),
+        'license_is_valid': has_licence,
+        'license_date': licence_dates.where(
+            has_licence, '1900-01-01T00:00:00'),
+        'license_number': license_numbers,
+        'first_name': rows['first_name'],
+        'last_name': rows['last_name'],
+        'post_code': post_codes.where(~missing_address),
+        'created_at': updated_at,
+        'updated_at': updated_at,
+        'licence_status': np.where(
+            has_licence,
+            np.array(LICENCE_STATUSES, dtype=object)[
+                rng.integers(1, len(LICENCE_STATUSES), size=size)],
+            'Not Verified'),
+        'licence_type': pd.Series(np.array(LICENCE_TYPES, dtype=object)[
+            rng.integers(len(LICENCE_TYPES), size=size)]).where(has_licence),
+        'licence_id': ('1-' + row_ids).where(has_licence),
+        'classes': None,
+        'class_names': None,
+        'history': history.where(has_licence, '[]'),
+        'expiring': 'Expired',
+        'new': False,
+        'is_change': False,
+    }, columns=list(schemas.REINSW_SCHEMA) + ['new', 'is_change'])
+
+
+def generate_dataset(rows, seed=0):
+    """
+    Generates the certificate and individual registers and the REINSW
+    report, reproducibly for a given seed.
+
+    Parameters
+    ----------
+    rows : int
+        Rows of the certificate register; the individual register and the
+        REINSW report get INDIVIDUAL_RATIO and REINSW_RATIO times as many.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    dict
+        'certificate', 'individual' and 'reinsw' dataframes, laid out like
+        the input CSV files.
+    """
+    rng = np.random.default_rng(seed)
+    individual_rows = max(1, int(rows * INDIVIDUAL_RATIO))
+    reinsw_rows = max(1, int(rows * REINSW_RATIO))
+
+    people = generate_people(rng, rows + individual_rows + reinsw_rows,
+                             generate_localities(rng))
+    reinsw_people = people.iloc[:reinsw_rows]
+    other_people = people.iloc[reinsw_rows:].reset_index(drop=True)
+
+    return {
+        'certificate': generate_fair_trading(
+            rng, other_people, reinsw_people, rows),
+        'individual': generate_fair_trading(
+            rng, other_people, reinsw_people, individual_rows),
+        'reinsw': generate_reinsw(rng, reinsw_people, reinsw_rows),
+    }
+
+
+def write_dataset(dataset, directory):
+    """
+    Writes a generated dataset as the input CSV files of main.py, under
+    `directory`, and creates the result directories main.py writes to.
+
+    Returns
+    -------
+    dict
+        The written file paths, keyed like `dataset`.
+    """
+    paths = {
+        'certificate': os.path.join(directory,
+                                    _config.CERTIFICATE_ORIGINAL_PATH),
+        'individual': os.path.join(directory,
+                                   _config.INDIVIDUAL_ORIGINAL_PATH),
+        'reinsw': os.path.join(directory, _config.REINSW_PATH),
+    }
+
+    for result_directory in ['result_cer_reinsw', 'result_inv_reinsw',
+                             'result-individual-and-certificates']:
+        os.makedirs(os.path.join(directory, result_directory), exist_ok=True)
+
+    for name, path in paths.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dataset[name].to_csv(path, index=False)
+
+    return paths
@@ -5,6 +5,11 @@ S3_BUCKET_NAME = "reinsw1"
 INDIVIDUAL_FILE_KEY = "certificate.csv"
 CERTIFICATE_FILE_KEY = "individual.csv"
 REINSW_FILE_KEY = "reinsw_report.csv"
+# Concurrent uploads of the Lambda handlers, and the size of their parts
+S3_UPLOAD_CONCURRENCY = 8
+S3_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+# Read and write the buckets as directories under this one instead of S3
+S3_LOCAL_DIRECTORY = None
 # S3 cert_inv concat
 S3_CERTIFICATE_LICNUM = "result_cer_reinsw/1_match_cert_and_imis_with_license_number.csv"
 S3_CERTIFICATE_LICNUM_LIC = "result_cer_reinsw/2_match_cert_and_imis_with_license_number_and_licensee.csv"
@@ -23,6 +28,11 @@ S3_INDIVIDUAL_LIC_FNAME_LNAME = "result_inv_reinsw/6_match_inv_and_imis_with_lic
 S3_INDIVIDUAL_LIC_FNAME_LNAME_ADDRESS = "result_inv_reinsw/7_match_inv_and_imis_licencee_fname_lname_address.csv"
 
 
+# Format of the tier result files: "csv", "parquet" or "arrow"
+# (Parquet and Arrow IPC are zstd-compressed and need pyarrow)
+OUTPUT_FORMAT = "csv"
+
+
 # Local
 CERTIFICATE_ORIGINAL_PATH = "data/certificate.csv"
 INDIVIDUAL_ORIGINAL_PATH = "data/individual.csv"
@@ -35,6 +45,72 @@ OUTPUT_PATH_CERTIFICATE = "data/licence_certificate.csv"
 OUTPUT_PATH_INDIVIDUAL = "data/licence_individual.csv"
 OUTPUT_PATH_REINSW = "data/licence_reinsw.csv"
 
+# Match every record once, at its strongest tier, and rebuild the numbered
+# result files from that single cascade result
+CASCADE_MATCHING = False
+
+# Read the REINSW report in chunks of this many rows and stream every tier
+# result to its output file as it goes (None loads the report whole); the
+# streamed results are always CSV, so OUTPUT_FORMAT must be "csv". Streaming
+# raises ValueError with CASCADE_MATCHING, FUSED_PIPELINE, MERGE_PROCESSES,
+# INCREMENTAL_STATE_DIRECTORY, REINSW_INDEX_PATH or the REINSW cache (set
+# REINSW_CACHE_MEMORY_BYTES to 0)
+REINSW_CHUNKSIZE = None
+# Where the Lambda handler writes streamed results before uploading them
+STREAMING_LOCAL_DIRECTORY = "/tmp"
+
+# Run the 14 merge tier jobs of main.py on this many worker processes
+# (0 runs them one after the other in the main process)
+MERGE_PROCESSES = 0
+
+# Keep row hashes and tier results of the last run in this directory and
+# re-match only the rows that changed since (None matches everything). The
+# incremental merge raises ValueError with CASCADE_MATCHING, MERGE_PROCESSES,
+# REINSW_INDEX_PATH or the REINSW cache (set REINSW_CACHE_MEMORY_BYTES to 0)
+INCREMENTAL_STATE_DIRECTORY = None
+
+# Keep the prepared REINSW report, with its join index, in memory between
+# runs of the same process, e.g. invocations of a warm Lambda container,
+# for as long as its S3 ETag or file content is unchanged. The least
+# recently used reports are evicted beyond this many bytes (0 disables it)
+REINSW_CACHE_MEMORY_BYTES = 512 * 2 ** 20
+# Also keep the prepared report of main.py on disk in this directory, so
+# the next run skips parsing it while it is unchanged (None disables it)
+REINSW_CACHE_DIRECTORY = None
+
+# Memory-map the prepared REINSW report and the key tables of every merge
+# tier from this index file (see reinsw_index_file.py) instead of parsing
+# the report. main.py builds it from REINSW_PATH when it is missing or out
+# of date; the Lambda handler expects it prebuilt, e.g. in a layer (None
+# parses the report)
+REINSW_INDEX_PATH = None
+
+# Add a fuzzy licensee name tier, blocked by postcode, as an eighth result
+FUZZY_MATCHING = False
+
+# Also build the concatenated individual and certificate results in the
+# same run, instead of match_cer_inv.py or lambda_match_cer_inv.py reading
+# the tier results back
+FUSED_PIPELINE = False
+# Write the 14 tier results too (only optional in the fused pipeline)
+WRITE_TIER_RESULTS = True
+
+# REINSW rows a Fair Trading record may match on one key, e.g. a common
+# licensee name in the licensee tiers, before JOIN_DUPLICATE_POLICY applies:
+# 'keep' joins them all, 'cap' joins the first JOIN_MAX_CANDIDATES in REINSW
+# order, and 'drop' leaves the record unmatched in that tier. Only 'keep'
+# works with REINSW_CHUNKSIZE, as the others need every REINSW row of a key
+JOIN_DUPLICATE_POLICY = 'keep'
+JOIN_MAX_CANDIDATES = 20
+# Raise join_guard.JoinExplosionError instead of joining a tier whose result
+# is estimated larger than this many bytes (None for no limit)
+JOIN_MEMORY_BUDGET_BYTES = 2 ** 30
+
+# Log the wall time, row counts, join fan-out and peak memory of every
+# read, preprocessing, merge tier and write stage as JSON, and a summary
+# of each run
+INSTRUMENTATION = False
+
 # matching certificate & individual
 CERTIFICATE_LICNUM = 'result_cer_reinsw/1_match_cert_and_imis_with_license_number.csv'
 CERTIFICATE_LICNUM_LIC = 'result_cer_reinsw/2_match_cert_and_imis_with_license_number_and_licensee.csv'
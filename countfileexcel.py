@@ -1,30 +1,133 @@
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+import result_io
+
+# Bytes read at a time when scanning a CSV file
+CHUNK_SIZE = 1 << 20
+
+
+def count_csv_records(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Counts the records of a CSV file with a streaming byte scanner,
+    without parsing it.
+
+    Line breaks inside quoted fields (e.g. in the 'history' column) are not
+    record separators. Splitting each chunk on the quote character gives
+    alternating unquoted and quoted parts, and an escaped quote ("") only
+    adds an empty quoted part, so only the unquoted parts' line breaks
+    are counted. The header line is not a record.
+
+    Parameters
+    ----------
+    file_path : str
+        The CSV file, as written by pandas.DataFrame.to_csv.
+    chunk_size : int
+        The number of bytes read at a time.
+
+    Returns
+    -------
+    int
+        The number of records in the file.
+    """
+    in_quotes = False
+    line_breaks = 0
+    last_byte = b'\n'
+
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            if not in_quotes and b'"' not in chunk:
+                line_breaks += chunk.count(b'\n')
+            else:
+                parts = chunk.split(b'"')
+                first_unquoted_part = 1 if in_quotes else 0
+                line_breaks += sum(part.count(b'\n')
+                                   for part in parts[first_unquoted_part::2])
+                in_quotes ^= (len(parts) - 1) % 2 == 1
+            last_byte = chunk[-1:]
+
+    # The last record may not end with a line break
+    if last_byte != b'\n':
+        line_breaks += 1
+
+    return max(line_breaks - 1, 0)
+
+
+def count_parquet_records(file_path):
+    """
+    Counts the records of a Parquet file from its footer metadata.
+    """
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(file_path).metadata.num_rows
+
+
+def count_arrow_records(file_path):
+    """
+    Counts the records of an Arrow IPC file from its record batches,
+    memory-mapping the file instead of reading it.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(file_path) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows
+                   for i in range(reader.num_record_batches))
 
 
 def count_records(file_path):
-    df = pd.read_csv(file_path)
-    record_count = len(df)
-    return record_count
+    """
+    Counts the records of a result file, picking the counting method
+    from its format.
+
+    Parameters
+    ----------
+    file_path : str
+        A CSV, Parquet or Arrow result file.
+
+    Returns
+    -------
+    int
+        The number of records in the file.
+    """
+    counters = {
+        'csv': count_csv_records,
+        'parquet': count_parquet_records,
+        'arrow': count_arrow_records,
+    }
+    return counters[result_io.format_of(file_path)](file_path)
 
 
-def count_records_in_folder(folder_path):
-    file_records = {}
+def count_records_in_folder(folder_path, max_workers=None):
+    """
+    Counts the records of every result file in a folder, in parallel.
 
-    files = os.listdir(folder_path)
+    Parameters
+    ----------
+    folder_path : str
+        The folder containing the result files.
+    max_workers : int, optional
+        The number of files counted at the same time.
 
-    for file in files:
-        file_path = os.path.join(folder_path, file)
-        if file.endswith('.csv'):
-            record_count = count_records(file_path)
-            file_records[file] = record_count
+    Returns
+    -------
+    dict
+        A dictionary of the file names to their record counts.
+    """
+    files = [file for file in sorted(os.listdir(folder_path))
+             if file.endswith(tuple(result_io.FORMAT_EXTENSIONS.values()))]
 
-    return file_records
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        record_counts = executor.map(
+            count_records,
+            [os.path.join(folder_path, file) for file in files])
+        return dict(zip(files, record_counts))
 
 
-# Example usage
-folder_path = 'result_inv_reinsw'
-file_records = count_records_in_folder(folder_path)
+if __name__ == "__main__":
+    # Example usage
+    folder_path = 'result_inv_reinsw'
+    file_records = count_records_in_folder(folder_path)
 
-for file, count in file_records.items():
-    print(f"{file}: Total record count: {count}")
+    for file, count in file_records.items():
+        print(f"{file}: Total record count: {count}")
@@ -1,9 +1,15 @@
 from typing import List, Tuple
-from pandas.api.types import is_numeric_dtype
-
 
+import numpy as np
 import pandas as pd
 
+import config as _config
+import instrumentation
+import join_guard
+import normalization
+from fuzzy_match import merge_on_fuzzy_licensee
+from reinsw_index import ReinswIndex
+
 merge_columns_dict = {
     'last_name': ['last_name_fairtrade', 'last_name_reinsw'],
     'first_name': ['first_name_fairtrade', 'first_name_reinsw'],
@@ -13,6 +19,16 @@ merge_columns_dict = {
     'licensee': ['licensee_fairtrade', 'licensee_reinsw']
 }
 
+# Join keys cast to a common nullable int64 on every side
+numeric_join_keys = ['license_number', 'post_code']
+
+# Join keys dictionary-encoded with categories shared by every side
+string_join_keys = ['licensee', 'first_name', 'last_name', 'suburb', 'state']
+
+# REINSW columns keeping the text of the string join keys as it appears in
+# the report, see keep_reinsw_text
+reinsw_text_columns = {column: f"reinsw_{column}" for column in string_join_keys}
+
 
 def parse_addresses(addresses: List[str]) -> List[Tuple[str, str, str]]:
     """
@@ -71,6 +87,120 @@ def parse_addresses(addresses: List[str]) -> List[Tuple[str, str, str]]:
     return parsed_addresses
 
 
+def parse_postcode(postcode: str) -> int:
+    """
+    Returns a postcode parsed by `parse_addresses` as a number, or None
+    when it is missing or not made of the digits 0-9.
+
+    Examples
+    --------
+    >>> parse_postcode('2121'), parse_postcode('21A'), parse_postcode(None)
+    (2121, None, None)
+    """
+    return int(postcode) if postcode is not None and postcode.isascii() \
+        and postcode.isdecimal() else None
+
+
+def _list_elements(lists, positions, present):
+    """
+    Returns the element at `positions` of the flattened values of an Arrow
+    list array for every list, or null where `present` is False.
+    """
+    import pyarrow as pa
+
+    return lists.values.take(
+        pa.array(np.where(present, positions, 0), mask=~present))
+
+
+def parse_address_columns(addresses: pd.Series) -> pd.DataFrame:
+    """
+    Parses a whole column of address strings in one pass and
+    returns the Suburb, State, and Postcode information as typed columns.
+
+    This is the columnar counterpart of `parse_addresses`, which stays the
+    scalar reference. The column is split with the pyarrow string kernels,
+    and the parts are picked from the split lists by their offsets, so no
+    address goes through the interpreter. Suburb and State are nullable
+    string columns and Postcode is a nullable integer column; a postcode
+    that is not made of the digits 0-9 becomes <NA>.
+
+    Parameters
+    ----------
+    addresses : pandas.Series
+        The address strings.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame indexed like `addresses`
+        with the 'Suburb', 'State', and 'Postcode' columns.
+
+    Examples
+    --------
+    >>> addresses = pd.Series(["10 OXFORD ST, EPPING, NSW 2121", "NSW", None,
+    ...                        "RYDE, NSW", 2121])
+    >>> parse_address_columns(addresses)
+       Suburb State  Postcode
+    0  EPPING   NSW      2121
+    1    <NA>   NSW      <NA>
+    2    <NA>  <NA>      <NA>
+    3    RYDE   NSW      <NA>
+    4    <NA>  <NA>      <NA>
+
+    Explanation:
+    The same rules as `parse_addresses` apply: the suburb is the
+    second-to-last comma separated component (None when there are fewer
+    than two), the state is the first space separated token of the last
+    component, and the postcode is its last token (None when it has
+    only one token). Values that are not strings give None for all three.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(addresses.dtype, pd.StringDtype) \
+            and addresses.dtype.storage == 'pyarrow':
+        strings = pa.array(addresses.array)
+    else:
+        values = addresses.to_numpy(dtype=object)
+        if pd.api.types.infer_dtype(values, skipna=True) not in (
+                'string', 'empty'):
+            values = np.where([isinstance(value, str) for value in values],
+                              values, None)
+        strings = pa.array(values, type=pa.string(), from_pandas=True)
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    present = np.asarray(pc.is_valid(strings))
+
+    # The last two comma separated parts, split from the right
+    parts = pc.split_pattern(strings, ',', max_splits=2, reverse=True)
+    ends = parts.offsets.to_numpy()[1:]
+    counts = np.diff(parts.offsets.to_numpy())
+    last_parts = pc.utf8_trim_whitespace(
+        _list_elements(parts, ends - 1, present))
+    suburbs = pc.utf8_trim_whitespace(
+        _list_elements(parts, ends - 2, present & (counts >= 2)))
+
+    # The state is the first token of the last part, and the postcode its
+    # last one
+    tokens = pc.split_pattern(last_parts, ' ')
+    offsets = tokens.offsets.to_numpy()
+    counts = np.diff(offsets)
+    states = _list_elements(tokens, offsets[:-1], present)
+    postcodes = _list_elements(tokens, offsets[1:] - 1,
+                               present & (counts >= 2))
+    is_number = pc.and_(pc.string_is_ascii(postcodes),
+                        pc.utf8_is_decimal(postcodes))
+    postcodes = pc.cast(pc.if_else(is_number, postcodes, None), pa.int64())
+
+    return pd.DataFrame({
+        'Suburb': pd.array(suburbs, dtype='string'),
+        'State': pd.array(states, dtype='string'),
+        'Postcode': pd.arrays.IntegerArray(
+            postcodes.fill_null(0).to_numpy(),
+            np.asarray(postcodes.is_null()))},
+        index=addresses.index)
+
+
 def extract_first_last_name(licensee: str) -> pd.Series:
     """
     Extracts the first and last name
@@ -96,8 +226,8 @@ def extract_first_last_name(licensee: str) -> pd.Series:
     The index -1 is not used in this case since there is only one name in the 'name_parts' list.
     Therefore, `last_name_index` is set to None.
     """
-    # Check if licensee is a string
-    if not isinstance(licensee, str) or not licensee:
+    # Check if licensee is a string with a name in it
+    if not isinstance(licensee, str) or not licensee.strip():
         return pd.Series({'Last Name': None, 'First Name': None})
 
     name_parts = licensee.split(maxsplit=1)
@@ -110,6 +240,188 @@ def extract_first_last_name(licensee: str) -> pd.Series:
     return pd.Series({'Last Name': last_name, 'First Name': first_name})
 
 
+def extract_first_last_names(licensees: pd.Series) -> pd.DataFrame:
+    """
+    Extracts the first and last names
+    from a whole column of licensee strings in one pass.
+
+    This is the columnar counterpart of `extract_first_last_name`, which
+    stays the scalar reference: both return the same First Name / Last Name
+    values, including None for missing, empty or non-string licensees.
+
+    Parameters
+    ----------
+    licensees : pandas.Series
+        The licensee name strings.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame indexed like `licensees`
+        with the 'Last Name' and 'First Name' columns.
+
+    Examples
+    --------
+    >>> licensees = pd.Series(['(Ricky) Lac Long Tran', 'Nannan', None])
+    >>> extract_first_last_names(licensees)
+           Last Name First Name
+    0  Lac Long Tran    (Ricky)
+    1           None     Nannan
+    2           None       None
+    >>> scalar_df = licensees.apply(extract_first_last_name).astype(object)
+    >>> scalar_df.equals(extract_first_last_names(licensees))
+    True
+
+    Extra whitespace stays in the last name, titles are split off as the
+    first name, and blank or missing licensees have no names, as in the
+    scalar reference:
+
+    >>> edge_cases = pd.Series(['  Lac   Long  Tran ', 'Mr John Smith',
+    ...                         'Dr. Jane Doe-Smith', '', '   ', np.nan])
+    >>> extract_first_last_names(edge_cases)
+            Last Name First Name
+    0     Long  Tran         Lac
+    1      John Smith         Mr
+    2  Jane Doe-Smith        Dr.
+    3            None       None
+    4            None       None
+    5            None       None
+    >>> scalar_df = edge_cases.apply(extract_first_last_name).astype(object)
+    >>> scalar_df.equals(extract_first_last_names(edge_cases))
+    True
+
+    Licensees as they appear in the REINSW report split the same way, both
+    as they are and normalized as the preprocessing splits them:
+
+    >>> reinsw_like = pd.Series(["Mary-Anne O'Brien", 'VAN DER BERG Pieter',
+    ...                          'Zoë  Ångström', 'Li  Wei Chen', 'J.',
+    ...                          'Mr. & Mrs. A Smith', ' (Ricky) Tran '])
+    >>> for values in (reinsw_like,
+    ...                normalization.normalize_column(reinsw_like)):
+    ...     scalar_df = values.apply(extract_first_last_name).astype(object)
+    ...     print(scalar_df.equals(extract_first_last_names(values)))
+    True
+    True
+    """
+    names_df = pd.DataFrame(
+        {'Last Name': None, 'First Name': None},
+        index=licensees.index,
+        dtype=object)
+
+    licensees = licensees.astype(object)
+    is_string = licensees.map(lambda licensee: isinstance(licensee, str))
+    if not is_string.any():
+        return names_df
+
+    # str.split() without a pattern behaves like the scalar licensee.split()
+    name_parts = licensees[is_string].str.split(
+        n=1, expand=True).reindex(columns=[0, 1])
+    name_parts = name_parts.astype(object).where(name_parts.notna(), None)
+
+    names_df.loc[is_string, 'First Name'] = name_parts[0]
+    names_df.loc[is_string, 'Last Name'] = name_parts[1]
+    return names_df
+
+
+def merge_fairtrade_and_reinsw(fairtrade_df, imis_df, merging_on_list,
+                               suffixes, drop_duplicates=False):
+    """
+    Inner joins a Fairtrading dataframe with the REINSW data, either with
+    pandas.merge or by probing a prepared ReinswIndex.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        First dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        The REINSW dataframe, or the index built once from it.
+    merging_on_list : list
+        The key columns to merge on.
+    suffixes : list
+        Suffixes for overlapping non-key columns.
+    drop_duplicates : bool
+        Whether to keep only the first REINSW row of every key.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Merged dataframe.
+
+    Raises
+    ------
+    join_guard.JoinExplosionError
+        When the joined rows would exceed config.JOIN_MEMORY_BUDGET_BYTES.
+
+    Notes
+    -----
+    The joined rows are checked against the memory budget before joining.
+    REINSW keys with more than config.JOIN_MAX_CANDIDATES rows are kept,
+    capped or dropped following config.JOIN_DUPLICATE_POLICY, and the key
+    multiplicity of both sides is logged with the 'join' stage when
+    instrumentation is enabled.
+    """
+    policy = _config.JOIN_DUPLICATE_POLICY
+    if policy not in join_guard.DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown join duplicate policy: {policy}")
+    max_candidates = None if policy == 'keep' else _config.JOIN_MAX_CANDIDATES
+    drop_ambiguous = policy == 'drop'
+    memory_budget = _config.JOIN_MEMORY_BUDGET_BYTES
+
+    with instrumentation.stage('join', input_rows=len(fairtrade_df),
+                               keys=list(merging_on_list)) as stage:
+        if isinstance(imis_df, ReinswIndex):
+            max_rows = None if memory_budget is None else join_guard.max_rows(
+                memory_budget,
+                join_guard.frame_row_nbytes(fairtrade_df) + imis_df.row_nbytes)
+            result_df = imis_df.merge(fairtrade_df, merging_on_list,
+                                      suffixes=suffixes,
+                                      drop_duplicates=drop_duplicates,
+                                      max_candidates=max_candidates,
+                                      drop_ambiguous=drop_ambiguous,
+                                      max_rows=max_rows)
+            stats = result_df.attrs.pop('join_stats')
+        else:
+            if drop_duplicates:
+                imis_df = imis_df.drop_duplicates(subset=merging_on_list)
+
+            limited_df = None if max_candidates is None else \
+                join_guard.limit_candidates(imis_df, merging_on_list,
+                                            max_candidates, drop_ambiguous)
+            joined_df = imis_df if limited_df is None else limited_df
+
+            def join_stats():
+                return join_guard.frame_join_stats(
+                    fairtrade_df, imis_df, merging_on_list, limited_df)
+
+            # The full stats are only measured for the instrumentation and
+            # the error; the budget only needs the joined rows
+            stats = join_stats() if instrumentation.enabled() else None
+
+            max_rows = None if memory_budget is None else join_guard.max_rows(
+                memory_budget,
+                join_guard.frame_row_nbytes(fairtrade_df)
+                + join_guard.frame_row_nbytes(imis_df))
+            if max_rows is not None and (
+                    stats.output_rows if stats is not None
+                    else join_guard.join_rows(fairtrade_df, joined_df,
+                                              merging_on_list)) > max_rows:
+                raise join_guard.JoinExplosionError(
+                    merging_on_list, stats or join_stats(), max_rows)
+
+            result_df = pd.merge(
+                fairtrade_df,
+                joined_df,
+                on=merging_on_list,
+                suffixes=suffixes,
+                how='inner')
+
+        if stats is not None:
+            stage.fields.update(stats._asdict())
+        stage.output_rows = len(result_df)
+
+    return result_df
+
+
 def merge_on_license_number(fairtrade_df, imis_df):
     """
     Merges two dataframes on the 'license_number' column.
@@ -118,8 +430,8 @@ def merge_on_license_number(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame
-        Second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
 
     Returns
     -------
@@ -130,12 +442,8 @@ def merge_on_license_number(fairtrade_df, imis_df):
     suffixes = ['_fairtrade', '_reinsw']
 
     # Merge dataframes on license_number
-    merge_on_license_number_df = pd.merge(
-        fairtrade_df,
-        imis_df,
-        on=merging_on_list,
-        suffixes=suffixes,
-        how='inner')
+    merge_on_license_number_df = merge_fairtrade_and_reinsw(
+        fairtrade_df, imis_df, merging_on_list, suffixes)
 
     return merge_on_license_number_df
 
@@ -148,8 +456,8 @@ def merge_on_license_number_and_licensee(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame
-        Second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
 
     Returns
     -------
@@ -162,8 +470,8 @@ def merge_on_license_number_and_licensee(fairtrade_df, imis_df):
 
     merging_on_list = ['license_number', 'licensee']
     suffixes = ['_fairtrade', '_reinsw']
-    merge_on_license_number_and_licensee_df = pd.merge(
-        fairtrade_df, imis_df, on=merging_on_list, suffixes=suffixes, how='inner')
+    merge_on_license_number_and_licensee_df = merge_fairtrade_and_reinsw(
+        fairtrade_df, imis_df, merging_on_list, suffixes)
     return merge_on_license_number_and_licensee_df
 
 
@@ -175,8 +483,8 @@ def merge_on_licence_number_licencee_fname_lname(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame
-        Second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
 
     Returns
     -------
@@ -190,12 +498,8 @@ def merge_on_licence_number_licencee_fname_lname(fairtrade_df, imis_df):
 
     merging_on_list = ['first_name', 'last_name', 'license_number', 'licensee']
     suffixes = ['_fairtrade', '_reinsw']
-    merge_on_fname_and_lname_df = pd.merge(
-        fairtrade_df,
-        imis_df,
-        on=merging_on_list,
-        suffixes=suffixes,
-        how='inner')
+    merge_on_fname_and_lname_df = merge_fairtrade_and_reinsw(
+        fairtrade_df, imis_df, merging_on_list, suffixes)
     return merge_on_fname_and_lname_df
 
 
@@ -209,8 +513,8 @@ def merge_on_licence_number_licencee_fname_lname_address(
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame or iterator
-        Second dataframe or iterator to merge.
+    imis_df : pandas.DataFrame, ReinswIndex or iterator
+        Second dataframe, index or iterator to merge.
 
     Returns
     -------
@@ -233,14 +537,9 @@ def merge_on_licence_number_licencee_fname_lname_address(
         imis_iterator = [imis_df]
 
     for chunk_imis_df in imis_iterator:
-        chunk_imis_df = chunk_imis_df.drop_duplicates(subset=merging_on_list)
-
-        merged_reinsw_df = pd.merge(
-            fairtrade_df,
-            chunk_imis_df,
-            on=merging_on_list,
-            suffixes=suffixes,
-            how='inner')
+        merged_reinsw_df = merge_fairtrade_and_reinsw(
+            fairtrade_df, chunk_imis_df, merging_on_list, suffixes,
+            drop_duplicates=True)
 
         filtered_merged_reinsw_df = merged_reinsw_df.dropna(
             subset=merging_on_list)
@@ -250,8 +549,9 @@ def merge_on_licence_number_licencee_fname_lname_address(
         results_merge_on_licence_number_licencee_fname_lname_address_df.append(
             filtered_merged_reinsw_df)
 
+    # A key repeated in a later chunk keeps its first match only
     merge_on_address_df = pd.concat(
-        results_merge_on_licence_number_licencee_fname_lname_address_df)
+        results_merge_on_licence_number_licencee_fname_lname_address_df).drop_duplicates(subset=merging_on_list)
 
     return merge_on_address_df
 
@@ -264,8 +564,8 @@ def merge_on_licencee(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame
-        Second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
 
     Returns
     -------
@@ -278,8 +578,8 @@ def merge_on_licencee(fairtrade_df, imis_df):
 
     merging_on_list = ['licensee']
     suffixes = ['_fairtrade', '_reinsw']
-    merge_on_licensee_df = pd.merge(fairtrade_df, imis_df, on=merging_on_list,
-                                    suffixes=suffixes, how='inner')
+    merge_on_licensee_df = merge_fairtrade_and_reinsw(
+        fairtrade_df, imis_df, merging_on_list, suffixes)
     return merge_on_licensee_df
 
 
@@ -290,8 +590,8 @@ def merge_on_licencee_fname_lname(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame
-        Second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
 
     Returns
     -------
@@ -304,10 +604,8 @@ def merge_on_licencee_fname_lname(fairtrade_df, imis_df):
 
     merging_on_list = ['first_name', 'last_name', 'licensee']
     suffixes = ['_fairtrade', '_reinsw']
-    merge_on_licencee_fname_lname_df = pd.merge(fairtrade_df,
-                                                imis_df,
-                                                on=merging_on_list,
-                                                suffixes=suffixes, how='inner')
+    merge_on_licencee_fname_lname_df = merge_fairtrade_and_reinsw(
+        fairtrade_df, imis_df, merging_on_list, suffixes)
     return merge_on_licencee_fname_lname_df
 
 
@@ -320,8 +618,8 @@ def merge_on_licencee_fname_lname_address(fairtrade_df, imis_df):
     ----------
     fairtrade_df : pandas.DataFrame
         First dataframe to merge.
-    imis_df : pandas.DataFrame or iterator
-        Second dataframe or iterator to merge.
+    imis_df : pandas.DataFrame, ReinswIndex or iterator
+        Second dataframe, index or iterator to merge.
 
     Returns
     -------
@@ -344,14 +642,9 @@ def merge_on_licencee_fname_lname_address(fairtrade_df, imis_df):
         imis_iterator = [imis_df]
 
     for chunk_imis_df in imis_iterator:
-        chunk_imis_df = chunk_imis_df.drop_duplicates(subset=merging_on_list)
-
-        merged_reinsw_df = pd.merge(
-            fairtrade_df,
-            chunk_imis_df,
-            on=merging_on_list,
-            suffixes=suffixes,
-            how='inner')
+        merged_reinsw_df = merge_fairtrade_and_reinsw(
+            fairtrade_df, chunk_imis_df, merging_on_list, suffixes,
+            drop_duplicates=True)
 
         filtered_merged_reinsw_df = merged_reinsw_df.dropna(
             subset=merging_on_list)
@@ -361,12 +654,89 @@ def merge_on_licencee_fname_lname_address(fairtrade_df, imis_df):
         results_merge_on_licencee_fname_lname_address_df.append(
             filtered_merged_reinsw_df)
 
+    # A key repeated in a later chunk keeps its first match only
     merge_on_address_df = pd.concat(
-        results_merge_on_licencee_fname_lname_address_df)
+        results_merge_on_licencee_fname_lname_address_df).drop_duplicates(subset=merging_on_list)
 
     return merge_on_address_df
 
 
+# Merge tiers of each side, in the order of the numbered result files
+cert_merge_mappings = {
+    'match_cert_and_imis_with_license_number': merge_on_license_number,
+    'match_cert_and_imis_with_license_number_and_licensee': merge_on_license_number_and_licensee,
+    'match_cert_and_imis_with_licence_number_licencee_fname_lname': merge_on_licence_number_licencee_fname_lname,
+    'match_cert_and_imis_with_licence_number_licencee_fname_lname_address': merge_on_licence_number_licencee_fname_lname_address,
+    'match_cert_and_imis_with_licensee': merge_on_licencee,
+    'match_cert_and_imis_licencee_fname_lname': merge_on_licencee_fname_lname,
+    'match_cert_and_imis_licencee_fname_lname_address': merge_on_licencee_fname_lname_address,
+}
+
+inv_merge_mappings = {
+    'match_inv_and_imis_with_license_number': merge_on_license_number,
+    'match_inv_and_imis_with_license_number_and_license': merge_on_license_number_and_licensee,
+    'match_inv_and_imis_with_licence_number_licencee_fname_lname': merge_on_licence_number_licencee_fname_lname,
+    'match_inv_and_imis_licence_number_licencee_fname_lname_address': merge_on_licence_number_licencee_fname_lname_address,
+    'match_inv_and_imis_with_licensee': merge_on_licencee,
+    'match_inv_and_imis_with_licencee_fname_lname': merge_on_licencee_fname_lname,
+    'match_inv_and_imis_licencee_fname_lname_address': merge_on_licencee_fname_lname_address,
+}
+
+# Merge tiers with the fuzzy licensee tier as an eighth result file
+fuzzy_cert_merge_mappings = {
+    **cert_merge_mappings,
+    'match_cert_and_imis_with_fuzzy_licensee': merge_on_fuzzy_licensee,
+}
+
+fuzzy_inv_merge_mappings = {
+    **inv_merge_mappings,
+    'match_inv_and_imis_with_fuzzy_licensee': merge_on_fuzzy_licensee,
+}
+
+# Merge functions that keep a single REINSW row per key
+deduplicating_merge_funcs = [
+    merge_on_licence_number_licencee_fname_lname_address,
+    merge_on_licencee_fname_lname_address,
+]
+
+# Key columns each merge function joins on
+merge_keys = {
+    merge_on_license_number: ['license_number'],
+    merge_on_license_number_and_licensee: ['license_number', 'licensee'],
+    merge_on_licence_number_licencee_fname_lname: [
+        'first_name', 'last_name', 'license_number', 'licensee'],
+    merge_on_licence_number_licencee_fname_lname_address: [
+        'suburb', 'state', 'post_code',
+        'last_name', 'first_name', 'license_number', 'licensee'],
+    merge_on_licencee: ['licensee'],
+    merge_on_licencee_fname_lname: ['first_name', 'last_name', 'licensee'],
+    merge_on_licencee_fname_lname_address: [
+        'suburb', 'state', 'post_code',
+        'last_name', 'first_name', 'licensee'],
+    # Fuzzy matches never cross postcodes, and rows without one all share
+    # the missing postcode
+    merge_on_fuzzy_licensee: ['post_code'],
+}
+
+# Legacy tier numbers from the strongest to the weakest match
+cascade_tier_order = [4, 3, 2, 1, 7, 6, 5]
+
+# The same with the fuzzy licensee tier, weaker than every exact tier
+fuzzy_cascade_tier_order = cascade_tier_order + [8]
+
+# Legacy tiers a match at each tier also satisfies, as its keys include theirs
+implied_tiers = {
+    1: [1],
+    2: [1, 2, 5],
+    3: [1, 2, 3, 5, 6],
+    4: [1, 2, 3, 4, 5, 6, 7],
+    5: [5],
+    6: [5, 6],
+    7: [5, 6, 7],
+    8: [8],
+}
+
+
 def rename_columns(result_match_fair_reinsw_df):
     """
     Renames the columns in the merged dataframe
@@ -395,46 +765,115 @@ def rename_columns(result_match_fair_reinsw_df):
     return result_match_fair_reinsw_df.rename(columns=columns_mapping)
 
 
-def merge_columns_and_drop(result_df, column_mappings):
+def coalesce_columns(columns):
+    """
+    Combines columns into one, taking every value from the first column
+    that has it.
+
+    The columns are first cast to a common dtype: integer columns to Int64,
+    other numeric columns to float64, categoricals to a categorical of all
+    their categories, and any other mix to object. Coalescing then runs
+    with vectorized masks, column by column.
+
+    Parameters
+    ----------
+    columns : list
+        The columns to combine, as pandas.Series sharing an index, in order
+        of precedence.
+
+    Returns
+    -------
+    pandas.Series
+        The combined column.
+
+    Examples
+    --------
+    >>> coalesce_columns([pd.Series(['Sydney', None]),
+    ...                   pd.Series(['Parramatta', 'Ryde'])]).tolist()
+    ['Sydney', 'Ryde']
+    >>> coalesce_columns([pd.Series([2000, None], dtype='Int64'),
+    ...                   pd.Series([2150.0, 2112.0])]).tolist()
+    [2000.0, 2112.0]
+    """
+    dtypes = [column.dtype for column in columns]
+
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        common_dtype = dtypes[0]
+    elif all(pd.api.types.is_numeric_dtype(dtype)
+             and not pd.api.types.is_bool_dtype(dtype)
+             for dtype in dtypes):
+        if all(pd.api.types.is_integer_dtype(dtype) for dtype in dtypes):
+            common_dtype = 'Int64'
+        else:
+            common_dtype = 'float64'
+    elif all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+        common_dtype = pd.CategoricalDtype(pd.Index(pd.unique(np.concatenate(
+            [np.asarray(dtype.categories, dtype=object) for dtype in dtypes]))))
+    else:
+        common_dtype = object
+
+    columns = [column.astype(common_dtype) for column in columns]
+
+    merged_values = columns[0]
+    for column in columns[1:]:
+        merged_values = merged_values.where(merged_values.notna(), column)
+
+    return merged_values
+
+
+def merge_columns_and_drop(result_df, column_mappings, precedence='fairtrade'):
     """
     Merges columns in the DataFrame based on the provided mappings and drops the original columns.
 
+    Every group of columns present in the DataFrame is coalesced with
+    coalesce_columns, and all groups are replaced in a single pass, so each
+    merged column takes its values from one side and falls back on the
+    other one.
+
     Parameters
     ----------
     result_df : pandas.DataFrame
         DataFrame to merge columns and drop original columns from.
     column_mappings : dict
         A dictionary containing the column mappings to merge and drop.
-        The keys represent the new merged column names, and the values represent the list of columns to merge.
+        The keys represent the new merged column names, and the values represent
+        the list of columns to merge, Fair Trading column first.
+    precedence : str
+        'fairtrade' to prefer the Fair Trading values, or 'reinsw' to prefer
+        the REINSW values.
 
     Returns
     -------
     pandas.DataFrame
         The DataFrame with merged columns and dropped original columns.
     """
+    if precedence not in ('fairtrade', 'reinsw'):
+        raise ValueError(f"Unknown precedence: {precedence}")
+
+    merged_columns = {}
+    columns_to_drop = []
+
     for new_column, columns_to_merge in column_mappings.items():
         valid_columns_to_merge = [
             col for col in columns_to_merge if col in result_df.columns
         ]
+        if not valid_columns_to_merge:
+            continue
 
-        # Initialize merged_values as an empty DataFrame
-        merged_values = pd.DataFrame()
-
-        # Handle merging of string columns
-        if result_df[valid_columns_to_merge].dtypes.all() == str:
-            merged_values = result_df[valid_columns_to_merge].replace(
-                '', '').sum(axis=1)
+        if precedence == 'reinsw':
+            valid_columns_to_merge = valid_columns_to_merge[::-1]
 
-        # Handle merging of numeric columns
-        elif result_df[valid_columns_to_merge].dtypes.apply(pd.api.types.is_numeric_dtype).all():
-            merged_values = result_df[valid_columns_to_merge].sum(axis=1)
+        merged_columns[new_column] = coalesce_columns(
+            [result_df[col] for col in valid_columns_to_merge])
+        columns_to_drop.extend(valid_columns_to_merge)
 
-        # Check if merged_values contains any non-empty values
-        if not merged_values.empty and merged_values.astype(bool).any():
-            result_df[new_column] = merged_values
-            result_df = result_df.drop(columns=valid_columns_to_merge)
+    if not merged_columns:
+        return result_df
 
-    return result_df
+    return pd.concat(
+        [result_df.drop(columns=columns_to_drop),
+         pd.DataFrame(merged_columns, index=result_df.index)],
+        axis=1)
 
 
 def merge_dataframes_with_mappings_and_columns(fairtrade_df,
@@ -448,8 +887,8 @@ def merge_dataframes_with_mappings_and_columns(fairtrade_df,
     ----------
     fairtrade_df : pandas.DataFrame
         The first dataframe to merge.
-    imis_df : pandas.DataFrame
-        The second dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        The second dataframe or prepared index to merge.
     merge_mappings : dict
         A dictionary containing the merge mappings as keys and the merge functions as values.
     merge_columns_dict : dict
@@ -465,15 +904,207 @@ def merge_dataframes_with_mappings_and_columns(fairtrade_df,
     results = {}
 
     for idx, (result_name, merge_func) in enumerate(merge_mappings.items(), 1):
-        result_df = merge_func(fairtrade_df.copy(), imis_df)
-        result_df = merge_columns_and_drop(result_df, merge_columns_dict)
+        with instrumentation.stage('merge', input_rows=len(fairtrade_df),
+                                   tier=result_name) as stage:
+            result_df = merge_func(fairtrade_df.copy(), imis_df)
+            result_df = merge_columns_and_drop(result_df, merge_columns_dict)
+            stage.output_rows = len(result_df)
         file_name = f"{idx}_{result_name}.csv"
         results[file_name] = result_df
 
     return results
 
 
-def merge_cert_dataframes(certificate_df, reinsw_df):
+def cascade_merge_dataframes_with_mappings_and_columns(fairtrade_df,
+                                                       imis_df,
+                                                       merge_mappings,
+                                                       merge_columns_dict,
+                                                       tier_order=None):
+    """
+    Merge dataframes tier by tier, from the strongest to the weakest match,
+    and assign every record only its strongest tier.
+
+    After each tier, the matched Fairtrading rows leave the candidate pool,
+    so weaker tiers only join the records that are still unmatched.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        The first dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        The second dataframe or prepared index to merge.
+    merge_mappings : dict
+        A dictionary containing the merge mappings as keys and the merge functions as values.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+    tier_order : list, optional
+        Legacy tier numbers (positions in merge_mappings, starting at 1)
+        from the strongest to the weakest; defaults to cascade_tier_order,
+        or fuzzy_cascade_tier_order for merge mappings with the fuzzy tier.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One merged dataframe with a 'match_tier' column holding the
+        legacy tier number of every match.
+    """
+    result_names = list(merge_mappings)
+    merge_funcs = list(merge_mappings.values())
+    if tier_order is None:
+        tier_order = (fuzzy_cascade_tier_order
+                      if merge_on_fuzzy_licensee in merge_funcs
+                      else cascade_tier_order)
+    if sorted(tier_order) != list(range(1, len(merge_funcs) + 1)):
+        raise ValueError(f"The cascade tier order {tier_order} does not "
+                         f"cover the {len(merge_funcs)} merge tiers")
+
+    candidates_df = fairtrade_df.copy()
+    candidates_df['_fairtrade_row'] = range(len(candidates_df))
+    tier_results = []
+
+    for tier in tier_order:
+        if tier_results and candidates_df.empty:
+            break
+
+        with instrumentation.stage('merge', input_rows=len(candidates_df),
+                                   tier=result_names[tier - 1]) as stage:
+            result_df = merge_funcs[tier - 1](candidates_df.copy(), imis_df)
+            result_df = merge_columns_and_drop(result_df, merge_columns_dict)
+            stage.output_rows = len(result_df)
+        result_df['match_tier'] = tier
+        tier_results.append(result_df)
+
+        candidates_df = candidates_df[
+            ~candidates_df['_fairtrade_row'].isin(result_df['_fairtrade_row'])]
+
+    cascade_df = pd.concat(tier_results, ignore_index=True)
+    return cascade_df.drop(columns='_fairtrade_row')
+
+
+def merge_tier_columns(fairtrade_df, imis_df, merge_mappings,
+                       merge_columns_dict=merge_columns_dict):
+    """
+    Returns the columns of every merge tier's result, as
+    merge_dataframes_with_mappings_and_columns lays them out.
+
+    Every tier is merged on none of the Fair Trading rows, which only costs
+    its setup.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        The first dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        The second dataframe or prepared index to merge.
+    merge_mappings : dict
+        A dictionary containing the merge mappings as keys and the merge functions as values.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    dict
+        Tier numbers (positions in merge_mappings, starting at 1) to the
+        columns of their results.
+    """
+    return {
+        idx: list(merge_columns_and_drop(
+            merge_func(fairtrade_df.iloc[:0].copy(), imis_df),
+            merge_columns_dict).columns)
+        for idx, merge_func in enumerate(merge_mappings.values(), 1)
+    }
+
+
+def split_cascade_result(cascade_df, merge_mappings, tier_columns):
+    """
+    Rebuilds the legacy numbered result layout from a cascade result.
+
+    Every legacy tier gets the cascade rows whose strongest tier also
+    satisfies it (see implied_tiers). Each record appears with its
+    strongest match only, so a weak tier file holds fewer rows than an
+    independent full join on that tier would.
+
+    The rows of every tier are laid out with the columns of the file they
+    go to, e.g. the 'license_number' of an exact tier match is copied to
+    'license_number_fairtrade' and 'license_number_reinsw' in the licensee
+    tier files, and the fuzzy tier's 'match_score' stays out of the exact
+    tier files.
+
+    Parameters
+    ----------
+    cascade_df : pandas.DataFrame
+        The result of cascade_merge_dataframes_with_mappings_and_columns.
+    merge_mappings : dict
+        The merge mappings the cascade was built from.
+    tier_columns : dict
+        The columns of every tier's result, see merge_tier_columns.
+
+    Returns
+    -------
+    dict
+        A dictionary of file names to merged dataframes, laid out like
+        the result of merge_dataframes_with_mappings_and_columns.
+
+    Examples
+    --------
+    >>> fairtrade_df = pd.DataFrame({
+    ...     'license_number': pd.array([1, 2], dtype='Int64'),
+    ...     'licensee': ['Lac Tran', 'Aaron Darcy'],
+    ...     'first_name': ['Lac', 'Aaron'], 'last_name': ['Tran', 'Darcy'],
+    ...     'suburb': ['EPPING', 'RYDE'], 'state': ['NSW', 'NSW'],
+    ...     'post_code': pd.array([2121, 2112], dtype='Int64')})
+    >>> reinsw_df = fairtrade_df.assign(
+    ...     license_number=pd.array([1, 3], dtype='Int64'),
+    ...     imis_id=[83789, 26501])
+    >>> results = split_cascade_result(
+    ...     cascade_merge_cert_dataframes(fairtrade_df, reinsw_df),
+    ...     cert_merge_mappings,
+    ...     merge_tier_columns(fairtrade_df, reinsw_df, cert_merge_mappings))
+    >>> legacy_results = merge_cert_dataframes(fairtrade_df, reinsw_df)
+    >>> all(list(results[file_name].columns)
+    ...     == list(legacy_results[file_name].columns)
+    ...     for file_name in legacy_results)
+    True
+    >>> results['5_match_cert_and_imis_with_licensee.csv'][
+    ...     ['licensee', 'license_number_fairtrade', 'license_number_reinsw']]
+          licensee  license_number_fairtrade  license_number_reinsw
+    0     Lac Tran                         1                      1
+    1  Aaron Darcy                         2                      3
+    """
+    # streaming imports this module
+    from streaming import align_to_columns
+
+    # A key column a tier joined on is a single column, and comes as a
+    # suffixed pair from the tiers that did not join on it
+    key_pairs = {column: [f"{column}_fairtrade", f"{column}_reinsw"]
+                 for column in numeric_join_keys + string_join_keys}
+
+    tier_rows = {
+        tier: cascade_df[cascade_df['match_tier'] == tier].reindex(
+            columns=tier_columns[tier])
+        for tier in pd.unique(cascade_df['match_tier'])
+    }
+
+    results = {}
+
+    for idx, result_name in enumerate(merge_mappings, 1):
+        result_dfs = [
+            align_to_columns(rows_df, tier_columns[idx], key_pairs)
+            for tier, rows_df in tier_rows.items()
+            if idx in implied_tiers[tier]
+        ]
+        if result_dfs:
+            result_df = pd.concat(result_dfs, ignore_index=True)
+        else:
+            result_df = cascade_df.iloc[:0].reindex(
+                columns=tier_columns[idx])
+        file_name = f"{idx}_{result_name}.csv"
+        results[file_name] = result_df.reset_index(drop=True)
+
+    return results
+
+
+def merge_cert_dataframes(certificate_df, reinsw_df, merge_mappings=cert_merge_mappings):
     """
     Merge dataframes based on predefined mappings and generate merged results.
 
@@ -481,8 +1112,12 @@ def merge_cert_dataframes(certificate_df, reinsw_df):
     ----------
     certificate_df : pandas.DataFrame
         The dataframe containing data on Fairtrade certificates/licenses.
-    reinsw_df : pandas.DataFrame
-        The dataframe containing data from the NSW government report.
+    reinsw_df : pandas.DataFrame or ReinswIndex
+        The dataframe containing data from the NSW government report,
+        or the ReinswIndex built once from it.
+    merge_mappings : dict
+        The merge tiers to run, e.g. cert_merge_mappings or
+        fuzzy_cert_merge_mappings.
 
     Returns
     -------
@@ -491,16 +1126,6 @@ def merge_cert_dataframes(certificate_df, reinsw_df):
         The keys of the dictionary represent the merge mapping names, and the values
         are the corresponding merged dataframes.
     """
-    merge_mappings = {
-        'match_cert_and_imis_with_license_number': merge_on_license_number,
-        'match_cert_and_imis_with_license_number_and_licensee': merge_on_license_number_and_licensee,
-        'match_cert_and_imis_with_licence_number_licencee_fname_lname': merge_on_licence_number_licencee_fname_lname,
-        'match_cert_and_imis_with_licence_number_licencee_fname_lname_address': merge_on_licence_number_licencee_fname_lname_address,
-        'match_cert_and_imis_with_licensee': merge_on_licencee,
-        'match_cert_and_imis_licencee_fname_lname': merge_on_licencee_fname_lname,
-        'match_cert_and_imis_licencee_fname_lname_address': merge_on_licencee_fname_lname_address,
-    }
-
     return merge_dataframes_with_mappings_and_columns(
         certificate_df,
         reinsw_df,
@@ -508,7 +1133,7 @@ def merge_cert_dataframes(certificate_df, reinsw_df):
         merge_columns_dict)
 
 
-def merge_inv_dataframes(individual_df, reinsw_df):
+def merge_inv_dataframes(individual_df, reinsw_df, merge_mappings=inv_merge_mappings):
     """
     Merge dataframes based on predefined mappings and generate merged results.
 
@@ -516,8 +1141,12 @@ def merge_inv_dataframes(individual_df, reinsw_df):
     ----------
     individual_df : pandas.DataFrame
         The dataframe containing data on Fairtrade certificates/licenses.
-    reinsw_df : pandas.DataFrame
-        The dataframe containing data from the NSW government report.
+    reinsw_df : pandas.DataFrame or ReinswIndex
+        The dataframe containing data from the NSW government report,
+        or the ReinswIndex built once from it.
+    merge_mappings : dict
+        The merge tiers to run, e.g. inv_merge_mappings or
+        fuzzy_inv_merge_mappings.
 
     Returns
     -------
@@ -526,15 +1155,6 @@ def merge_inv_dataframes(individual_df, reinsw_df):
         The keys of the dictionary represent the merge mapping names, and the values
         are the corresponding merged dataframes.
     """
-    merge_mappings = {
-        'match_inv_and_imis_with_license_number': merge_on_license_number,
-        'match_inv_and_imis_with_license_number_and_license': merge_on_license_number_and_licensee,
-        'match_inv_and_imis_with_licence_number_licencee_fname_lname': merge_on_licence_number_licencee_fname_lname,
-        'match_inv_and_imis_licence_number_licencee_fname_lname_address': merge_on_licence_number_licencee_fname_lname_address,
-        'match_inv_and_imis_with_licensee': merge_on_licencee,
-        'match_inv_and_imis_with_licencee_fname_lname': merge_on_licencee_fname_lname,
-        'match_inv_and_imis_licencee_fname_lname_address': merge_on_licencee_fname_lname_address,
-    }
     return merge_dataframes_with_mappings_and_columns(
         individual_df,
         reinsw_df,
@@ -542,12 +1162,77 @@ def merge_inv_dataframes(individual_df, reinsw_df):
         merge_columns_dict)
 
 
+def cascade_merge_cert_dataframes(certificate_df, reinsw_df,
+                                   merge_mappings=cert_merge_mappings):
+    """
+    Merge the certificate dataframe with the NSW report in a single cascade,
+    keeping every record's strongest tier.
+
+    Parameters
+    ----------
+    certificate_df : pandas.DataFrame
+        The dataframe containing data on Fairtrade certificates/licenses.
+    reinsw_df : pandas.DataFrame or ReinswIndex
+        The dataframe containing data from the NSW government report,
+        or the ReinswIndex built once from it.
+    merge_mappings : dict
+        The merge tiers to cascade through, e.g. cert_merge_mappings or
+        fuzzy_cert_merge_mappings.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One merged dataframe with a 'match_tier' column.
+    """
+    return cascade_merge_dataframes_with_mappings_and_columns(
+        certificate_df,
+        reinsw_df,
+        merge_mappings,
+        merge_columns_dict)
+
+
+def cascade_merge_inv_dataframes(individual_df, reinsw_df,
+                                  merge_mappings=inv_merge_mappings):
+    """
+    Merge the individual dataframe with the NSW report in a single cascade,
+    keeping every record's strongest tier.
+
+    Parameters
+    ----------
+    individual_df : pandas.DataFrame
+        The dataframe containing data on Fairtrade individual licenses.
+    reinsw_df : pandas.DataFrame or ReinswIndex
+        The dataframe containing data from the NSW government report,
+        or the ReinswIndex built once from it.
+    merge_mappings : dict
+        The merge tiers to cascade through, e.g. inv_merge_mappings or
+        fuzzy_inv_merge_mappings.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One merged dataframe with a 'match_tier' column.
+    """
+    return cascade_merge_dataframes_with_mappings_and_columns(
+        individual_df,
+        reinsw_df,
+        merge_mappings,
+        merge_columns_dict)
+
+
 def preprocess_lname_fname_address_rename_column_df(fairtrading_df):
     """
     Preprocesses the Fairtrading dataframe by extracting the last name, first name,
     suburb, state, and postcode from the 'Licensee' and 'Address' columns,
     and renames the columns based on predefined mappings.
 
+    The licensee, suburb and state join keys, and the first and last name
+    split from the licensee, are normalized with
+    normalization.normalize_column, as the REINSW join keys are in
+    normalize_join_keys. The 'Licensee', 'Suburb' and 'State' columns keep
+    their original text for the output, as the reinsw_text_columns do on
+    the REINSW side (see keep_reinsw_text).
+
     Parameters
     ----------
     fairtrading_df : pandas.DataFrame
@@ -564,13 +1249,137 @@ def preprocess_lname_fname_address_rename_column_df(fairtrading_df):
     Examples
     --------
     >>> df = pd.DataFrame({'Licensee': ['John Doe'], 'Address': ['10 Oxford St, Epping, NSW 2121']})
-    >>> preprocess_lname_fname_address_rename_column_df(df)
-       Last Name First Name  Suburb  State  Postcode
-    0       Doe       John  Epping    NSW      2121
-    """
-    fairtrading_df[['Last Name', 'First Name']] = fairtrading_df['Licensee'].apply(
-        extract_first_last_name)
-    fairtrading_df[['Suburb', 'State', 'Postcode']
-                   ] = parse_addresses(fairtrading_df['Address'])
-    fairtrading_df = rename_columns(fairtrading_df)
+    >>> df = preprocess_lname_fname_address_rename_column_df(df)
+    >>> df[['last_name', 'first_name', 'suburb', 'state', 'post_code']]
+      last_name first_name  suburb state  post_code
+    0       DOE       JOHN  EPPING   NSW       2121
+    >>> df[['Licensee', 'licensee', 'Suburb']]
+       Licensee  licensee  Suburb
+    0  John Doe  JOHN DOE  Epping
+    """
+    with instrumentation.stage('preprocess',
+                               input_rows=len(fairtrading_df)) as stage:
+        licensees = normalization.normalize_column(fairtrading_df['Licensee'])
+        fairtrading_df[['Last Name', 'First Name']] = extract_first_last_names(
+            licensees)
+        fairtrading_df[['Suburb', 'State', 'Postcode']
+                       ] = parse_address_columns(fairtrading_df['Address'])
+        original_df = fairtrading_df[['Licensee', 'Suburb', 'State']].copy()
+        fairtrading_df = rename_columns(fairtrading_df)
+
+        # The join keys are normalized; the original text is kept next to them
+        fairtrading_df['licensee'] = licensees
+        normalization.normalize_columns(fairtrading_df, ['suburb', 'state'])
+        fairtrading_df[list(original_df.columns)] = original_df
+        stage.output_rows = len(fairtrading_df)
     return fairtrading_df
+
+
+def to_nullable_int(values):
+    """
+    Casts a key column to a nullable int64 column.
+
+    Numeric strings such as '2138.0' and whole floats such as 998454.0
+    become integers; anything else becomes <NA>.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The key column to cast.
+
+    Returns
+    -------
+    pandas.Series
+        The key column as Int64.
+
+    Examples
+    --------
+    >>> to_nullable_int(pd.Series(['2138.0', None, 'N/A', 998454.0])).tolist()
+    [2138, <NA>, <NA>, 998454]
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    return numbers.where(numbers % 1 == 0).astype('Int64')
+
+
+def keep_reinsw_text(reinsw_df):
+    """
+    Copies the string join keys of the REINSW dataframe into the
+    reinsw_text_columns, before normalize_join_keys normalizes them.
+
+    The join keys are normalized for the merges only; like the 'Licensee',
+    'Suburb' and 'State' columns of the Fairtrading side, the copies keep
+    the original text of the report for the output.
+
+    Parameters
+    ----------
+    reinsw_df : pandas.DataFrame
+        The REINSW dataframe, or a chunk of it.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A copy of the dataframe with the reinsw_text_columns added.
+
+    Examples
+    --------
+    >>> reinsw_df = pd.DataFrame({'licensee': ['Lac Tran'], 'suburb': ['Rhodes']})
+    >>> reinsw_df, = normalize_join_keys(keep_reinsw_text(reinsw_df))
+    >>> reinsw_df[['suburb', 'reinsw_suburb']]
+       suburb reinsw_suburb
+    0  RHODES        Rhodes
+    """
+    return reinsw_df.assign(**{
+        text_column: reinsw_df[column]
+        for column, text_column in reinsw_text_columns.items()
+        if column in reinsw_df.columns})
+
+
+def normalize_join_keys(*dataframes):
+    """
+    Normalizes the join keys of several dataframes so they merge on
+    compact, consistently typed columns.
+
+    The numeric_join_keys are cast to a common nullable int64, so an int
+    licence number on the Fairtrading side matches the float one on the
+    REINSW side. The string_join_keys are normalized (see
+    normalization.normalize_text), so e.g. 'Rhodes' matches 'RHODES', and
+    dictionary-encoded as categoricals sharing the same categories across
+    all dataframes, so merges compare integer codes instead of Python
+    strings.
+
+    Parameters
+    ----------
+    *dataframes : pandas.DataFrame
+        The dataframes to normalize, e.g. the certificate, individual and
+        REINSW dataframes. Missing key columns are skipped.
+
+    Returns
+    -------
+    list
+        The normalized copies of the dataframes, in the same order.
+    """
+    dataframes = [dataframe.copy() for dataframe in dataframes]
+
+    for column in numeric_join_keys:
+        for dataframe in dataframes:
+            if column in dataframe.columns:
+                dataframe[column] = to_nullable_int(dataframe[column])
+
+    for column in string_join_keys:
+        keyed_dataframes = [dataframe for dataframe in dataframes
+                            if column in dataframe.columns]
+        if not keyed_dataframes:
+            continue
+
+        for dataframe in keyed_dataframes:
+            dataframe[column] = normalization.normalize_column(
+                dataframe[column])
+
+        categories = pd.Index(pd.unique(pd.concat(
+            [dataframe[column].dropna().astype(object)
+             for dataframe in keyed_dataframes])))
+        for dataframe in keyed_dataframes:
+            dataframe[column] = pd.Categorical(
+                dataframe[column].astype(object), categories=categories)
+
+    return dataframes
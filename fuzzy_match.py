@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+import normalization
+from reinsw_index import ReinswIndex
+
+# Shared trigrams over the trigrams of the shorter name a pair must reach
+FUZZY_THRESHOLD = 0.8
+
+# Fewest shared trigrams a pair needs, so very short names do not match
+# every name containing them
+MIN_SHARED_TRIGRAMS = 4
+
+
+def trigrams(name):
+    """
+    Returns the set of character trigrams of a normalized name, padded
+    with a space on both sides.
+
+    Examples
+    --------
+    >>> sorted(trigrams('LAC'))
+    [' LA', 'AC ', 'LAC']
+    """
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _name_codes(names):
+    """
+    Normalizes names with normalization.normalize_column and encodes them
+    against a vocabulary of the distinct raw names.
+    """
+    codes, uniques = pd.factorize(names.astype(object), use_na_sentinel=True)
+    normalized = normalization.normalize_column(
+        pd.Series(uniques, dtype=object)).fillna('')
+    return codes, normalized
+
+
+def block_keys(dataframe):
+    """
+    Returns the blocking key of every row: its postcode, or its suburb and
+    state when it has no postcode.
+    """
+    post_codes = pd.to_numeric(dataframe['post_code'], errors='coerce')
+    suburbs = dataframe['suburb'].astype(object).str.upper().str.strip() \
+        + '|' + dataframe['state'].astype(object).str.upper().str.strip()
+    keys = post_codes.map(lambda code: f"{int(code)}", na_action='ignore')
+    return keys.astype(object).where(post_codes.notna(), suburbs)
+
+
+def reinsw_names(reinsw_df):
+    """
+    Returns the name of every REINSW row: its first and last name, or its
+    licensee when it has neither.
+    """
+    full_names = (reinsw_df['first_name'].astype(object).fillna('') + ' '
+                  + reinsw_df['last_name'].astype(object).fillna('')).str.strip()
+    return full_names.where(full_names != '',
+                            reinsw_df['licensee'].astype(object))
+
+
+def fuzzy_name_pairs(fairtrade_names, fairtrade_blocks, reinsw_names,
+                     reinsw_blocks, threshold=FUZZY_THRESHOLD,
+                     min_shared_trigrams=MIN_SHARED_TRIGRAMS):
+    """
+    Finds the pairs of similar names sharing a block.
+
+    Both sides are reduced to their distinct (block, normalized name)
+    entities. A character-trigram inverted index keyed by block and trigram
+    then counts the trigrams every pair of entities shares, so only pairs
+    with at least one trigram in common are ever compared. A pair is kept
+    when its shared trigrams reach `min_shared_trigrams` and `threshold`
+    times the trigrams of the shorter name.
+
+    Parameters
+    ----------
+    fairtrade_names, reinsw_names : pandas.Series
+        The raw names of every row of each side.
+    fairtrade_blocks, reinsw_blocks : pandas.Series
+        The blocking key of every row of each side.
+    threshold : float
+        The least similarity kept, between 0 and 1.
+    min_shared_trigrams : int
+        The fewest shared trigrams kept.
+
+    Returns
+    -------
+    pandas.DataFrame
+        'fairtrade_row' and 'reinsw_row' positions of the matched rows and
+        the 'match_score' of each pair.
+    """
+    names = pd.concat([fairtrade_names.astype(object),
+                       reinsw_names.astype(object)], ignore_index=True)
+    blocks = pd.concat([fairtrade_blocks.astype(object),
+                        reinsw_blocks.astype(object)], ignore_index=True)
+    name_codes, normalized_names = _name_codes(names)
+    block_codes, _ = pd.factorize(blocks, use_na_sentinel=True)
+
+    # Trigrams of every distinct normalized name
+    name_trigrams = [trigrams(name) if name else set()
+                     for name in normalized_names]
+    trigram_counts = np.array([len(grams) for grams in name_trigrams])
+    postings = pd.DataFrame(
+        [(name_id, gram) for name_id, grams in enumerate(name_trigrams)
+         for gram in grams],
+        columns=['name_id', 'trigram'])
+    postings['trigram'] = pd.factorize(postings['trigram'])[0]
+
+    # Distinct (block, name) entities of each side
+    valid = (name_codes >= 0) & (block_codes >= 0)
+    entity_keys = block_codes.astype(np.int64) * len(normalized_names) \
+        + name_codes
+    is_fairtrade = np.arange(len(names)) < len(fairtrade_names)
+
+    entities = {}
+    for side, rows in (('fairtrade', valid & is_fairtrade),
+                       ('reinsw', valid & ~is_fairtrade)):
+        side_entities = pd.DataFrame({
+            'row': np.flatnonzero(rows),
+            'entity': entity_keys[rows],
+        })
+        distinct = side_entities.drop_duplicates('entity')
+        inverted_index = pd.DataFrame({
+            'entity': distinct['entity'].to_numpy(),
+            'block': distinct['entity'].to_numpy() // len(normalized_names),
+            'name_id': distinct['entity'].to_numpy() % len(normalized_names),
+        }).merge(postings, on='name_id')
+        entities[side] = (side_entities, inverted_index)
+
+    # Count the trigrams shared by every candidate pair within a block
+    candidates = entities['fairtrade'][1].merge(
+        entities['reinsw'][1], on=['block', 'trigram'],
+        suffixes=['_fairtrade', '_reinsw'])
+    shared = candidates.groupby(
+        ['entity_fairtrade', 'entity_reinsw', 'name_id_fairtrade',
+         'name_id_reinsw'], sort=False).size().rename('shared').reset_index()
+
+    shorter = np.minimum(trigram_counts[shared['name_id_fairtrade']],
+                         trigram_counts[shared['name_id_reinsw']])
+    shared['match_score'] = shared['shared'] / shorter
+    shared = shared[(shared['shared'] >= min_shared_trigrams)
+                    & (shared['match_score'] >= threshold)]
+
+    # Expand the entity pairs back to their rows
+    fairtrade_entities, _ = entities['fairtrade']
+    reinsw_entities, _ = entities['reinsw']
+    pairs = shared[['entity_fairtrade', 'entity_reinsw', 'match_score']] \
+        .merge(fairtrade_entities.rename(columns={
+            'row': 'fairtrade_row', 'entity': 'entity_fairtrade'}),
+            on='entity_fairtrade') \
+        .merge(reinsw_entities.rename(columns={
+            'row': 'reinsw_row', 'entity': 'entity_reinsw'}),
+            on='entity_reinsw')
+    pairs['reinsw_row'] -= len(fairtrade_names)
+
+    return pairs[['fairtrade_row', 'reinsw_row', 'match_score']] \
+        .sort_values(['fairtrade_row', 'reinsw_row'], ignore_index=True)
+
+
+def merge_on_fuzzy_licensee(fairtrade_df, imis_df):
+    """
+    Merges two dataframes on similar licensee names within the same
+    postcode (or suburb and state when there is no postcode).
+
+    Catches names the exact tiers miss, such as '(Ricky) Lac Long Tran'
+    against 'Lac Tran'. Every column present on both sides is suffixed,
+    and a 'match_score' column holds the similarity of each match.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        First dataframe to merge.
+    imis_df : pandas.DataFrame or ReinswIndex
+        Second dataframe or prepared index to merge.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Merged dataframe.
+    """
+    if isinstance(imis_df, ReinswIndex):
+        imis_df = imis_df.reinsw_df
+
+    fairtrade_df = fairtrade_df.reset_index(drop=True)
+    imis_df = imis_df.reset_index(drop=True)
+
+    pairs = fuzzy_name_pairs(fairtrade_df['licensee'],
+                             block_keys(fairtrade_df),
+                             reinsw_names(imis_df),
+                             block_keys(imis_df))
+
+    fairtrade_columns = fairtrade_df.columns
+    reinsw_columns = imis_df.columns
+    fairtrade_part = fairtrade_df.take(pairs['fairtrade_row']).rename(
+        columns={column: f"{column}_fairtrade" for column in fairtrade_columns
+                 if column in reinsw_columns})
+    reinsw_part = imis_df.take(pairs['reinsw_row']).rename(
+        columns={column: f"{column}_reinsw" for column in reinsw_columns
+                 if column in fairtrade_columns})
+
+    return pd.concat(
+        [fairtrade_part.reset_index(drop=True),
+         reinsw_part.reset_index(drop=True),
+         pairs[['match_score']]],
+        axis=1)
@@ -0,0 +1,168 @@
+import json
+import re
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+# Row reference carried through the merges instead of the history column
+ROW_COLUMN = '_reinsw_row'
+
+# One {...} record of a history list
+RECORD_PATTERN = re.compile(r'\{(.*?)\}', re.DOTALL)
+
+# One 'key: value' field of a record; a value runs up to the comma before
+# the next key
+FIELD_PATTERN = re.compile(
+    r'\s*(\w+)\s*:\s*(.*?)\s*(?:,(?=\s*\w+\s*:)|$)', re.DOTALL)
+
+# Values standing for a missing field
+NULL_VALUES = {'', 'null', 'None', 'NULL'}
+
+
+def parse_history(text):
+    """
+    Parses one value of the REINSW 'history' column.
+
+    The column holds lists of records written like JSON without quotes,
+    e.g. '[{licenceID: 1475-QWR, licenceNumber: 1299443}]'. Valid JSON is
+    read as such.
+
+    Parameters
+    ----------
+    text : str
+        The history value.
+
+    Returns
+    -------
+    list
+        One dictionary of field names to string values (or None) per record.
+
+    Examples
+    --------
+    >>> parse_history('[{licenceID: 1475-QWR, licenceNumber: 1299443, status: }]')
+    [{'licenceID': '1475-QWR', 'licenceNumber': '1299443', 'status': None}]
+    >>> parse_history('[]')
+    []
+    """
+    try:
+        records = json.loads(text)
+    except ValueError:
+        records = [
+            dict(FIELD_PATTERN.findall(record))
+            for record in RECORD_PATTERN.findall(text)
+        ]
+    else:
+        if not isinstance(records, list):
+            return []
+        records = [record for record in records if isinstance(record, dict)]
+
+    return [
+        {key: (None if value is None or str(value).strip("'\"") in NULL_VALUES
+               else str(value).strip("'\""))
+         for key, value in record.items()}
+        for record in records
+    ]
+
+
+class ReinswHistory:
+    """
+    The REINSW 'history' column, dictionary-encoded and parsed on demand.
+
+    Every distinct history value is stored once, and rows refer to it by
+    code. The structured side table is only built, and cached, the first
+    time it is asked for, parsing every distinct value once.
+
+    Parameters
+    ----------
+    history : pandas.Series
+        The 'history' column, in REINSW row order.
+    """
+
+    def __init__(self, history):
+        self.codes, self.uniques = pd.factorize(
+            history.astype(object), use_na_sentinel=True)
+
+    @classmethod
+    def from_categorical(cls, history):
+        """
+        Returns the history of a categorical 'history' column whose
+        categories are all used, e.g. one written by column(), without
+        hashing its values again.
+        """
+        reinsw_history = cls.__new__(cls)
+        reinsw_history.codes = history.cat.codes.to_numpy().astype(np.int64)
+        reinsw_history.uniques = history.cat.categories.to_numpy(dtype=object)
+        return reinsw_history
+
+    def column(self, rows):
+        """
+        Returns the history values of REINSW rows, as a categorical.
+        """
+        return pd.Categorical.from_codes(
+            self.codes[np.asarray(rows, dtype=np.int64)],
+            categories=pd.Index(self.uniques, dtype=object))
+
+    def attach(self, result_df, column='history'):
+        """
+        Puts the history column back in place of the row reference of a
+        merged dataframe.
+        """
+        if ROW_COLUMN not in result_df.columns:
+            return result_df
+
+        loc = result_df.columns.get_loc(ROW_COLUMN)
+        history = self.column(result_df[ROW_COLUMN])
+        result_df = result_df.drop(columns=ROW_COLUMN)
+        result_df.insert(loc, column, history)
+        return result_df
+
+    @cached_property
+    def table(self):
+        """
+        The parsed history, one row per record, keyed by REINSW row.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A ROW_COLUMN column plus one string column per history field.
+        """
+        entries = [
+            dict(record, _history_code=code)
+            for code, value in enumerate(self.uniques)
+            if isinstance(value, str)
+            for record in parse_history(value)
+        ]
+        if not entries:
+            return pd.DataFrame({ROW_COLUMN: pd.Series(dtype=np.int64)})
+
+        rows = pd.DataFrame({ROW_COLUMN: np.arange(len(self.codes)),
+                             '_history_code': self.codes})
+        return rows.merge(pd.DataFrame(entries), on='_history_code') \
+            .drop(columns='_history_code')
+
+
+def detach_history(reinsw_df, column='history'):
+    """
+    Replaces the wide history column of the REINSW dataframe with a row
+    reference, so merges copy an integer instead of the history text.
+
+    Parameters
+    ----------
+    reinsw_df : pandas.DataFrame
+        The dataframe containing data from the NSW government report.
+    column : str
+        The history column.
+
+    Returns
+    -------
+    tuple
+        The REINSW dataframe with a ROW_COLUMN column in place of the
+        history column, and the ReinswHistory to attach it back with.
+    """
+    loc = reinsw_df.columns.get_loc(column)
+    reinsw_history = ReinswHistory(reinsw_df[column])
+
+    reinsw_df = reinsw_df.drop(columns=column)
+    reinsw_df.insert(loc, ROW_COLUMN, np.arange(len(reinsw_df)))
+    return reinsw_df, reinsw_history
@@ -0,0 +1,275 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import filter_functions
+import instrumentation
+import result_io
+import streaming
+
+# Options of main.py the incremental merge does not run
+UNSUPPORTED_OPTIONS = [
+    'CASCADE_MATCHING', 'MERGE_PROCESSES', 'REINSW_INDEX_PATH',
+    'REINSW_CACHE_MEMORY_BYTES', 'REINSW_CACHE_DIRECTORY',
+]
+
+# Join key columns kept in the state store for every input row
+join_keys = filter_functions.numeric_join_keys + filter_functions.string_join_keys
+
+
+def row_hashes(dataframe):
+    """
+    Hashes the content of every row of a dataframe.
+
+    A REINSW row edited since the last export hashes differently, e.g.
+    through its 'updated_at' column. Identical rows are told apart by their
+    occurrence number, so a duplicated row is still matched once per copy.
+
+    Parameters
+    ----------
+    dataframe : pandas.DataFrame
+        The dataframe to hash.
+
+    Returns
+    -------
+    numpy.ndarray
+        The uint64 hash of every row.
+    """
+    content_hashes = pd.util.hash_pandas_object(dataframe, index=False)
+    occurrences = content_hashes.groupby(content_hashes).cumcount()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'content': content_hashes.to_numpy(),
+                      'occurrence': occurrences.to_numpy()}),
+        index=False).to_numpy()
+
+
+def column_hashes(dataframe):
+    """
+    Hashes the join key columns of a dataframe, one column at a time.
+
+    Hashes depend on the key values only, so a categorical key hashes the
+    same whatever its categories, and the same as its strings. Unused
+    categories are dropped first, so a handful of changed rows does not
+    hash the whole shared dictionary.
+
+    Parameters
+    ----------
+    dataframe : pandas.DataFrame
+        A dataframe with some of the join_keys columns.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The uint64 hashes of its join key columns.
+    """
+    hashes = {}
+    for column in join_keys:
+        if column not in dataframe.columns:
+            continue
+        values = dataframe[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.remove_unused_categories()
+        hashes[column] = pd.util.hash_pandas_object(
+            values, index=False).to_numpy()
+    return pd.DataFrame(hashes, index=dataframe.index)
+
+
+def key_hashes(hashes_df, merging_on_list):
+    """
+    Combines the column hashes of a join key into one hash per row.
+    """
+    return pd.util.hash_pandas_object(
+        hashes_df[merging_on_list], index=False).to_numpy()
+
+
+def _state_path(state_directory, name):
+    return os.path.join(
+        state_directory, result_io.with_format_extension(name, 'parquet'))
+
+
+def _read_state(path):
+    if not os.path.exists(path):
+        return None
+    return result_io.read_result(path, 'parquet')
+
+
+def _write_state(dataframe, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    result_io.write_result(dataframe, path, 'parquet')
+
+
+def changed_rows(dataframe, previous_rows):
+    """
+    Compares the rows of an input with the ones of the last run.
+
+    Parameters
+    ----------
+    dataframe : pandas.DataFrame
+        The current input dataframe.
+    previous_rows : pandas.DataFrame or None
+        The '_row_hash' and join key columns stored by the last run.
+
+    Returns
+    -------
+    tuple
+        The state rows of the current input, its new or changed rows, and
+        the stored rows that are gone or changed.
+    """
+    hashes = row_hashes(dataframe)
+    current_rows = dataframe[
+        [column for column in join_keys if column in dataframe.columns]
+    ].assign(_row_hash=hashes)
+
+    if previous_rows is None:
+        return current_rows, dataframe, current_rows.iloc[:0]
+
+    added_df = dataframe[~np.isin(hashes, previous_rows['_row_hash'])]
+    removed_df = previous_rows[~previous_rows['_row_hash'].isin(hashes)]
+    return current_rows, added_df, removed_df
+
+
+def update_tier(fairtrade_df, reinsw_df, merge_func, previous_df,
+                changed_hashes_df, fairtrade_hashes_df, reinsw_hashes_df,
+                merge_columns_dict):
+    """
+    Brings the result of one merge tier up to date.
+
+    The rows of a tier result with a given join key only depend on the
+    Fairtrading and REINSW rows with that key, as every tier is a join that
+    at most keeps the first row of each key. So only the keys of changed
+    rows are merged again, and the previous result rows of every other key
+    are kept as they are.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        The current Fairtrading dataframe.
+    reinsw_df : pandas.DataFrame
+        The current REINSW dataframe.
+    merge_func : function
+        The merge function of the tier.
+    previous_df : pandas.DataFrame or None
+        The tier result of the last run; None merges everything.
+    changed_hashes_df : pandas.DataFrame
+        The column hashes of the added and removed rows of both inputs.
+    fairtrade_hashes_df, reinsw_hashes_df : pandas.DataFrame
+        The column hashes of the current inputs.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The tier result, with the kept rows before the updated ones, or
+        previous_df itself when none of its keys changed.
+    """
+    if previous_df is None:
+        return filter_functions.merge_columns_and_drop(
+            merge_func(fairtrade_df.copy(), reinsw_df), merge_columns_dict)
+
+    merging_on_list = filter_functions.merge_keys[merge_func]
+    affected_keys = np.unique(key_hashes(changed_hashes_df, merging_on_list))
+    if not len(affected_keys):
+        return previous_df
+
+    kept_df = previous_df[~np.isin(
+        key_hashes(column_hashes(previous_df), merging_on_list),
+        affected_keys)]
+
+    updated_df = merge_func(
+        fairtrade_df[np.isin(key_hashes(fairtrade_hashes_df, merging_on_list),
+                             affected_keys)].copy(),
+        reinsw_df[np.isin(key_hashes(reinsw_hashes_df, merging_on_list),
+                          affected_keys)])
+    updated_df = filter_functions.merge_columns_and_drop(
+        updated_df, merge_columns_dict)
+    updated_df = streaming.align_to_columns(
+        updated_df, list(previous_df.columns), merge_columns_dict)
+
+    return pd.concat([kept_df, updated_df], ignore_index=True)
+
+
+def incremental_merge(sides, reinsw_df, state_directory,
+                      merge_columns_dict=filter_functions.merge_columns_dict):
+    """
+    Merges Fairtrading dataframes with the REINSW report, re-matching only
+    the rows that changed since the last run.
+
+    The state directory keeps, as Parquet files, the row hashes and join
+    keys of every input and the tier results of the last run. The first run,
+    or a tier without a stored result, merges everything. State files are
+    only rewritten when they changed, and only once every tier has been
+    merged.
+
+    Parameters
+    ----------
+    sides : dict
+        Side names (e.g. 'cert', 'inv') to (fairtrade_df, merge_mappings)
+        tuples, preprocessed and normalized like for merge_cert_dataframes.
+    reinsw_df : pandas.DataFrame
+        The dataframe containing data from the NSW government report.
+    state_directory : str
+        The directory of the state store.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    dict
+        Side names to dictionaries of result file names and merged
+        dataframes, laid out like merge_cert_dataframes and
+        merge_inv_dataframes.
+    """
+    changed_states = {}
+
+    reinsw_rows_path = _state_path(state_directory, 'reinsw_rows')
+    previous_rows = _read_state(reinsw_rows_path)
+    reinsw_rows, reinsw_added_df, reinsw_removed_df = changed_rows(
+        reinsw_df, previous_rows)
+    if previous_rows is None or len(reinsw_added_df) or len(reinsw_removed_df):
+        changed_states[reinsw_rows_path] = reinsw_rows
+
+    reinsw_hashes_df = column_hashes(reinsw_df)
+    reinsw_changed_hashes = [column_hashes(reinsw_added_df),
+                             column_hashes(reinsw_removed_df)]
+
+    results = {}
+
+    for side, (fairtrade_df, merge_mappings) in sides.items():
+        side_rows_path = _state_path(state_directory, f"{side}_rows")
+        previous_rows = _read_state(side_rows_path)
+        side_rows, side_added_df, side_removed_df = changed_rows(
+            fairtrade_df, previous_rows)
+        if previous_rows is None or len(side_added_df) or len(side_removed_df):
+            changed_states[side_rows_path] = side_rows
+
+        fairtrade_hashes_df = column_hashes(fairtrade_df)
+        changed_hashes_df = pd.concat(
+            [column_hashes(side_added_df), column_hashes(side_removed_df)]
+            + reinsw_changed_hashes, ignore_index=True)
+
+        results[side] = {}
+        for idx, (result_name, merge_func) in enumerate(
+                merge_mappings.items(), 1):
+            file_name = f"{idx}_{result_name}.csv"
+            tier_path = _state_path(
+                state_directory, os.path.join(side, file_name))
+            previous_df = _read_state(tier_path)
+
+            with instrumentation.stage('merge', input_rows=len(fairtrade_df),
+                                       side=side, tier=result_name) as stage:
+                result_df = update_tier(
+                    fairtrade_df, reinsw_df, merge_func, previous_df,
+                    changed_hashes_df, fairtrade_hashes_df, reinsw_hashes_df,
+                    merge_columns_dict)
+                stage.output_rows = len(result_df)
+
+            results[side][file_name] = result_df
+            if result_df is not previous_df:
+                changed_states[tier_path] = result_df
+
+    for path, state_df in changed_states.items():
+        _write_state(state_df, path)
+
+    return results
@@ -0,0 +1,243 @@
+import functools
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+import config as _config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Stage records of the current run, appended from several threads
+_records = []
+_records_lock = threading.Lock()
+_run = {}
+
+# Stages whose fan-out is a join blow-up, see finish_run
+FAN_OUT_STAGES = ('join', 'merge')
+
+
+def _peak_rss():
+    """
+    Returns the peak resident memory of the process so far, in bytes.
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage:
+    """
+    Measurements of one pipeline stage.
+
+    Set `output_rows` inside the stage; `input_rows` and any other fields
+    are given when it starts. The join fan-out is the ratio of output to
+    input rows, e.g. above 1 when a tier matches a record to several REINSW
+    rows.
+    """
+
+    def __init__(self, name, input_rows=None, **fields):
+        self.name = name
+        self.input_rows = input_rows
+        self.output_rows = None
+        self.fields = fields
+
+    def record(self, wall_seconds, peak_rss_before):
+        """
+        Returns the stage's structured log record.
+        """
+        peak_rss = _peak_rss()
+        fan_out = (self.output_rows / self.input_rows
+                   if self.input_rows and self.output_rows is not None
+                   else None)
+        return {
+            'event': 'stage',
+            'stage': self.name,
+            **self.fields,
+            'wall_seconds': round(wall_seconds, 6),
+            'input_rows': self.input_rows,
+            'output_rows': self.output_rows,
+            'fan_out': fan_out,
+            'peak_rss_bytes': peak_rss,
+            'peak_rss_growth_bytes': peak_rss - peak_rss_before,
+            'pid': os.getpid(),
+        }
+
+
+def enabled():
+    """
+    Whether stages are measured, see config.INSTRUMENTATION.
+    """
+    return _config.INSTRUMENTATION
+
+
+@contextmanager
+def stage(name, input_rows=None, **fields):
+    """
+    Measures the wall time, row counts and memory of the code it wraps and
+    logs them as one JSON record.
+
+    Peak memory is the process's peak resident memory after the stage, and
+    how much the stage raised it; stages running at the same time on
+    several threads share it. Does nothing but hand out the Stage when
+    instrumentation is disabled.
+
+    Parameters
+    ----------
+    name : str
+        The stage, e.g. 'read', 'preprocess', 'merge' or 'write'.
+    input_rows : int, optional
+        The rows going into the stage.
+    **fields
+        Other values to log with the stage, e.g. the merge tier.
+
+    Yields
+    ------
+    Stage
+        The stage, whose `output_rows` the wrapped code sets.
+    """
+    current_stage = Stage(name, input_rows, **fields)
+    if not enabled():
+        yield current_stage
+        return
+
+    peak_rss_before = _peak_rss()
+    start = time.perf_counter()
+    try:
+        yield current_stage
+    finally:
+        record = current_stage.record(time.perf_counter() - start,
+                                      peak_rss_before)
+        with _records_lock:
+            _records.append(record)
+        logger.info(json.dumps(record, default=str))
+
+
+def run_stage(name, func, *args, input_rows=None, **fields):
+    """
+    Calls `func(*args)` as a stage, counting the rows of the dataframe it
+    returns as the output rows.
+
+    Returns
+    -------
+    object
+        What `func` returned.
+    """
+    import pandas as pd
+
+    with stage(name, input_rows, **fields) as current_stage:
+        result = func(*args)
+        if isinstance(result, pd.DataFrame):
+            current_stage.output_rows = len(result)
+    return result
+
+
+def take_records():
+    """
+    Removes and returns the stage records measured so far in this process,
+    e.g. to hand a worker process's stages to its parent.
+
+    Returns
+    -------
+    list
+        The stage records.
+    """
+    with _records_lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+def add_records(records):
+    """
+    Adds stage records measured in another process, e.g. returned by
+    take_records in a worker, to the current run.
+    """
+    with _records_lock:
+        _records.extend(records)
+
+
+def start_run(name):
+    """
+    Starts collecting the stages of a run.
+    """
+    # Print the records when nothing else configured logging, e.g. when
+    # main.py runs locally; the Lambda runtime has its own handler
+    logging.basicConfig(format='%(message)s')
+
+    with _records_lock:
+        _records.clear()
+    _run.update(name=name, start=time.perf_counter())
+
+
+def finish_run():
+    """
+    Logs and returns the summary of the current run: its wall time and
+    peak memory, the time, rows and largest fan-out of every stage, and
+    the join or merge stage with the largest fan-out.
+
+    Stages measured in worker processes, e.g. with config.MERGE_PROCESSES,
+    are summarized once their records were handed back with add_records.
+
+    Returns
+    -------
+    dict
+        The run summary record.
+    """
+    with _records_lock:
+        records = list(_records)
+
+    stages = {}
+    for record in records:
+        totals = stages.setdefault(record['stage'], {
+            'count': 0, 'wall_seconds': 0.0, 'input_rows': 0,
+            'output_rows': 0, 'max_fan_out': None})
+        totals['count'] += 1
+        totals['wall_seconds'] = round(
+            totals['wall_seconds'] + record['wall_seconds'], 6)
+        totals['input_rows'] += record['input_rows'] or 0
+        totals['output_rows'] += record['output_rows'] or 0
+        if record['fan_out'] is not None:
+            totals['max_fan_out'] = max(totals['max_fan_out'] or 0,
+                                        record['fan_out'])
+
+    summary = {
+        'event': 'run_summary',
+        'run': _run.get('name'),
+        'wall_seconds': round(time.perf_counter() - _run.get(
+            'start', time.perf_counter()), 6),
+        'peak_rss_bytes': _peak_rss(),
+        'stages': stages,
+        'slowest_stage': max(records, key=lambda record: record['wall_seconds'],
+                             default=None),
+        'largest_fan_out': max(
+            (record for record in records
+             if record['stage'] in FAN_OUT_STAGES
+             and record['fan_out'] is not None),
+            key=lambda record: record['fan_out'], default=None),
+    }
+    logger.info(json.dumps(summary, default=str))
+    return summary
+
+
+def instrumented_run(func):
+    """
+    Decorates a pipeline entry point, e.g. main() or a Lambda handler, so
+    every call is a run ending with its summary when instrumentation is
+    enabled.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled():
+            return func(*args, **kwargs)
+
+        start_run(f"{func.__module__}.{func.__name__}")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish_run()
+
+    return wrapper
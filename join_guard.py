@@ -0,0 +1,253 @@
+from typing import NamedTuple
+
+# What happens to the REINSW rows of a key beyond config.JOIN_MAX_CANDIDATES:
+# 'keep' joins them all, 'cap' joins the first ones in REINSW order only,
+# and 'drop' leaves the Fair Trading records of such a key unmatched
+DUPLICATE_POLICIES = ('keep', 'cap', 'drop')
+
+# Rows the memory of a joined row is estimated from, see frame_row_nbytes
+ROW_NBYTES_SAMPLE = 1000
+
+
+class JoinStats(NamedTuple):
+    """
+    Key multiplicity and size of one merge tier join, measured before the
+    joined rows are built.
+
+    input_rows : int
+        The Fair Trading rows joined.
+    matched_rows : int
+        The Fair Trading rows whose key exists on the REINSW side.
+    output_rows : int
+        The joined rows, after the duplicate policy.
+    uncapped_rows : int
+        The joined rows every candidate would give.
+    max_reinsw_multiplicity : int
+        The most REINSW rows sharing a matched key.
+    max_fairtrade_multiplicity : int
+        The most Fair Trading rows sharing a matched key.
+    limited_rows : int
+        The Fair Trading rows with more candidates than the policy allows.
+    """
+    input_rows: int
+    matched_rows: int
+    output_rows: int
+    uncapped_rows: int
+    max_reinsw_multiplicity: int
+    max_fairtrade_multiplicity: int
+    limited_rows: int
+
+    @property
+    def fan_out(self):
+        """
+        The joined rows per Fair Trading row.
+        """
+        return self.output_rows / self.input_rows if self.input_rows else None
+
+
+class JoinExplosionError(ValueError):
+    """
+    Raised before a join whose result would not fit the memory budget.
+    """
+
+    def __init__(self, merging_on_list, stats, max_rows):
+        super().__init__(
+            f"Joining on {list(merging_on_list)} would give "
+            f"{stats.output_rows} rows from {stats.input_rows} "
+            f"(fan-out {stats.fan_out:.1f}, up to "
+            f"{stats.max_reinsw_multiplicity} REINSW rows per key), more "
+            f"than the {max_rows} rows the memory budget allows; set "
+            f"config.JOIN_DUPLICATE_POLICY to 'cap' or 'drop'")
+        self.merging_on_list = list(merging_on_list)
+        self.stats = stats
+        self.max_rows = max_rows
+
+
+def max_rows(memory_budget, row_nbytes):
+    """
+    Returns the most joined rows of `row_nbytes` bytes each that fit the
+    memory budget, or None for no limit.
+    """
+    if not row_nbytes:
+        return None
+    return int(memory_budget // row_nbytes)
+
+
+def frame_row_nbytes(dataframe, sample_rows=ROW_NBYTES_SAMPLE):
+    """
+    Returns the average memory of one row of a dataframe, in bytes,
+    estimated from its first `sample_rows` rows. Categorical columns count
+    their codes only, as the joined rows share their categories.
+    """
+    import pandas as pd
+
+    sample_df = dataframe.iloc[:sample_rows]
+    if not len(sample_df):
+        return 0.0
+
+    nbytes = 0
+    for _, values in sample_df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            nbytes += values.cat.codes.nbytes
+        else:
+            nbytes += values.memory_usage(index=False, deep=True)
+    return nbytes / len(sample_df)
+
+
+def key_sizes(dataframe, merging_on_list, name='size'):
+    """
+    Returns the rows of every key of a dataframe, with missing keys
+    grouped together like pandas.merge matches them.
+    """
+    return dataframe.groupby(merging_on_list, dropna=False, observed=True,
+                             sort=False).size().rename(name)
+
+
+def _key_codes(fairtrade_df, reinsw_df, merging_on_list):
+    """
+    Returns integer codes of the keys of both dataframes, equal where their
+    keys are equal. Missing values are equal to each other, like in
+    pandas.merge.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fairtrade_codes = np.zeros(len(fairtrade_df), dtype=np.int64)
+    reinsw_codes = np.zeros(len(reinsw_df), dtype=np.int64)
+    radix = 1
+    for column in merging_on_list:
+        fairtrade_values = fairtrade_df[column]
+        reinsw_values = reinsw_df[column]
+
+        if isinstance(fairtrade_values.dtype, pd.CategoricalDtype):
+            # Encoded against the Fair Trading categories: 0 for missing,
+            # and the last code for REINSW values outside them
+            categories = fairtrade_values.cat.categories
+            fairtrade_column = fairtrade_values.cat.codes.to_numpy(np.int64) + 1
+            if isinstance(reinsw_values.dtype, pd.CategoricalDtype) and \
+                    reinsw_values.cat.categories.equals(categories):
+                reinsw_column = reinsw_values.cat.codes.to_numpy(np.int64) + 1
+            else:
+                reinsw_column = categories.get_indexer(reinsw_values) + 1
+                reinsw_column[reinsw_column == 0] = len(categories) + 1
+                reinsw_column[reinsw_values.isna().to_numpy()] = 0
+            size = len(categories) + 2
+        else:
+            column_codes, uniques = pd.factorize(
+                pd.concat([fairtrade_values, reinsw_values], ignore_index=True),
+                use_na_sentinel=False)
+            fairtrade_column = column_codes[:len(fairtrade_df)]
+            reinsw_column = column_codes[len(fairtrade_df):]
+            size = len(uniques)
+
+        # The codes so far are compacted before they would overflow
+        if radix * size >= 2 ** 62:
+            codes, uniques = pd.factorize(
+                np.concatenate([fairtrade_codes, reinsw_codes]))
+            fairtrade_codes = codes[:len(fairtrade_df)].astype(np.int64)
+            reinsw_codes = codes[len(fairtrade_df):].astype(np.int64)
+            radix = len(uniques)
+        fairtrade_codes = fairtrade_codes * size + fairtrade_column
+        reinsw_codes = reinsw_codes * size + reinsw_column
+        radix *= size
+
+    return fairtrade_codes, reinsw_codes
+
+
+def join_rows(fairtrade_df, reinsw_df, merging_on_list):
+    """
+    Returns how many rows pandas.merge would join two dataframes into on
+    merging_on_list, without joining them.
+
+    The keys of both sides are encoded as integers, the REINSW key groups
+    are counted once and every Fair Trading key is looked up in them.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fairtrade_codes, reinsw_codes = _key_codes(fairtrade_df, reinsw_df,
+                                               merging_on_list)
+    reinsw_keys, reinsw_uniques = pd.factorize(reinsw_codes)
+    reinsw_sizes = np.bincount(reinsw_keys, minlength=len(reinsw_uniques))
+    positions = pd.Index(reinsw_uniques).get_indexer(fairtrade_codes)
+    return int(reinsw_sizes[positions[positions >= 0]].sum())
+
+
+def limit_candidates(reinsw_df, merging_on_list, max_candidates,
+                     drop_ambiguous=False):
+    """
+    Pre-aggregates the duplicate candidate groups of a REINSW dataframe
+    before it is joined on merging_on_list, e.g. by pandas.merge for a
+    streamed chunk: keeps the first `max_candidates` rows of every key, or
+    drops the keys with more rows with drop_ambiguous.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The REINSW rows left to join.
+    """
+    groups = reinsw_df.groupby(merging_on_list, dropna=False, observed=True,
+                               sort=False)
+    if drop_ambiguous:
+        return reinsw_df[groups[merging_on_list[0]].transform('size')
+                         <= max_candidates]
+    return reinsw_df[groups.cumcount() < max_candidates]
+
+
+def frame_join_stats(fairtrade_df, reinsw_df, merging_on_list,
+                     limited_reinsw_df=None):
+    """
+    Measures the key multiplicity of both dataframes and the rows
+    pandas.merge would join them into, without joining them.
+
+    Parameters
+    ----------
+    fairtrade_df : pandas.DataFrame
+        The Fair Trading dataframe.
+    reinsw_df : pandas.DataFrame
+        The REINSW dataframe.
+    merging_on_list : list
+        The key columns.
+    limited_reinsw_df : pandas.DataFrame, optional
+        The REINSW rows left by limit_candidates, if it was applied.
+
+    Returns
+    -------
+    JoinStats
+        The stats of the join.
+    """
+    import pandas as pd
+
+    fairtrade_sizes = key_sizes(fairtrade_df, merging_on_list,
+                                'fairtrade').reset_index()
+    sizes = pd.merge(fairtrade_sizes,
+                     key_sizes(reinsw_df, merging_on_list,
+                               'reinsw').reset_index(),
+                     on=merging_on_list)
+    uncapped_rows = int((sizes['fairtrade'] * sizes['reinsw']).sum())
+
+    output_rows = uncapped_rows
+    limited_rows = 0
+    if limited_reinsw_df is not None:
+        limited_sizes = pd.merge(
+            fairtrade_sizes,
+            key_sizes(limited_reinsw_df, merging_on_list,
+                      'reinsw').reset_index(),
+            on=merging_on_list)
+        output_rows = int(
+            (limited_sizes['fairtrade'] * limited_sizes['reinsw']).sum())
+        limited = pd.merge(sizes, limited_sizes, on=merging_on_list,
+                           how='left', suffixes=('', '_limited'))
+        limited_rows = int(limited.loc[
+            limited['reinsw_limited'].fillna(0) < limited['reinsw'],
+            'fairtrade'].sum())
+
+    return JoinStats(
+        input_rows=len(fairtrade_df),
+        matched_rows=int(sizes['fairtrade'].sum()),
+        output_rows=output_rows,
+        uncapped_rows=uncapped_rows,
+        max_reinsw_multiplicity=int(sizes['reinsw'].max()) if len(sizes) else 0,
+        max_fairtrade_multiplicity=(int(sizes['fairtrade'].max())
+                                    if len(sizes) else 0),
+        limited_rows=limited_rows)
@@ -1,11 +1,59 @@
-import pandas as pd
 import config as _config
-import filter_functions
+import instrumentation
+import result_io
+import s3_upload
 from concurrent.futures import ThreadPoolExecutor
-import io
-import boto3
+import os
 
 
+def stream_and_upload_results(certificate_df, individual_df, reinsw_chunks,
+                              cert_merge_mappings=None,
+                              inv_merge_mappings=None):
+    """
+    Streams the REINSW report chunk by chunk through every merge tier
+    of `cert_merge_mappings` and `inv_merge_mappings` (by default
+    filter_functions.cert_merge_mappings and inv_merge_mappings), appending
+    the results to files in the Lambda's local storage, and uploads the
+    finished files to S3.
+
+    Only one REINSW chunk is held in memory at a time, so reports larger
+    than the Lambda's memory can be processed.
+    """
+    import filter_functions
+    import streaming
+
+    if cert_merge_mappings is None:
+        cert_merge_mappings = filter_functions.cert_merge_mappings
+    if inv_merge_mappings is None:
+        inv_merge_mappings = filter_functions.inv_merge_mappings
+
+    output_directories = {
+        "result_cer_reinsw/": os.path.join(
+            _config.STREAMING_LOCAL_DIRECTORY, "result_cer_reinsw"),
+        "result_inv_reinsw/": os.path.join(
+            _config.STREAMING_LOCAL_DIRECTORY, "result_inv_reinsw"),
+    }
+    for local_directory in output_directories.values():
+        os.makedirs(local_directory, exist_ok=True)
+
+    record_counts = streaming.stream_merge_to_csv(
+        [(certificate_df, cert_merge_mappings,
+          output_directories["result_cer_reinsw/"]),
+         (individual_df, inv_merge_mappings,
+          output_directories["result_inv_reinsw/"])],
+        reinsw_chunks)
+
+    s3_upload.upload_files(
+        s3_upload.get_s3_client(_config.S3_LOCAL_DIRECTORY),
+        _config.S3_BUCKET_NAME,
+        {f"{s3_directory}{file_name}": os.path.join(local_directory, file_name)
+         for s3_directory, local_directory in output_directories.items()
+         for file_name in os.listdir(local_directory)
+         if os.path.join(local_directory, file_name) in record_counts},
+        max_workers=_config.S3_UPLOAD_CONCURRENCY)
+
+
+@instrumentation.instrumented_run
 def lambda_handler(event, context):
     """
     Lambda function handler to process dataframes, merge data,
@@ -18,18 +66,80 @@ def lambda_handler(event, context):
     based on matching fields, and uploads the resulting dataframes
     to separate CSV files in an S3 bucket.
     """
+    # Fail before reading anything when streaming would leave out other
+    # options
+    if _config.REINSW_CHUNKSIZE:
+        import streaming
+
+        streaming.check_options('Streaming with REINSW_CHUNKSIZE',
+                                streaming.UNSUPPORTED_OPTIONS)
+
+    # The pipeline is imported on the first invocation rather than when the
+    # Lambda loads this module; the streaming and fused paths import what
+    # only they need
+    with instrumentation.stage('import'):
+        import filter_functions
+        import history
+        import schemas
+        from reinsw_index import ReinswIndex
 
     # Read input CSV files from S3
-    s3 = boto3.client('s3')
+    s3 = s3_upload.get_s3_client(_config.S3_LOCAL_DIRECTORY)
     individual_file = s3.get_object(
         Bucket=_config.S3_BUCKET_NAME, Key=_config.INDIVIDUAL_FILE_KEY)
     certificate_file = s3.get_object(
         Bucket=_config.S3_BUCKET_NAME, Key=_config.CERTIFICATE_FILE_KEY)
-    reinsw_file = s3.get_object(
-        Bucket=_config.S3_BUCKET_NAME, Key=_config.REINSW_FILE_KEY)
-    individual_df = pd.read_csv(individual_file['Body'])
-    certificate_df = pd.read_csv(certificate_file['Body'])
-    reinsw_df = pd.read_csv(reinsw_file['Body'])
+    individual_df = instrumentation.run_stage(
+        'read', schemas.read_input_csv,
+        individual_file['Body'], schemas.SCHEMAS['individual'],
+        file=_config.INDIVIDUAL_FILE_KEY)
+    certificate_df = instrumentation.run_stage(
+        'read', schemas.read_input_csv,
+        certificate_file['Body'], schemas.SCHEMAS['certificate'],
+        file=_config.CERTIFICATE_FILE_KEY)
+    # The prepared REINSW report, with its join index, is mapped from a
+    # prebuilt index file, or kept by a warm container; either is only used
+    # while a HEAD request finds the report's ETag unchanged
+    prepared_reinsw = None
+    if _config.REINSW_CHUNKSIZE:
+        reinsw_file = s3.get_object(
+            Bucket=_config.S3_BUCKET_NAME, Key=_config.REINSW_FILE_KEY)
+        reinsw_df = schemas.read_input_csv_chunks(
+            reinsw_file['Body'], schemas.SCHEMAS['reinsw'],
+            _config.REINSW_CHUNKSIZE)
+    elif _config.REINSW_INDEX_PATH:
+        import reinsw_index_file
+
+        with instrumentation.stage('read',
+                                   file=_config.REINSW_INDEX_PATH) as stage:
+            prepared_reinsw = reinsw_index_file.load_s3_index_file(
+                _config.REINSW_INDEX_PATH, s3, _config.S3_BUCKET_NAME,
+                _config.REINSW_FILE_KEY, _config.REINSW_CACHE_MEMORY_BYTES)
+            stage.output_rows = len(prepared_reinsw.reinsw_df)
+    elif _config.REINSW_CACHE_MEMORY_BYTES:
+        import reinsw_cache
+
+        with instrumentation.stage('read',
+                                   file=_config.REINSW_FILE_KEY) as stage:
+            prepared_reinsw = reinsw_cache.load_s3_reinsw(
+                s3, _config.S3_BUCKET_NAME, _config.REINSW_FILE_KEY,
+                _config.REINSW_CACHE_MEMORY_BYTES)
+            stage.output_rows = len(prepared_reinsw.reinsw_df)
+    else:
+        reinsw_file = s3.get_object(
+            Bucket=_config.S3_BUCKET_NAME, Key=_config.REINSW_FILE_KEY)
+        reinsw_df = instrumentation.run_stage(
+            'read', schemas.read_input_csv,
+            reinsw_file['Body'], schemas.SCHEMAS['reinsw'],
+            file=_config.REINSW_FILE_KEY)
+
+    # Merge tiers of each side, with the fuzzy tier when enabled
+    if _config.FUZZY_MATCHING:
+        cert_merge_mappings = filter_functions.fuzzy_cert_merge_mappings
+        inv_merge_mappings = filter_functions.fuzzy_inv_merge_mappings
+    else:
+        cert_merge_mappings = filter_functions.cert_merge_mappings
+        inv_merge_mappings = filter_functions.inv_merge_mappings
 
     # Preprocess dataframes
     with ThreadPoolExecutor() as executor:
@@ -40,25 +150,84 @@ def lambda_handler(event, context):
         individual_df = individual_df.result()
         certificate_df = certificate_df.result()
 
-    # Merge dataframes with reinsw_df
-    merged_cert_results = filter_functions.merge_cert_dataframes(
-        certificate_df, reinsw_df)
-    merged_inv_results = filter_functions.merge_inv_dataframes(
-        individual_df, reinsw_df)
+    # Stream the REINSW report chunk by chunk into local files, then upload
+    if _config.REINSW_CHUNKSIZE:
+        certificate_df, individual_df = filter_functions.normalize_join_keys(
+            certificate_df, individual_df)
+        stream_and_upload_results(certificate_df, individual_df, reinsw_df,
+                                  cert_merge_mappings, inv_merge_mappings)
+        return
 
-    # Upload merged results to S3
-    s3_resource = boto3.resource('s3')
-    output_bucket = s3_resource.Bucket(_config.S3_BUCKET_NAME)
+    if prepared_reinsw is not None:
+        # The cached report was normalized and indexed on its own
+        certificate_df, individual_df = filter_functions.normalize_join_keys(
+            certificate_df, individual_df)
+        reinsw_df, reinsw_history, reinsw_index = prepared_reinsw
+    else:
+        # Share typed, dictionary-encoded join keys between all three
+        # dataframes
+        certificate_df, individual_df, reinsw_df = \
+            filter_functions.normalize_join_keys(
+                certificate_df, individual_df,
+                filter_functions.keep_reinsw_text(reinsw_df))
 
-    with ThreadPoolExecutor() as executor:
-        for result_name, result_df in merged_cert_results.items():
-            file_contents = result_df.to_csv(index=False)
-            file_obj = io.BytesIO(file_contents.encode())
-            output_bucket.upload_fileobj(
-                file_obj, f"result_cer_reinsw/{result_name}.csv")
+        # Build the REINSW join index once and share it between both sides.
+        # The merges carry a row reference instead of the wide history
+        # column, which is put back once merged
+        reinsw_df, reinsw_history = history.detach_history(reinsw_df)
+        reinsw_index = ReinswIndex(reinsw_df)
+
+    # Merge dataframes with reinsw_index
+    if _config.CASCADE_MATCHING:
+        merged_cert_results = filter_functions.split_cascade_result(
+            filter_functions.cascade_merge_cert_dataframes(
+                certificate_df, reinsw_index, cert_merge_mappings),
+            cert_merge_mappings,
+            filter_functions.merge_tier_columns(
+                certificate_df, reinsw_index, cert_merge_mappings))
+        merged_inv_results = filter_functions.split_cascade_result(
+            filter_functions.cascade_merge_inv_dataframes(
+                individual_df, reinsw_index, inv_merge_mappings),
+            inv_merge_mappings,
+            filter_functions.merge_tier_columns(
+                individual_df, reinsw_index, inv_merge_mappings))
+    else:
+        merged_cert_results = filter_functions.merge_cert_dataframes(
+            certificate_df, reinsw_index, cert_merge_mappings)
+        merged_inv_results = filter_functions.merge_inv_dataframes(
+            individual_df, reinsw_index, inv_merge_mappings)
 
+    # Put the history column back in place of the row reference
+    merged_cert_results = {result_name: reinsw_history.attach(result_df)
+                           for result_name, result_df in merged_cert_results.items()}
+    merged_inv_results = {result_name: reinsw_history.attach(result_df)
+                          for result_name, result_df in merged_inv_results.items()}
+
+    # Stream every merged result into its own upload, several at a time
+    results = {}
+    if _config.WRITE_TIER_RESULTS or not _config.FUSED_PIPELINE:
+        for result_name, result_df in merged_cert_results.items():
+            results[result_io.with_format_extension(
+                f"result_cer_reinsw/{result_name}", _config.OUTPUT_FORMAT)] = result_df
         for result_name, result_df in merged_inv_results.items():
-            file_contents = result_df.to_csv(index=False)
-            file_obj = io.BytesIO(file_contents.encode())
-            output_bucket.upload_fileobj(
-                file_obj, f"result_inv_reinsw/{result_name}.csv")
+            results[result_io.with_format_extension(
+                f"result_inv_reinsw/{result_name}", _config.OUTPUT_FORMAT)] = result_df
+
+    # Upload the concatenated individual and certificate results as well,
+    # which saves the lambda_match_cer_inv invocation and its downloads
+    if _config.FUSED_PIPELINE:
+        import lambda_match_cer_inv
+        import match_cer_inv
+
+        combined_results = match_cer_inv.concat_results(
+            merged_inv_results, merged_cert_results)
+        for i, result_df in enumerate(combined_results.values()):
+            results[lambda_match_cer_inv.combined_result_key(i)] = result_df
+
+    with instrumentation.stage(
+            'upload', input_rows=sum(len(result_df) for result_df in results.values()),
+            files=len(results)):
+        s3_upload.upload_results(
+            s3, _config.S3_BUCKET_NAME, results, _config.OUTPUT_FORMAT,
+            max_workers=_config.S3_UPLOAD_CONCURRENCY,
+            part_size=_config.S3_UPLOAD_PART_SIZE)
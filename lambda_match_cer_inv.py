@@ -1,12 +1,20 @@
-import pandas as pd
 import config as _config
-import boto3
+import instrumentation
 import io
+import result_io
+import s3_upload
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# The names of the result datasets
+result_names = ['result_on_lic_num', 'result_on_lic_num_lic', 'result_on_lic_num_lic_lname_fname',
+                'result_on_full_condition', 'result_on_lic', 'result_on_lic_lname_fname',
+                'result_on_lic_lname_fname_address', 'result_on_fuzzy_licensee']
 
 
 def get_dataframe_from_s3(s3_client, bucket_name, key):
     """
-    Fetches an object from an S3 bucket and converts it to a pandas DataFrame.
+    Fetches an object from an S3 bucket and converts it to a pandas DataFrame,
+    reading it as CSV, Parquet or Arrow from the key's extension.
 
     Args:
     s3_client: boto3 S3 client object.
@@ -17,12 +25,21 @@ def get_dataframe_from_s3(s3_client, bucket_name, key):
     A pandas DataFrame containing the data from the S3 object.
     """
     s3_obj = s3_client.get_object(Bucket=bucket_name, Key=key)
-    return pd.read_csv(io.BytesIO(s3_obj['Body'].read()))
+    output_format = result_io.format_of(key)
+
+    # CSV is parsed straight from the streaming body; Parquet and Arrow
+    # need random access to their footer, and BytesIO shares the read bytes
+    # rather than copying them
+    if output_format == 'csv':
+        return result_io.read_result(s3_obj['Body'], output_format)
+    return result_io.read_result(io.BytesIO(s3_obj['Body'].read()),
+                                 output_format)
 
 
 def upload_dataframe_to_s3(s3_client, df, bucket_name, key):
     """
-    Converts a pandas DataFrame to a CSV and uploads it to an S3 bucket.
+    Converts a pandas DataFrame to a CSV, Parquet or Arrow file (from the
+    key's extension), streaming it into a multipart upload to an S3 bucket.
 
     Args:
     s3_client: boto3 S3 client object.
@@ -30,12 +47,40 @@ def upload_dataframe_to_s3(s3_client, df, bucket_name, key):
     bucket_name: The name of the S3 bucket.
     key: The key (path) where the object will be stored within the S3 bucket.
     """
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    s3_client.put_object(Body=csv_buffer.getvalue(),
-                         Bucket=bucket_name, Key=key)
+    s3_upload.upload_result(s3_client, bucket_name, key, df,
+                            result_io.format_of(key),
+                            part_size=_config.S3_UPLOAD_PART_SIZE)
+
+
+def upload_concatenated_pair(s3_client, ind_df, cert_df, bucket_name, key):
+    """
+    Concatenates an individual and a certificate dataframe and uploads the
+    result to an S3 bucket.
+
+    Args:
+    s3_client: boto3 S3 client object.
+    ind_df: The individual result dataframe.
+    cert_df: The certificate result dataframe.
+    bucket_name: The name of the S3 bucket.
+    key: The key (path) where the object will be stored within the S3 bucket.
+    """
+    import pandas as pd
 
+    upload_dataframe_to_s3(s3_client, pd.concat([ind_df, cert_df]),
+                           bucket_name, key)
 
+
+def combined_result_key(i):
+    """
+    Returns the S3 key of the i-th (0-based) concatenated result, in the
+    configured format.
+    """
+    return result_io.with_format_extension(
+        f'result-individual-and-certificates/{i+1}_{result_names[i]}.csv',
+        _config.OUTPUT_FORMAT)
+
+
+@instrumentation.instrumented_run
 def lambda_handler(event, context):
     """
     Lambda function handler that processes dataframes, merges data, and uploads
@@ -48,7 +93,12 @@ def lambda_handler(event, context):
     Returns:
     A dictionary with information about the operation's status.
     """
-    s3_client = boto3.client('s3')
+    # pandas is imported on the first invocation rather than when the
+    # Lambda loads this module, and before the download threads need it
+    with instrumentation.stage('import'):
+        import pandas  # noqa: F401
+
+    s3_client = s3_upload.get_s3_client(_config.S3_LOCAL_DIRECTORY)
     bucket_name = _config.S3_BUCKET_NAME
 
     # List of S3 keys (paths)
@@ -62,28 +112,48 @@ def lambda_handler(event, context):
                         _config.S3_CERTIFICATE_LIC, _config.S3_CERTIFICATE_LIC_FNAME_LNAME,
                         _config.S3_CERTIFICATE_LIC_FNAME_LNAME_ADDRESS]
 
+    # Read and write the results in the configured format
+    individual_keys = [result_io.with_format_extension(
+        key, _config.OUTPUT_FORMAT) for key in individual_keys]
+    certificate_keys = [result_io.with_format_extension(
+        key, _config.OUTPUT_FORMAT) for key in certificate_keys]
+
     # Ensure that there is the same number of individual and certificate keys
     assert len(individual_keys) == len(certificate_keys), \
         "There should be the same number of individual and certificate keys!"
 
-    # The names of the result datasets
-    result_names = ['result_on_lic_num', 'result_on_lic_num_lic', 'result_on_lic_num_lic_lname_fname',
-                    'result_on_full_condition', 'result_on_lic', 'result_on_lic_lname_fname',
-                    'result_on_lic_lname_fname_address']
-
-    # Iterate over the keys and process the data
-    for i, (ind_key, cert_key, result_name) in enumerate(zip(individual_keys, certificate_keys, result_names)):
-        ind_df = get_dataframe_from_s3(s3_client, bucket_name, ind_key)
-        cert_df = get_dataframe_from_s3(s3_client, bucket_name, cert_key)
-
-        # Concatenate the two dataframes
-        result_df = pd.concat([ind_df, cert_df])
-
-        # Prepare the key for the upload
-        file_key = f'result-individual-and-certificates/{i+1}_{result_name}.csv'
-
-        # Upload the result dataframe to S3
-        upload_dataframe_to_s3(s3_client, result_df, bucket_name, file_key)
+    # Start every download at once, and concatenate and upload each pair as
+    # soon as both of its sides have arrived
+    with ThreadPoolExecutor(max_workers=len(individual_keys) + len(certificate_keys)) as download_executor, \
+            ThreadPoolExecutor(max_workers=_config.S3_UPLOAD_CONCURRENCY) as upload_executor:
+        downloads = {}
+        for i, (ind_key, cert_key) in enumerate(zip(individual_keys, certificate_keys)):
+            downloads[download_executor.submit(
+                get_dataframe_from_s3, s3_client, bucket_name, ind_key)] = (i, 0)
+            downloads[download_executor.submit(
+                get_dataframe_from_s3, s3_client, bucket_name, cert_key)] = (i, 1)
+
+        arrived_pairs = {}
+        uploads = []
+        for future in as_completed(downloads):
+            i, side = downloads[future]
+            pair = arrived_pairs.setdefault(i, [None, None])
+            pair[side] = future.result()
+            if pair[0] is None or pair[1] is None:
+                continue
+
+            # Prepare the key for the upload
+            file_key = combined_result_key(i)
+
+            # Upload the concatenated dataframes to S3
+            uploads.append(upload_executor.submit(
+                upload_concatenated_pair, s3_client, pair[0], pair[1],
+                bucket_name, file_key))
+            del arrived_pairs[i]
+
+        # Raise the first failed upload, if any
+        for future in uploads:
+            future.result()
 
     return {
         'statusCode': 200,
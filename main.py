@@ -1,9 +1,20 @@
-import pandas as pd
 import config as _config
 import filter_functions
+import history
+import incremental
+import instrumentation
+import match_cer_inv
+import parallel_merge
+import reinsw_cache
+import reinsw_index_file
+import result_io
+import schemas
+import streaming
+from reinsw_index import ReinswIndex
 from concurrent.futures import ThreadPoolExecutor
 
 
+@instrumentation.instrumented_run
 def main():
     """
     Main function to process dataframes, merge data,
@@ -17,10 +28,56 @@ def main():
     to separate CSV files.
     """
 
+    # Fail before reading anything when the configured mode would leave
+    # out other options
+    if _config.REINSW_CHUNKSIZE:
+        streaming.check_options('Streaming with REINSW_CHUNKSIZE',
+                                streaming.UNSUPPORTED_OPTIONS)
+    elif _config.INCREMENTAL_STATE_DIRECTORY:
+        streaming.check_options('The incremental merge',
+                                incremental.UNSUPPORTED_OPTIONS)
+
     # Read input CSV files
-    individual_df = pd.read_csv(_config.INDIVIDUAL_ORIGINAL_PATH)
-    certificate_df = pd.read_csv(_config.CERTIFICATE_ORIGINAL_PATH)
-    reinsw_df = pd.read_csv(_config.REINSW_PATH)
+    individual_df = instrumentation.run_stage(
+        'read', schemas.read_input_csv,
+        _config.INDIVIDUAL_ORIGINAL_PATH, schemas.SCHEMAS['individual'],
+        file=_config.INDIVIDUAL_ORIGINAL_PATH)
+    certificate_df = instrumentation.run_stage(
+        'read', schemas.read_input_csv,
+        _config.CERTIFICATE_ORIGINAL_PATH, schemas.SCHEMAS['certificate'],
+        file=_config.CERTIFICATE_ORIGINAL_PATH)
+    # The REINSW report comes prepared, with its join index, from the index
+    # file or the cache while it is unchanged
+    prepared_reinsw = None
+    if _config.REINSW_CHUNKSIZE:
+        reinsw_df = schemas.read_input_csv_chunks(
+            _config.REINSW_PATH, schemas.SCHEMAS['reinsw'],
+            _config.REINSW_CHUNKSIZE)
+    elif _config.REINSW_INDEX_PATH:
+        with instrumentation.stage('read',
+                                   file=_config.REINSW_INDEX_PATH) as stage:
+            prepared_reinsw = reinsw_index_file.load_index_file(
+                _config.REINSW_INDEX_PATH, _config.REINSW_PATH)
+            stage.output_rows = len(prepared_reinsw.reinsw_df)
+    elif _config.REINSW_CACHE_MEMORY_BYTES or _config.REINSW_CACHE_DIRECTORY:
+        with instrumentation.stage('read', file=_config.REINSW_PATH) as stage:
+            prepared_reinsw = reinsw_cache.load_local_reinsw(
+                _config.REINSW_PATH, _config.REINSW_CACHE_MEMORY_BYTES,
+                _config.REINSW_CACHE_DIRECTORY)
+            stage.output_rows = len(prepared_reinsw.reinsw_df)
+    else:
+        reinsw_df = instrumentation.run_stage(
+            'read', schemas.read_input_csv,
+            _config.REINSW_PATH, schemas.SCHEMAS['reinsw'],
+            file=_config.REINSW_PATH)
+
+    # Merge tiers of each side, with the fuzzy tier when enabled
+    if _config.FUZZY_MATCHING:
+        cert_merge_mappings = filter_functions.fuzzy_cert_merge_mappings
+        inv_merge_mappings = filter_functions.fuzzy_inv_merge_mappings
+    else:
+        cert_merge_mappings = filter_functions.cert_merge_mappings
+        inv_merge_mappings = filter_functions.inv_merge_mappings
 
     # Preprocess dataframes
     with ThreadPoolExecutor() as executor:
@@ -31,24 +88,115 @@ def main():
         individual_df = individual_df.result()
         certificate_df = certificate_df.result()
 
-    # Merge dataframes with reinsw_df
-    merged_cert_results = filter_functions.merge_cert_dataframes(
-        certificate_df, reinsw_df)
-    merged_inv_results = filter_functions.merge_inv_dataframes(
-        individual_df, reinsw_df)
+    # Stream the REINSW report chunk by chunk, writing results as it goes
+    if _config.REINSW_CHUNKSIZE:
+        certificate_df, individual_df = filter_functions.normalize_join_keys(
+            certificate_df, individual_df)
+        streaming.stream_merge_to_csv(
+            [(certificate_df, cert_merge_mappings,
+              "result_cer_reinsw/"),
+             (individual_df, inv_merge_mappings,
+              "result_inv_reinsw/")],
+            reinsw_df)
+        return
+
+    if prepared_reinsw is not None:
+        # The cached report was normalized and indexed on its own
+        certificate_df, individual_df = filter_functions.normalize_join_keys(
+            certificate_df, individual_df)
+        reinsw_df, reinsw_history, reinsw_index = prepared_reinsw
+    else:
+        # Share typed, dictionary-encoded join keys between all three
+        # dataframes
+        certificate_df, individual_df, reinsw_df = \
+            filter_functions.normalize_join_keys(
+                certificate_df, individual_df,
+                filter_functions.keep_reinsw_text(reinsw_df))
+
+        # Build the REINSW join index once and share it between both sides;
+        # the incremental merge only joins the changed keys and goes without
+        # it. The merges carry a row reference instead of the wide history
+        # column, which is put back once merged
+        if not _config.INCREMENTAL_STATE_DIRECTORY:
+            reinsw_df, reinsw_history = history.detach_history(reinsw_df)
+            reinsw_index = ReinswIndex(reinsw_df)
+
+    # Merge dataframes with reinsw_index
+    if _config.INCREMENTAL_STATE_DIRECTORY:
+        merged_results = incremental.incremental_merge(
+            {'cert': (certificate_df, cert_merge_mappings),
+             'inv': (individual_df, inv_merge_mappings)},
+            reinsw_df,
+            _config.INCREMENTAL_STATE_DIRECTORY)
+        merged_cert_results = merged_results['cert']
+        merged_inv_results = merged_results['inv']
+    elif _config.CASCADE_MATCHING:
+        merged_cert_results = filter_functions.split_cascade_result(
+            filter_functions.cascade_merge_cert_dataframes(
+                certificate_df, reinsw_index, cert_merge_mappings),
+            cert_merge_mappings,
+            filter_functions.merge_tier_columns(
+                certificate_df, reinsw_index, cert_merge_mappings))
+        merged_inv_results = filter_functions.split_cascade_result(
+            filter_functions.cascade_merge_inv_dataframes(
+                individual_df, reinsw_index, inv_merge_mappings),
+            inv_merge_mappings,
+            filter_functions.merge_tier_columns(
+                individual_df, reinsw_index, inv_merge_mappings))
+    elif _config.MERGE_PROCESSES:
+        merged_results = parallel_merge.merge_dataframes_in_processes(
+            {'cert': (certificate_df, cert_merge_mappings),
+             'inv': (individual_df, inv_merge_mappings)},
+            reinsw_index,
+            max_workers=_config.MERGE_PROCESSES)
+        merged_cert_results = merged_results['cert']
+        merged_inv_results = merged_results['inv']
+    else:
+        merged_cert_results = filter_functions.merge_cert_dataframes(
+            certificate_df, reinsw_index, cert_merge_mappings)
+        merged_inv_results = filter_functions.merge_inv_dataframes(
+            individual_df, reinsw_index, inv_merge_mappings)
 
-    # Write merged results to separate CSV files
+    if not _config.INCREMENTAL_STATE_DIRECTORY:
+        # Put the history column back in place of the row reference
+        merged_cert_results = {result_name: reinsw_history.attach(result_df)
+                               for result_name, result_df in merged_cert_results.items()}
+        merged_inv_results = {result_name: reinsw_history.attach(result_df)
+                              for result_name, result_df in merged_inv_results.items()}
+
+    # Write merged results to separate files in the configured format
     output_directory_cert = "result_cer_reinsw/"
     output_directory_inv = "result_inv_reinsw/"
+    output_directory_combined = "result-individual-and-certificates/"
 
-    with ThreadPoolExecutor() as executor:
+    results = {}
+    if _config.WRITE_TIER_RESULTS or not _config.FUSED_PIPELINE:
         for result_name, result_df in merged_cert_results.items():
-            file_path = f"{output_directory_cert}{result_name}"
-            executor.submit(result_df.to_csv, file_path, index=False)
-
+            results[f"{output_directory_cert}{result_name}"] = result_df
         for result_name, result_df in merged_inv_results.items():
-            file_path = f"{output_directory_inv}{result_name}"
-            executor.submit(result_df.to_csv, file_path, index=False)
+            results[f"{output_directory_inv}{result_name}"] = result_df
+
+    # Concatenate the individual and certificate results in memory rather
+    # than reading the tier result files back with match_cer_inv.py
+    if _config.FUSED_PIPELINE:
+        combined_results = match_cer_inv.concat_results(
+            merged_inv_results, merged_cert_results)
+        for result_name, result_df in combined_results.items():
+            results[f"{output_directory_combined}{result_name}"] = result_df
+
+    with instrumentation.stage(
+            'write', input_rows=sum(len(result_df) for result_df in results.values()),
+            files=len(results)), \
+            ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(result_io.write_result, result_df,
+                            result_io.with_format_extension(
+                                result_path, _config.OUTPUT_FORMAT),
+                            _config.OUTPUT_FORMAT)
+            for result_path, result_df in results.items()]
+        # Raise the first failed write instead of dropping it
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
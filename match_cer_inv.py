@@ -1,25 +1,48 @@
 import pandas as pd
 import config as _config
 import os
+import result_io
+
+
+def concat_results(individual_results, certificate_results):
+    """
+    Concatenates every individual tier result with the certificate result
+    of the same tier, in memory.
+
+    Args:
+    individual_results: Dictionary of individual result file names to
+        dataframes, e.g. from filter_functions.merge_inv_dataframes.
+    certificate_results: Dictionary of certificate result file names to
+        dataframes, in the same tier order.
+
+    Returns:
+    A dictionary of the individual result file names to the concatenated
+    dataframes, named like the files of process_dataframes_and_save_results.
+    """
+    return {file_name: pd.concat([ind_df, cert_df])
+            for (file_name, ind_df), cert_df in zip(
+                individual_results.items(), certificate_results.values())}
 
 
 def process_dataframes_and_save_results(individual_paths, certificate_paths, result_folder):
     """
-    Processes dataframes, merges data, and saves the results to CSV files.
+    Processes dataframes, merges data, and saves the results to files
+    in the format of the input files (CSV, Parquet or Arrow).
 
     Args:
-    individual_paths: List of paths to individual data CSV files.
-    certificate_paths: List of paths to certificate data CSV files.
-    result_folder: The folder where the result CSV files will be saved.
+    individual_paths: List of paths to individual data result files.
+    certificate_paths: List of paths to certificate data result files.
+    result_folder: The folder where the result files will be saved.
     """
     for ind_path, cert_path in zip(individual_paths, certificate_paths):
-        ind_df = pd.read_csv(ind_path)
-        cert_df = pd.read_csv(cert_path)
+        ind_df = result_io.read_result(ind_path)
+        cert_df = result_io.read_result(cert_path)
         result_df = pd.concat([ind_df, cert_df])
 
         file_name = os.path.basename(ind_path)
         result_file_path = os.path.join(result_folder, file_name)
-        result_df.to_csv(result_file_path, index=False)
+        result_io.write_result(
+            result_df, result_file_path, result_io.format_of(ind_path))
 
 
 def main():
@@ -59,6 +82,11 @@ def main():
         _config.S3_CERTIFICATE_LIC_FNAME_LNAME_ADDRESS
     ]
 
+    individual_paths = [result_io.with_format_extension(
+        path, _config.OUTPUT_FORMAT) for path in individual_paths]
+    certificate_paths = [result_io.with_format_extension(
+        path, _config.OUTPUT_FORMAT) for path in certificate_paths]
+
     result_folder = "result-individual-and-certificates"
 
     process_dataframes_and_save_results(
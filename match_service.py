@@ -0,0 +1,346 @@
+import argparse
+import json
+import math
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+import config as _config
+import filter_functions
+import history
+import normalization
+import reinsw_cache
+import reinsw_index_file
+import schemas
+
+
+def _text_key(value):
+    """
+    Normalizes a string join key like normalize_join_keys does.
+    """
+    return normalization.normalize_text(value) if isinstance(value, str) else None
+
+
+def _int_key(value):
+    """
+    Casts a numeric join key like filter_functions.to_nullable_int does.
+
+    Examples
+    --------
+    >>> _int_key('2138.0'), _int_key(998454.0), _int_key('N/A'), _int_key(None)
+    (2138, 998454, None, None)
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if math.isfinite(number) and number % 1 == 0 else None
+
+
+def record_keys(record):
+    """
+    Returns the join keys of one Fair Trading record, as
+    preprocess_lname_fname_address_rename_column_df and normalize_join_keys
+    prepare them for the batch merges.
+
+    The licensee is normalized and split into its first and last name like
+    extract_first_last_name, and the address is parsed with
+    parse_addresses and parse_postcode like parse_address_columns.
+
+    Parameters
+    ----------
+    record : dict
+        The record, with the 'Licence Number', 'Licensee' and 'Address'
+        columns of the Fair Trading registers.
+
+    Returns
+    -------
+    dict
+        The license_number, licensee, first_name, last_name, suburb, state
+        and post_code join keys, None where missing.
+
+    Examples
+    --------
+    >>> record_keys({'Licence Number': '1299443', 'Licensee': 'Lac Tran',
+    ...              'Address': '10 Oxford St, Epping, NSW 2121'})['last_name']
+    'TRAN'
+    """
+    licensee = _text_key(record.get('Licensee'))
+    name_parts = licensee.split(maxsplit=1) if licensee else []
+
+    suburb, state, postcode = filter_functions.parse_addresses(
+        [record.get('Address')])[0]
+
+    return {
+        'license_number': _int_key(record.get('Licence Number')),
+        # Normalized again as the batch merges do in normalize_join_keys
+        'licensee': _text_key(licensee),
+        'first_name': _text_key(name_parts[0]) if name_parts else None,
+        'last_name': (_text_key(name_parts[1]) if len(name_parts) > 1
+                      else None),
+        'suburb': _text_key(_text_key(suburb)),
+        'state': _text_key(_text_key(state)),
+        'post_code': filter_functions.parse_postcode(postcode),
+    }
+
+
+def _key_values(values):
+    """
+    Returns a prepared REINSW key column as a list, with None for missing
+    values.
+    """
+    values = values.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+class MatchService:
+    """
+    Matches single Fair Trading records and small batches against the
+    REINSW report, each at its strongest tier.
+
+    The REINSW report is prepared once, and every merge tier gets a
+    dictionary from its key tuple to the matching REINSW rows, so a query
+    only normalizes and parses its records and looks their keys up. The
+    tiers are tried in filter_functions.cascade_tier_order and follow the
+    batch merges: missing keys match each other, except in the address
+    tiers, which match complete keys to the first REINSW row only. A batch
+    answers like cascade_merge_cert_dataframes does for its records.
+
+    Parameters
+    ----------
+    prepared : reinsw_cache.PreparedReinsw
+        The prepared REINSW report.
+    merge_mappings : dict
+        The merge tiers, whose result names name the matched tier.
+    """
+
+    def __init__(self, prepared, merge_mappings=filter_functions.cert_merge_mappings):
+        reinsw_df, self.reinsw_history, _ = prepared
+        self.result_names = list(merge_mappings)
+
+        key_columns = {column: _key_values(reinsw_df[column])
+                       for column in filter_functions.numeric_join_keys
+                       + filter_functions.string_join_keys}
+
+        # Tier number -> (key columns, drop_duplicates, key tuple -> rows)
+        self.tiers = {}
+        for tier, merge_func in enumerate(merge_mappings.values(), 1):
+            merging_on_list = filter_functions.merge_keys[merge_func]
+            drop_duplicates = (merge_func
+                               in filter_functions.deduplicating_merge_funcs)
+            lookup = {}
+            for row, key in enumerate(zip(
+                    *(key_columns[column] for column in merging_on_list))):
+                if drop_duplicates:
+                    lookup.setdefault(key, (row,))
+                else:
+                    lookup.setdefault(key, []).append(row)
+            self.tiers[tier] = (merging_on_list, drop_duplicates, lookup)
+
+        self.columns = [column for column in reinsw_df.columns
+                        if column != history.ROW_COLUMN]
+        self._values = {column: _key_values(reinsw_df[column])
+                        for column in self.columns}
+
+    @classmethod
+    def load(cls, reinsw_path=None, index_path=None,
+             merge_mappings=filter_functions.cert_merge_mappings):
+        """
+        Loads the REINSW report from its index file when one is given (see
+        reinsw_index_file), otherwise from the CSV file.
+        """
+        if index_path:
+            prepared = reinsw_index_file.load_index_file(index_path,
+                                                         reinsw_path)
+        else:
+            prepared = reinsw_cache.prepare_reinsw(
+                schemas.read_input_csv(reinsw_path,
+                                       schemas.SCHEMAS['reinsw']))
+        return cls(prepared, merge_mappings)
+
+    def reinsw_record(self, row):
+        """
+        Returns one REINSW row as a dictionary, with its history.
+        """
+        reinsw_record = {column: self._values[column][row]
+                         for column in self.columns}
+        code = self.reinsw_history.codes[row]
+        reinsw_record['history'] = (self.reinsw_history.uniques[code]
+                                    if code >= 0 else None)
+        return reinsw_record
+
+    def match(self, records):
+        """
+        Matches a batch of Fair Trading records.
+
+        Parameters
+        ----------
+        records : list
+            The records, dictionaries with at least the 'Licence Number',
+            'Licensee' and 'Address' columns of the Fair Trading registers.
+
+        Returns
+        -------
+        list
+            One dictionary per record: its strongest legacy 'tier' number
+            and 'result' name (None when nothing matched), its join 'keys'
+            and the matched REINSW rows as 'matches'.
+        """
+        # Candidate groups are limited like in the batch merges, see
+        # config.JOIN_DUPLICATE_POLICY
+        policy = _config.JOIN_DUPLICATE_POLICY
+        max_candidates = (None if policy == 'keep'
+                          else _config.JOIN_MAX_CANDIDATES)
+        drop_ambiguous = policy == 'drop'
+
+        keys = [record_keys(record) for record in records]
+        results = [{'tier': None, 'result': None, 'keys': record_key,
+                    'matches': []} for record_key in keys]
+
+        for tier in filter_functions.cascade_tier_order:
+            merging_on_list, drop_duplicates, lookup = self.tiers[tier]
+            # The address tiers match the first record of a key only
+            seen = set()
+            for result, record_key in zip(results, keys):
+                if result['tier'] is not None:
+                    continue
+                key = tuple(record_key[column] for column in merging_on_list)
+                if drop_duplicates:
+                    if None in key or key in seen:
+                        continue
+                    seen.add(key)
+
+                rows = lookup.get(key)
+                if rows and max_candidates is not None and (
+                        len(rows) > max_candidates):
+                    rows = None if drop_ambiguous else rows[:max_candidates]
+                if rows:
+                    result['tier'] = tier
+                    result['result'] = self.result_names[tier - 1]
+                    result['matches'] = [self.reinsw_record(row)
+                                         for row in rows]
+
+        return results
+
+
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+
+def _query_records(records):
+    """
+    Returns the records of a match query, raising ValueError unless they
+    are a list of JSON objects.
+
+    Examples
+    --------
+    >>> _query_records([{'Licensee': 'Lac Tran'}])
+    [{'Licensee': 'Lac Tran'}]
+    >>> _query_records(None)
+    Traceback (most recent call last):
+    ...
+    ValueError: The records must be a list of JSON objects, not NoneType
+    """
+    if not isinstance(records, list):
+        raise ValueError(f"The records must be a list of JSON objects, "
+                         f"not {type(records).__name__}")
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError(f"Every record must be a JSON object, "
+                             f"not {type(record).__name__}")
+    return records
+
+
+def serve_stdio(service, stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Answers match queries line by line: every input line is a JSON record,
+    or a list of records, and gets one JSON line back with their results.
+    """
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            query = json.loads(line)
+            records = _query_records(
+                query if isinstance(query, list) else [query])
+            response = {'results': service.match(records)}
+        except (ValueError, AttributeError) as error:
+            response = {'error': str(error)}
+        stdout.write(json.dumps(response, default=_json_default) + '\n')
+        stdout.flush()
+
+
+def make_handler(service):
+    """
+    Returns the HTTP request handler of serve_http.
+    """
+    class MatchHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                query = json.loads(self.rfile.read(length))
+                records = _query_records(
+                    query.get('records', [query]) if isinstance(query, dict)
+                    else query)
+                status, response = 200, {'results': service.match(records)}
+            except (ValueError, AttributeError) as error:
+                status, response = 400, {'error': str(error)}
+
+            body = json.dumps(response, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MatchHandler
+
+
+def serve_http(service, host='127.0.0.1', port=8080):
+    """
+    Answers match queries POSTed as JSON: a record, a list of records or
+    {"records": [...]}.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Match Fair Trading records against the REINSW report '
+                    'online, over stdin/stdout or HTTP.')
+    parser.add_argument('--reinsw', default=_config.REINSW_PATH,
+                        help='the REINSW report CSV file')
+    parser.add_argument('--index', default=_config.REINSW_INDEX_PATH,
+                        help='the REINSW index file, see reinsw_index_file.py')
+    parser.add_argument('--side', choices=['cert', 'inv'], default='cert',
+                        help='the result names of the matched tiers')
+    parser.add_argument('--http', type=int, metavar='PORT',
+                        help='serve HTTP on this port instead of stdin/stdout')
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+
+    merge_mappings = (filter_functions.cert_merge_mappings
+                      if args.side == 'cert'
+                      else filter_functions.inv_merge_mappings)
+    service = MatchService.load(args.reinsw, args.index, merge_mappings)
+
+    if args.http:
+        serve_http(service, args.host, args.http)
+    else:
+        serve_stdio(service)
+
+
+if __name__ == '__main__':
+    main()
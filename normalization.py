@@ -0,0 +1,110 @@
+import re
+import sys
+from functools import lru_cache
+
+import pandas as pd
+
+# Distinct values whose normalized form is kept between calls
+CACHE_SIZE = 1 << 16
+
+# Text in parentheses, e.g. a preferred name as in '(Ricky) Lac Long Tran'
+PARENTHETICAL_PATTERN = re.compile(r'\([^)]*\)')
+
+# Apostrophes, dropped so "O'Brien" reads as 'OBRIEN'
+APOSTROPHE_PATTERN = re.compile(r"['’`]")
+
+# Punctuation and whitespace runs, collapsed to a single space; hyphens are
+# kept, so a hyphenated first name such as 'Tzu-Hsuan' stays one name
+SEPARATOR_PATTERN = re.compile(r'[^\w-]+|_+')
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_text(value):
+    """
+    Normalizes a name, suburb or state for matching: parentheticals and
+    apostrophes are removed, runs of whitespace and punctuation other than
+    hyphens become a single space, and the result is upper-cased like the
+    Fair Trading registers.
+
+    Results are cached and interned, so a value repeated across the
+    certificate, individual and REINSW files is normalized once and shared.
+
+    Parameters
+    ----------
+    value : str
+        The value to normalize.
+
+    Returns
+    -------
+    str or None
+        The normalized value, or None when nothing is left of it.
+
+    Examples
+    --------
+    >>> normalize_text("(Ricky) Lac  Long-Tran.")
+    'LAC LONG-TRAN'
+    >>> normalize_text("O'Brien")
+    'OBRIEN'
+    >>> normalize_text(' () ') is None
+    True
+    """
+    value = PARENTHETICAL_PATTERN.sub(' ', value)
+    value = APOSTROPHE_PATTERN.sub('', value)
+    value = SEPARATOR_PATTERN.sub(' ', value).strip().upper()
+    return sys.intern(value) if value else None
+
+
+def normalize_column(values):
+    """
+    Normalizes a whole column with normalize_text.
+
+    The column is factorized, every distinct value is normalized once
+    (through the cache) and the results are mapped back through the codes.
+    Missing and non-string values become None.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The column to normalize.
+
+    Returns
+    -------
+    pandas.Series
+        The normalized object column, indexed like `values`.
+
+    Examples
+    --------
+    >>> normalize_column(pd.Series(['Rhodes', 'RHODES ', None])).tolist()
+    ['RHODES', 'RHODES', None]
+    """
+    codes, uniques = pd.factorize(values.astype(object), use_na_sentinel=True)
+    normalized = pd.Series(
+        [normalize_text(value) if isinstance(value, str) else None
+         for value in uniques] + [None], dtype=object)
+
+    # The missing values take the last, None, entry
+    return pd.Series(normalized.to_numpy()[codes], index=values.index,
+                     dtype=object)
+
+
+def normalize_columns(dataframe, columns):
+    """
+    Normalizes the given columns of a dataframe in place with
+    normalize_column, skipping the ones it does not have.
+
+    Parameters
+    ----------
+    dataframe : pandas.DataFrame
+        The dataframe to normalize.
+    columns : list
+        The columns to normalize.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The same dataframe.
+    """
+    for column in columns:
+        if column in dataframe.columns:
+            dataframe[column] = normalize_column(dataframe[column])
+    return dataframe
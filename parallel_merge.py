@@ -0,0 +1,111 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import filter_functions
+import instrumentation
+import reinsw_index_file
+from reinsw_index import ReinswIndex
+
+# Input frames of the current worker process, set once by _init_worker
+_shared_frames = {}
+
+
+def _init_worker(shared_frames):
+    """
+    Stores the input frames in the worker process.
+
+    With the fork start method the initializer arguments are inherited
+    from the parent instead of being pickled, and with spawn they are
+    pickled once per worker rather than once per job. Stage records
+    inherited from the parent are dropped, as the parent keeps its own.
+    """
+    global _shared_frames
+    _shared_frames = shared_frames
+    instrumentation.take_records()
+
+
+def _run_tier(side, idx, result_name, merge_func, merge_columns_dict):
+    """
+    Runs one merge tier of one side against the shared REINSW data.
+
+    Returns
+    -------
+    tuple
+        The side, the result file name, the merged dataframe and the stage
+        records measured for it.
+    """
+    fairtrade_df = _shared_frames[side]
+    with instrumentation.stage('merge', input_rows=len(fairtrade_df),
+                               side=side, tier=result_name) as stage:
+        result_df = merge_func(fairtrade_df.copy(), _shared_frames['reinsw'])
+        result_df = filter_functions.merge_columns_and_drop(
+            result_df, merge_columns_dict)
+        stage.output_rows = len(result_df)
+    return (side, f"{idx}_{result_name}.csv", result_df,
+            instrumentation.take_records())
+
+
+def merge_dataframes_in_processes(sides, reinsw_df, max_workers=None,
+                                  merge_columns_dict=filter_functions.merge_columns_dict):
+    """
+    Runs every merge tier of every side as a separate job on a process pool.
+
+    Parameters
+    ----------
+    sides : dict
+        Side names (e.g. 'cert', 'inv') to (fairtrade_df, merge_mappings)
+        tuples.
+    reinsw_df : pandas.DataFrame or ReinswIndex
+        The dataframe containing data from the NSW government report,
+        or the ReinswIndex built once from it.
+    max_workers : int, optional
+        The number of worker processes, defaults to the number of CPUs.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    dict
+        Side names to dictionaries of result file names and merged
+        dataframes, laid out like merge_cert_dataframes and
+        merge_inv_dataframes.
+    """
+    # Build the key table of every tier before the pool forks, so the
+    # workers share it instead of each building its own
+    if isinstance(reinsw_df, ReinswIndex):
+        for merging_on_list, drop_duplicates in \
+                reinsw_index_file.tier_key_tables():
+            reinsw_df.key_table(merging_on_list, drop_duplicates)
+
+    shared_frames = {side: fairtrade_df
+                     for side, (fairtrade_df, _) in sides.items()}
+    shared_frames['reinsw'] = reinsw_df
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = multiprocessing.get_context()
+
+    results = {side: {} for side in sides}
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=mp_context,
+                             initializer=_init_worker,
+                             initargs=(shared_frames,)) as executor:
+        futures = [
+            executor.submit(_run_tier, side, idx, result_name, merge_func,
+                            merge_columns_dict)
+            for side, (_, merge_mappings) in sides.items()
+            for idx, (result_name, merge_func) in enumerate(
+                merge_mappings.items(), 1)
+        ]
+
+        # Futures are collected in submission order, which keeps the
+        # numbered order of the sequential merge; the workers' stage
+        # records join the run summary of this process
+        for future in futures:
+            side, file_name, result_df, records = future.result()
+            results[side][file_name] = result_df
+            instrumentation.add_records(records)
+
+    return results
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import filter_functions
+import history
+import result_io
+import schemas
+from reinsw_index import ReinswIndex
+
+# Prepared REINSW reports by cache key, least recently used first
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Layout of the prepared report kept in the disk cache; files of another
+# layout are ignored, and removed with the next write
+DISK_CACHE_VERSION = 2
+
+
+class PreparedReinsw(NamedTuple):
+    """
+    The REINSW report as the merges use it.
+
+    reinsw_df : pandas.DataFrame
+        The report with normalized join keys and a history row reference
+        (see history.detach_history).
+    reinsw_history : history.ReinswHistory
+        Its history column.
+    reinsw_index : ReinswIndex
+        Its join index, which keeps the key tables built by earlier merges.
+    """
+    reinsw_df: pd.DataFrame
+    reinsw_history: history.ReinswHistory
+    reinsw_index: ReinswIndex
+
+    @property
+    def nbytes(self):
+        """
+        The memory held by the prepared report, in bytes.
+        """
+        history_nbytes = self.reinsw_history.codes.nbytes + sum(
+            len(value) for value in self.reinsw_history.uniques
+            if isinstance(value, str))
+        # The index shares its dataframe with reinsw_df
+        return self.reinsw_index.nbytes + history_nbytes
+
+
+def prepare_reinsw(reinsw_df):
+    """
+    Normalizes the join keys of a parsed REINSW report on its own, keeping
+    their original text (see filter_functions.keep_reinsw_text), detaches
+    its history and builds its join index.
+
+    The Fairtrading dataframes are then normalized without it; the merges
+    give the same results as when all three are normalized together.
+
+    Parameters
+    ----------
+    reinsw_df : pandas.DataFrame
+        The REINSW report, as read by schemas.read_input_csv.
+
+    Returns
+    -------
+    PreparedReinsw
+        The prepared report.
+    """
+    reinsw_df, = filter_functions.normalize_join_keys(
+        filter_functions.keep_reinsw_text(reinsw_df))
+    reinsw_df, reinsw_history = history.detach_history(reinsw_df)
+    return PreparedReinsw(reinsw_df, reinsw_history, ReinswIndex(reinsw_df))
+
+
+def cached(cache_key):
+    """
+    Returns the prepared report cached under `cache_key`, or None.
+    """
+    with _cache_lock:
+        prepared = _cache.get(cache_key)
+        if prepared is not None:
+            _cache.move_to_end(cache_key)
+        return prepared
+
+
+def store(cache_key, prepared, memory_budget):
+    """
+    Caches a prepared report, then evicts the least recently used reports
+    until the cache holds at most `memory_budget` bytes. A report larger
+    than the whole budget is not kept.
+    """
+    with _cache_lock:
+        _cache[cache_key] = prepared
+        _cache.move_to_end(cache_key)
+
+        # Key tables grow as merges probe the indexes, so sizes are taken
+        # now rather than when the reports were stored
+        sizes = {key: entry.nbytes for key, entry in _cache.items()}
+        total = sum(sizes.values())
+        for key in list(_cache):
+            if total <= memory_budget:
+                break
+            total -= sizes[key]
+            del _cache[key]
+
+
+def clear():
+    """
+    Empties the in-memory cache.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+def load_s3_reinsw(s3_client, bucket, key, memory_budget):
+    """
+    Returns the prepared REINSW report stored at an S3 key, from the cache
+    of a warm Lambda container while its ETag has not changed.
+
+    A HEAD request checks the ETag; the report is only downloaded and
+    parsed when it changed or is not cached.
+
+    Parameters
+    ----------
+    s3_client : boto3 S3 client object
+        The S3 client, or a s3_upload.FilesystemS3Client.
+    bucket : str
+        The bucket of the report.
+    key : str
+        The key of the report.
+    memory_budget : int
+        The most bytes the cache holds, e.g. config.REINSW_CACHE_MEMORY_BYTES.
+
+    Returns
+    -------
+    PreparedReinsw
+        The prepared report.
+    """
+    etag = s3_client.head_object(Bucket=bucket, Key=key)['ETag']
+    prepared = cached(('s3', bucket, key, etag))
+    if prepared is not None:
+        return prepared
+
+    reinsw_file = s3_client.get_object(Bucket=bucket, Key=key)
+    prepared = prepare_reinsw(schemas.read_input_csv(
+        reinsw_file['Body'], schemas.SCHEMAS['reinsw']))
+
+    # Keyed by the ETag of the downloaded object, in case it changed
+    # since the HEAD request
+    store(('s3', bucket, key, reinsw_file.get('ETag', etag)), prepared,
+          memory_budget)
+    return prepared
+
+
+def content_hash(path, block_size=1 << 20):
+    """
+    Returns the BLAKE2b hash of a file's content, as hex.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _disk_paths(cache_directory, report_hash):
+    prefix = f"reinsw_v{DISK_CACHE_VERSION}_{report_hash}"
+    return (os.path.join(cache_directory, f"{prefix}.parquet"),
+            os.path.join(cache_directory, f"{prefix}_history.parquet"))
+
+
+def _read_disk_cache(cache_directory, report_hash):
+    reinsw_path, history_path = _disk_paths(cache_directory, report_hash)
+    if not (os.path.exists(reinsw_path) and os.path.exists(history_path)):
+        return None
+
+    reinsw_df = result_io.read_result(reinsw_path, 'parquet')
+    reinsw_history = history.ReinswHistory(
+        result_io.read_result(history_path, 'parquet')['history'])
+    return PreparedReinsw(reinsw_df, reinsw_history, ReinswIndex(reinsw_df))
+
+
+def _write_disk_cache(cache_directory, report_hash, prepared):
+    os.makedirs(cache_directory, exist_ok=True)
+    paths = _disk_paths(cache_directory, report_hash)
+
+    # Only the latest report is kept on disk
+    for file_name in os.listdir(cache_directory):
+        path = os.path.join(cache_directory, file_name)
+        if file_name.startswith('reinsw_') and path not in paths:
+            os.remove(path)
+
+    reinsw_path, history_path = paths
+    result_io.write_result(prepared.reinsw_df, reinsw_path, 'parquet')
+    result_io.write_result(
+        pd.DataFrame({'history': prepared.reinsw_history.column(
+            np.arange(len(prepared.reinsw_df)))}),
+        history_path, 'parquet')
+
+
+def load_local_reinsw(path, memory_budget, cache_directory=None):
+    """
+    Returns the prepared REINSW report of a local file, keyed by the hash
+    of its content: from memory, then from `cache_directory`, and only
+    parsed and prepared when neither has it.
+
+    The disk cache keeps the prepared dataframe and history as Parquet;
+    the join index is built again from them.
+
+    Parameters
+    ----------
+    path : str
+        The REINSW report CSV file.
+    memory_budget : int
+        The most bytes the in-memory cache holds.
+    cache_directory : str, optional
+        Where to keep the prepared report between runs.
+
+    Returns
+    -------
+    PreparedReinsw
+        The prepared report.
+    """
+    report_hash = content_hash(path)
+    prepared = cached(('file', report_hash))
+    if prepared is not None:
+        return prepared
+
+    if cache_directory:
+        prepared = _read_disk_cache(cache_directory, report_hash)
+
+    if prepared is None:
+        prepared = prepare_reinsw(schemas.read_input_csv(
+            path, schemas.SCHEMAS['reinsw']))
+        if cache_directory:
+            _write_disk_cache(cache_directory, report_hash, prepared)
+
+    store(('file', report_hash), prepared, memory_budget)
+    return prepared
@@ -0,0 +1,385 @@
+from functools import cached_property
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from join_guard import JoinExplosionError, JoinStats, frame_row_nbytes
+
+
+class ColumnEncoder(NamedTuple):
+    """
+    Integer encoding of one REINSW key column.
+
+    uniques : pandas.Index
+        The distinct non-null values of the column, hashed once.
+    codes : numpy.ndarray
+        The code of every REINSW row, positions into `uniques`.
+    null_code : int
+        The code given to missing values, one past the last unique.
+    """
+    uniques: pd.Index
+    codes: np.ndarray
+    null_code: int
+
+
+class KeyTable(NamedTuple):
+    """
+    Prepared lookup table for one combination of join keys.
+
+    rows : numpy.ndarray
+        The REINSW row positions taking part in the join.
+    compactions : dict
+        Column position -> pandas.Index of packed keys, used to renumber
+        the packed key densely before it would overflow int64.
+    unique_keys : numpy.ndarray
+        The distinct packed keys in ascending order, probed with
+        numpy.searchsorted.
+    order : numpy.ndarray
+        Positions into `rows`, grouped by key in REINSW order.
+    starts : numpy.ndarray
+        Where each key's group starts in `order`.
+    counts : numpy.ndarray
+        The number of REINSW rows sharing each key.
+    """
+    rows: np.ndarray
+    compactions: dict
+    unique_keys: np.ndarray
+    order: np.ndarray
+    starts: np.ndarray
+    counts: np.ndarray
+
+
+class ReinswIndex:
+    """
+    Join index over the REINSW report, built once and
+    probed by every merge tier of the certificate and individual sides.
+
+    Every key column is factorized once into integer codes (categorical
+    columns from normalize_join_keys reuse their shared codes), and every
+    combination of key columns used by the merge_on_* functions gets a
+    KeyTable the first time it is probed. Later tiers and the other side
+    then reuse those tables instead of hashing the REINSW keys again.
+
+    Parameters
+    ----------
+    reinsw_df : pandas.DataFrame
+        The dataframe containing data from the NSW government report.
+    key_combinations : list, optional
+        Combinations of key columns to prepare up front.
+
+    Examples
+    --------
+    >>> reinsw_df = pd.DataFrame({'licensee': ['Aaron Darcy', 'Lac Tran'],
+    ...                           'imis_id': [26501, 83789]})
+    >>> reinsw_index = ReinswIndex(reinsw_df, [['licensee']])
+    >>> fairtrade_df = pd.DataFrame({'licensee': ['Lac Tran']})
+    >>> reinsw_index.merge(fairtrade_df, ['licensee'])
+       licensee  imis_id
+    0  Lac Tran    83789
+    """
+
+    def __init__(self, reinsw_df: pd.DataFrame,
+                 key_combinations: Sequence[Sequence[str]] = ()):
+        self.reinsw_df = reinsw_df.reset_index(drop=True)
+        self._column_encoders = {}
+        self._key_tables = {}
+
+        for merging_on_list in key_combinations:
+            self.key_table(merging_on_list)
+
+    @classmethod
+    def from_tables(cls, reinsw_df: pd.DataFrame, column_encoders: dict,
+                    key_tables: dict) -> 'ReinswIndex':
+        """
+        Returns an index over reinsw_df with encoders and key tables built
+        beforehand, e.g. read from a reinsw_index_file.
+        """
+        reinsw_index = cls(reinsw_df)
+        reinsw_index._column_encoders.update(column_encoders)
+        reinsw_index._key_tables.update(key_tables)
+        return reinsw_index
+
+    def __len__(self):
+        return len(self.reinsw_df)
+
+    @property
+    def column_encoders(self) -> dict:
+        """
+        The encoders built so far, by column.
+        """
+        return dict(self._column_encoders)
+
+    @property
+    def key_tables(self) -> dict:
+        """
+        The key tables built so far, by (key columns, drop_duplicates).
+        """
+        return dict(self._key_tables)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory held by the REINSW dataframe and the encoders and key
+        tables built so far, in bytes.
+        """
+        nbytes = int(self.reinsw_df.memory_usage(deep=True).sum())
+        for encoder in self._column_encoders.values():
+            nbytes += encoder.uniques.memory_usage(deep=True)
+            nbytes += encoder.codes.nbytes
+        for key_table in self._key_tables.values():
+            nbytes += sum(array.nbytes for array in (
+                key_table.rows, key_table.order, key_table.starts,
+                key_table.counts))
+            nbytes += key_table.unique_keys.nbytes
+            nbytes += sum(index.memory_usage()
+                          for index in key_table.compactions.values())
+        return nbytes
+
+    def column_encoder(self, column: str) -> ColumnEncoder:
+        """
+        Returns the integer encoding of a REINSW key column,
+        factorizing it on first use.
+        """
+        if column not in self._column_encoders:
+            values = self.reinsw_df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Already dictionary-encoded, e.g. by normalize_join_keys
+                codes = values.cat.codes.to_numpy().astype(np.int64)
+                uniques = values.cat.categories
+            else:
+                codes, uniques = pd.factorize(values)
+            null_code = len(uniques)
+            codes = np.where(codes == -1, null_code, codes)
+            self._column_encoders[column] = ColumnEncoder(
+                pd.Index(uniques), codes, null_code)
+
+        return self._column_encoders[column]
+
+    def key_table(self, merging_on_list: Sequence[str],
+                  drop_duplicates: bool = False) -> KeyTable:
+        """
+        Returns the KeyTable of a combination of key columns,
+        building it on first use.
+
+        With drop_duplicates, only the first REINSW row of every key takes
+        part in the join, like drop_duplicates(subset=merging_on_list).
+        """
+        table_key = (tuple(merging_on_list), drop_duplicates)
+        if table_key in self._key_tables:
+            return self._key_tables[table_key]
+
+        encoders = [self.column_encoder(column) for column in merging_on_list]
+        compactions = {}
+        packed_keys, _ = _pack_codes(
+            [encoder.codes for encoder in encoders], encoders, compactions,
+            build=True)
+
+        group_ids, unique_keys = pd.factorize(packed_keys, sort=True)
+        if drop_duplicates:
+            _, rows = np.unique(group_ids, return_index=True)
+            rows.sort()
+        else:
+            rows = np.arange(len(self.reinsw_df))
+
+        group_ids = group_ids[rows]
+        order = np.argsort(group_ids, kind='stable')
+        counts = np.bincount(group_ids, minlength=len(unique_keys))
+        starts = np.cumsum(counts) - counts
+
+        key_table = KeyTable(rows, compactions, unique_keys,
+                             order, starts, counts)
+        self._key_tables[table_key] = key_table
+        return key_table
+
+    @cached_property
+    def row_nbytes(self) -> float:
+        """
+        The average memory of one REINSW row, in bytes, see
+        join_guard.frame_row_nbytes.
+        """
+        return frame_row_nbytes(self.reinsw_df)
+
+    def probe(self, fairtrade_df: pd.DataFrame,
+              merging_on_list: Sequence[str],
+              drop_duplicates: bool = False,
+              max_candidates: Optional[int] = None,
+              drop_ambiguous: bool = False,
+              max_rows: Optional[int] = None
+              ) -> Tuple[np.ndarray, np.ndarray, JoinStats]:
+        """
+        Looks up the fairtrade keys in the prepared KeyTable and returns the
+        matching (fairtrade positions, REINSW positions) pairs, in
+        fairtrade order and then REINSW order, and the JoinStats of the
+        join.
+
+        Missing values match each other, as they do in pandas.merge.
+
+        The size of every key group is known before the pairs are built:
+        with max_candidates, a fairtrade row keeps only the first
+        max_candidates REINSW rows of its key, or none with drop_ambiguous,
+        and a join of more than max_rows pairs raises JoinExplosionError.
+        """
+        key_table = self.key_table(merging_on_list, drop_duplicates)
+
+        encoders = [self.column_encoder(column) for column in merging_on_list]
+        probe_codes = []
+        for column, encoder in zip(merging_on_list, encoders):
+            values = fairtrade_df[column]
+            if _shares_categories(values, encoder):
+                codes = values.cat.codes.to_numpy().astype(np.int64)
+            else:
+                codes = encoder.uniques.get_indexer(values)
+            codes[values.isna().to_numpy()] = encoder.null_code
+            probe_codes.append(codes)
+
+        packed_keys, is_known = _pack_codes(
+            probe_codes, encoders, key_table.compactions)
+        unique_keys = key_table.unique_keys
+        groups = np.minimum(np.searchsorted(unique_keys, packed_keys),
+                            max(len(unique_keys) - 1, 0))
+        if len(unique_keys):
+            is_known &= unique_keys[groups] == packed_keys
+        else:
+            is_known[:] = False
+        groups[~is_known] = -1
+
+        fairtrade_rows = np.flatnonzero(groups >= 0)
+        groups = groups[fairtrade_rows]
+
+        counts = key_table.counts[groups]
+        uncapped_rows = int(counts.sum())
+        limited = (counts > max_candidates if max_candidates is not None
+                   else np.zeros(len(counts), dtype=bool))
+        stats = JoinStats(
+            input_rows=len(fairtrade_df),
+            matched_rows=len(fairtrade_rows),
+            output_rows=uncapped_rows,
+            uncapped_rows=uncapped_rows,
+            max_reinsw_multiplicity=int(counts.max(initial=0)),
+            max_fairtrade_multiplicity=int(
+                np.bincount(groups).max(initial=0)),
+            limited_rows=int(limited.sum()))
+
+        if limited.any():
+            if drop_ambiguous:
+                fairtrade_rows = fairtrade_rows[~limited]
+                groups = groups[~limited]
+                counts = counts[~limited]
+            else:
+                counts = np.minimum(counts, max_candidates)
+            stats = stats._replace(output_rows=int(counts.sum()))
+
+        if max_rows is not None and stats.output_rows > max_rows:
+            raise JoinExplosionError(merging_on_list, stats, max_rows)
+
+        fairtrade_positions = np.repeat(fairtrade_rows, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts)
+        reinsw_positions = key_table.rows[key_table.order[
+            np.repeat(key_table.starts[groups], counts) + offsets]]
+
+        return fairtrade_positions, reinsw_positions, stats
+
+    def merge(self, fairtrade_df: pd.DataFrame,
+              merging_on_list: List[str],
+              suffixes: Sequence[str] = ('_fairtrade', '_reinsw'),
+              drop_duplicates: bool = False,
+              max_candidates: Optional[int] = None,
+              drop_ambiguous: bool = False,
+              max_rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        Inner joins fairtrade_df with the REINSW report on merging_on_list,
+        laying the result out like pandas.merge does.
+
+        The JoinStats of the join are kept in the result's
+        attrs['join_stats']; see probe for the other limits.
+
+        Parameters
+        ----------
+        fairtrade_df : pandas.DataFrame
+            The Fairtrading dataframe to merge.
+        merging_on_list : list
+            The key columns to merge on.
+        suffixes : list
+            Suffixes for overlapping non-key columns.
+        drop_duplicates : bool
+            Whether to keep only the first REINSW row of every key.
+        max_candidates : int, optional
+            The most REINSW rows a fairtrade row matches.
+        drop_ambiguous : bool
+            Whether fairtrade rows matching more than max_candidates REINSW
+            rows match none instead.
+        max_rows : int, optional
+            The most rows the result may have.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Merged dataframe.
+        """
+        fairtrade_positions, reinsw_positions, stats = self.probe(
+            fairtrade_df, merging_on_list, drop_duplicates, max_candidates,
+            drop_ambiguous, max_rows)
+
+        reinsw_columns = [column for column in self.reinsw_df.columns
+                          if column not in merging_on_list]
+        overlapping_columns = set(fairtrade_df.columns) & set(reinsw_columns)
+
+        left_df = fairtrade_df.iloc[fairtrade_positions].reset_index(
+            drop=True)
+        right_df = self.reinsw_df[reinsw_columns].iloc[
+            reinsw_positions].reset_index(drop=True)
+
+        left_df = left_df.rename(columns={
+            column: f"{column}{suffixes[0]}" for column in overlapping_columns})
+        right_df = right_df.rename(columns={
+            column: f"{column}{suffixes[1]}" for column in overlapping_columns})
+
+        result_df = pd.concat([left_df, right_df], axis=1)
+        result_df.attrs['join_stats'] = stats
+        return result_df
+
+
+def _shares_categories(values: pd.Series, encoder: ColumnEncoder) -> bool:
+    """
+    Whether a categorical column uses the same categories as the REINSW
+    column, in which case its codes can be probed directly.
+    """
+    return (isinstance(values.dtype, pd.CategoricalDtype)
+            and values.cat.categories.equals(encoder.uniques))
+
+
+def _pack_codes(key_codes: List[np.ndarray],
+                encoders: List[ColumnEncoder],
+                compactions: dict,
+                build: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs per-column codes into one int64 key per row.
+
+    Codes are combined in mixed radix, one digit per key column. When the
+    next digit would overflow int64, the packed keys are first renumbered
+    densely; when building the REINSW side those renumberings are recorded
+    in `compactions`, and on the probe side they are replayed from it.
+
+    Returns the packed keys and a mask of the rows whose values all
+    exist on the REINSW side (the others cannot match).
+    """
+    is_known = np.ones(len(key_codes[0]), dtype=bool)
+    packed_keys = np.zeros(len(key_codes[0]), dtype=np.int64)
+    key_range = 1
+
+    for position, (codes, encoder) in enumerate(zip(key_codes, encoders)):
+        radix = encoder.null_code + 1
+        if key_range * radix >= 2 ** 62:
+            if build:
+                compactions[position] = pd.Index(pd.unique(packed_keys))
+            packed_keys = compactions[position].get_indexer(packed_keys)
+            is_known &= packed_keys >= 0
+            key_range = len(compactions[position])
+
+        is_known &= codes >= 0
+        packed_keys = packed_keys * radix + np.maximum(codes, 0)
+        key_range *= radix
+
+    return packed_keys, is_known
@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import filter_functions
+import history
+import reinsw_cache
+import schemas
+from reinsw_index import ColumnEncoder, KeyTable, ReinswIndex
+
+# First bytes of an index file, followed by the header length
+MAGIC = b'REINSWIX'
+VERSION = 3
+
+# Every section starts on a multiple of this many bytes, so the arrays
+# mapped from it are aligned
+ALIGNMENT = 64
+
+
+def tier_key_tables():
+    """
+    Returns the (key columns, drop_duplicates) combinations the merge
+    tiers of both sides probe, see filter_functions.merge_keys.
+    """
+    return [(filter_functions.merge_keys[merge_func],
+             merge_func in filter_functions.deduplicating_merge_funcs)
+            for merge_func in filter_functions.cert_merge_mappings.values()]
+
+
+def _etag(etag):
+    """
+    Returns an ETag without the quotes S3 puts around it.
+    """
+    return etag.strip('"') if etag is not None else None
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _frame_bytes(reinsw_df, reinsw_history):
+    """
+    Returns the prepared dataframe, with the history put back as a
+    categorical column, as an uncompressed Arrow IPC file.
+    """
+    import pyarrow as pa
+
+    frame_df = reinsw_df.copy()
+    frame_df['history'] = reinsw_history.column(np.arange(len(reinsw_df)))
+    table = pa.Table.from_pandas(frame_df, preserve_index=False)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def write_index_file(prepared, path, source_hash=None, source_etag=None):
+    """
+    Writes a prepared REINSW report and the key tables of every merge tier
+    to one binary index file.
+
+    The file is a JSON header followed by aligned sections: the dataframe
+    as an uncompressed Arrow IPC file, and the integer codes, row offsets
+    and sorted packed keys of the index as raw NumPy arrays. It is written
+    next to `path` and then renamed over it, so running processes keep
+    the file they mapped.
+
+    Parameters
+    ----------
+    prepared : reinsw_cache.PreparedReinsw
+        The prepared report, see reinsw_cache.prepare_reinsw.
+    path : str
+        The index file.
+    source_hash : str, optional
+        The content hash of the REINSW report it was built from.
+    source_etag : str, optional
+        The S3 ETag of that report, see load_s3_index_file.
+    """
+    reinsw_df, reinsw_history, reinsw_index = prepared
+    for merging_on_list, drop_duplicates in tier_key_tables():
+        reinsw_index.key_table(merging_on_list, drop_duplicates)
+
+    sections = {'frame': _frame_bytes(reinsw_df, reinsw_history)}
+
+    def add_array(name, array):
+        sections[name] = np.ascontiguousarray(array)
+        return {'section': name, 'dtype': sections[name].dtype.str}
+
+    encoders = {}
+    for column, encoder in reinsw_index.column_encoders.items():
+        encoders[column] = {'codes': add_array(f"{column}.codes", encoder.codes),
+                            'null_code': encoder.null_code,
+                            'uniques': None}
+        # Categorical columns take their uniques from the dataframe
+        if not isinstance(reinsw_df[column].dtype, pd.CategoricalDtype):
+            dtype = encoder.uniques.dtype
+            numpy_dtype = np.dtype(getattr(dtype, 'numpy_dtype', dtype))
+            if numpy_dtype.kind not in 'iuf':
+                raise ValueError(f"Key column {column} is neither "
+                                 f"categorical nor numeric")
+            encoders[column]['uniques'] = add_array(
+                f"{column}.uniques", encoder.uniques.to_numpy(numpy_dtype))
+            encoders[column]['uniques_dtype'] = str(dtype)
+
+    key_tables = []
+    for position, ((columns, drop_duplicates), key_table) in enumerate(
+            reinsw_index.key_tables.items()):
+        name = f"key_table_{position}"
+        key_tables.append({
+            'columns': list(columns),
+            'drop_duplicates': drop_duplicates,
+            'rows': add_array(f"{name}.rows", key_table.rows),
+            'order': add_array(f"{name}.order", key_table.order),
+            'starts': add_array(f"{name}.starts", key_table.starts),
+            'counts': add_array(f"{name}.counts", key_table.counts),
+            'unique_keys': add_array(f"{name}.unique_keys",
+                                     key_table.unique_keys),
+            'compactions': {
+                str(column_position): add_array(
+                    f"{name}.compactions.{column_position}", index.to_numpy())
+                for column_position, index in key_table.compactions.items()},
+        })
+
+    # Section offsets are relative to the end of the header
+    offsets = {}
+    offset = 0
+    for name, section in sections.items():
+        offsets[name] = [offset, memoryview(section).nbytes]
+        offset = _aligned(offset + offsets[name][1])
+
+    header = json.dumps({
+        'version': VERSION,
+        'source_hash': source_hash,
+        'source_etag': _etag(source_etag),
+        'rows': len(reinsw_df),
+        'sections': offsets,
+        'encoders': encoders,
+        'key_tables': key_tables,
+    }).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for name, section in sections.items():
+            file.seek(data_start + offsets[name][0])
+            file.write(memoryview(section).cast('B'))
+    os.replace(temporary_path, path)
+
+
+def _read_header(path):
+    """
+    Returns the header of an index file and where its sections start, or
+    (None, None) when it is not a current index file.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return None, None
+        header_length = int.from_bytes(file.read(8), 'little')
+        header = json.loads(file.read(header_length))
+    if header.get('version') != VERSION:
+        return None, None
+    return header, _aligned(len(MAGIC) + 8 + header_length)
+
+
+def read_header(path):
+    """
+    Returns the header of an index file, or None when it is not one.
+    """
+    return _read_header(path)[0]
+
+
+def read_index_file(path):
+    """
+    Memory-maps an index file written by write_index_file.
+
+    The index arrays are views on the mapped pages, not copies, so
+    processes forked afterwards, e.g. by parallel_merge, share them; the
+    sorted packed keys are probed in place with numpy.searchsorted. The
+    dataframe is converted from Arrow with to_pandas: its Arrow-backed
+    string columns stay views too, but the categorical and numeric
+    columns are copied into memory, as are string columns on pandas
+    versions that convert them to object dtype.
+
+    Parameters
+    ----------
+    path : str
+        The index file.
+
+    Returns
+    -------
+    reinsw_cache.PreparedReinsw
+        The prepared report and its index, with the key tables of every
+        merge tier.
+    """
+    import pyarrow as pa
+
+    header, data_start = _read_header(path)
+    if header is None:
+        raise ValueError(f"Not a version {VERSION} REINSW index file: {path}")
+
+    mapped = pa.memory_map(path, 'r').read_buffer()
+
+    def section(name):
+        offset, length = header['sections'][name]
+        return mapped.slice(data_start + offset, length)
+
+    def array(entry):
+        return np.frombuffer(section(entry['section']),
+                             dtype=np.dtype(entry['dtype']))
+
+    frame_df = pa.ipc.open_file(section('frame')).read_all().to_pandas()
+    reinsw_history = history.ReinswHistory.from_categorical(
+        frame_df.pop('history'))
+
+    column_encoders = {}
+    for column, entry in header['encoders'].items():
+        if entry['uniques'] is None:
+            uniques = frame_df[column].cat.categories
+        else:
+            uniques = pd.Index(pd.array(array(entry['uniques']),
+                                        dtype=entry['uniques_dtype']))
+        column_encoders[column] = ColumnEncoder(
+            uniques, array(entry['codes']), entry['null_code'])
+
+    key_tables = {}
+    for entry in header['key_tables']:
+        key_tables[(tuple(entry['columns']), entry['drop_duplicates'])] = \
+            KeyTable(array(entry['rows']),
+                     {int(column_position): pd.Index(array(compaction))
+                      for column_position, compaction
+                      in entry['compactions'].items()},
+                     array(entry['unique_keys']),
+                     array(entry['order']),
+                     array(entry['starts']),
+                     array(entry['counts']))
+
+    return reinsw_cache.PreparedReinsw(
+        frame_df, reinsw_history,
+        ReinswIndex.from_tables(frame_df, column_encoders, key_tables))
+
+
+def build_index_file(source_path, path, source_etag=None):
+    """
+    Parses and prepares a REINSW report CSV file and compiles it into an
+    index file, recording the S3 ETag of the report when given.
+    """
+    prepared = reinsw_cache.prepare_reinsw(schemas.read_input_csv(
+        source_path, schemas.SCHEMAS['reinsw']))
+    write_index_file(prepared, path, reinsw_cache.content_hash(source_path),
+                     source_etag)
+
+
+def load_index_file(path, source_path=None):
+    """
+    Memory-maps an index file, first building it from `source_path` when
+    it is missing or was built from another version of the report.
+
+    Parameters
+    ----------
+    path : str
+        The index file.
+    source_path : str, optional
+        The REINSW report CSV file it is built from. Without it, the index
+        file is used as it is.
+
+    Returns
+    -------
+    reinsw_cache.PreparedReinsw
+        The prepared report and its index.
+    """
+    if source_path is not None:
+        header = read_header(path) if os.path.exists(path) else None
+        if header is None or header['source_hash'] != reinsw_cache.content_hash(
+                source_path):
+            build_index_file(source_path, path)
+
+    return read_index_file(path)
+
+
+def load_s3_index_file(path, s3_client, bucket, key, memory_budget):
+    """
+    Memory-maps an index file built from the REINSW report stored at an S3
+    key, while the report is unchanged.
+
+    A HEAD request compares the ETag of the report with the one recorded
+    in the index file. When they differ, or the file is missing or was
+    built without one, the report itself is loaded with
+    reinsw_cache.load_s3_reinsw instead.
+
+    Parameters
+    ----------
+    path : str
+        The index file.
+    s3_client : boto3 S3 client object
+        The S3 client, or a s3_upload.FilesystemS3Client.
+    bucket : str
+        The bucket of the report.
+    key : str
+        The key of the report.
+    memory_budget : int
+        The most bytes reinsw_cache keeps, e.g.
+        config.REINSW_CACHE_MEMORY_BYTES.
+
+    Returns
+    -------
+    reinsw_cache.PreparedReinsw
+        The prepared report and its index.
+    """
+    header = read_header(path) if os.path.exists(path) else None
+    etag = _etag(s3_client.head_object(Bucket=bucket, Key=key)['ETag'])
+    if header is not None and header.get('source_etag') == etag:
+        return read_index_file(path)
+    return reinsw_cache.load_s3_reinsw(s3_client, bucket, key, memory_budget)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compile the REINSW report into a memory-mapped index '
+                    'file.')
+    parser.add_argument('source', help='the REINSW report CSV file')
+    parser.add_argument('index', help='the index file to write')
+    parser.add_argument('--source-etag',
+                        help='the S3 ETag of the report, which the Lambda '
+                             'handler checks before using the index file')
+    args = parser.parse_args()
+
+    build_index_file(args.source, args.index, args.source_etag)
+
+
+if __name__ == '__main__':
+    main()
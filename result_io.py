@@ -0,0 +1,111 @@
+import io
+import os
+
+# File extension of every supported result format
+FORMAT_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+
+def with_format_extension(path, output_format):
+    """
+    Replaces the extension of a result path (e.g. the '.csv' of the
+    configured paths) with the one of the output format.
+
+    Examples
+    --------
+    >>> with_format_extension('result_cer_reinsw/1_match.csv', 'parquet')
+    'result_cer_reinsw/1_match.parquet'
+    """
+    root, _ = os.path.splitext(path)
+    return f"{root}{FORMAT_EXTENSIONS[output_format]}"
+
+
+def format_of(path):
+    """
+    Returns the result format of a path from its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for output_format, format_extension in FORMAT_EXTENSIONS.items():
+        if extension == format_extension:
+            return output_format
+    raise ValueError(f"Unsupported result file extension: {path}")
+
+
+def write_result(result_df, path_or_buffer, output_format='csv'):
+    """
+    Writes a result dataframe as CSV, zstd-compressed Parquet or
+    zstd-compressed Arrow IPC (Feather v2).
+
+    Parquet and Arrow keep the column types, e.g. nullable integers and
+    categoricals, which CSV loses.
+
+    Parameters
+    ----------
+    result_df : pandas.DataFrame
+        The result dataframe to write.
+    path_or_buffer : str or file-like object
+        Where to write the result.
+    output_format : str
+        One of 'csv', 'parquet' or 'arrow'.
+    """
+    if output_format == 'csv':
+        result_df.to_csv(path_or_buffer, index=False)
+    elif output_format == 'parquet':
+        result_df.to_parquet(path_or_buffer, index=False, compression='zstd')
+    elif output_format == 'arrow':
+        result_df.reset_index(drop=True).to_feather(
+            path_or_buffer, compression='zstd')
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def read_result(path_or_buffer, output_format=None):
+    """
+    Reads a result file written by write_result.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like object
+        The result file.
+    output_format : str, optional
+        One of 'csv', 'parquet' or 'arrow'; taken from the extension of
+        a path when not given.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The result dataframe.
+    """
+    # pandas is imported on first read, so the Lambda handlers can import
+    # this module for its key helpers without it
+    import pandas as pd
+
+    if output_format is None:
+        output_format = format_of(path_or_buffer)
+
+    if output_format == 'csv':
+        return pd.read_csv(path_or_buffer)
+    if output_format == 'parquet':
+        return pd.read_parquet(path_or_buffer)
+    if output_format == 'arrow':
+        return pd.read_feather(path_or_buffer)
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def result_to_bytes(result_df, output_format='csv'):
+    """
+    Serializes a result dataframe into an in-memory file, e.g. for an
+    S3 upload.
+
+    Returns
+    -------
+    io.BytesIO
+        The serialized result, positioned at its start.
+    """
+    buffer = io.BytesIO()
+    write_result(result_df, buffer, output_format)
+    buffer.seek(0)
+    return buffer
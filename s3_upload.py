@@ -0,0 +1,301 @@
+import io
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import result_io
+
+# S3 rejects multipart parts smaller than 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def get_s3_client(local_directory=None):
+    """
+    Returns an S3 client, or a FilesystemS3Client rooted at
+    `local_directory` when one is given.
+    """
+    if local_directory:
+        return FilesystemS3Client(local_directory)
+
+    import boto3
+    return boto3.client('s3')
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """
+    A write-only binary stream that uploads to an S3 object as it is written.
+
+    Written bytes are buffered up to `part_size` and sent as one part of a
+    multipart upload, so at most one part is held in memory. An object
+    smaller than one part is sent with a single put_object instead. Leaving
+    the `with` block on an exception aborts the upload, so no partial object
+    is left behind.
+
+    Parameters
+    ----------
+    client : botocore client
+        An S3 client, or a stand-in with the same methods such as
+        FilesystemS3Client.
+    bucket : str
+        The bucket to upload to.
+    key : str
+        The key of the uploaded object.
+    part_size : int
+        The size of every part but the last one, at least MIN_PART_SIZE.
+    """
+
+    def __init__(self, client, bucket, key, part_size=MIN_PART_SIZE):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._parts = []
+        self._aborted = False
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self._buffer += data
+        self._position += len(data)
+
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+        return len(data)
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key)['UploadId']
+
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body)
+        self._parts.append({'ETag': response['ETag'],
+                            'PartNumber': part_number})
+
+    def close(self):
+        """
+        Uploads the buffered bytes and completes the upload.
+        """
+        if self.closed:
+            return
+
+        try:
+            if self._aborted:
+                pass
+            elif self._upload_id is None:
+                self.client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': self._parts})
+            self._buffer = bytearray()
+        finally:
+            super().close()
+
+    def abort(self):
+        """
+        Aborts the upload, dropping the parts already sent.
+        """
+        self._aborted = True
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self.close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def upload_result(client, bucket, key, result_df, output_format='csv',
+                  part_size=MIN_PART_SIZE):
+    """
+    Serializes a result dataframe straight into a multipart upload.
+
+    Parameters
+    ----------
+    client : botocore client
+        An S3 client or a stand-in.
+    bucket : str
+        The bucket to upload to.
+    key : str
+        The key of the uploaded object.
+    result_df : pandas.DataFrame
+        The result dataframe to upload.
+    output_format : str
+        One of 'csv', 'parquet' or 'arrow'.
+    part_size : int
+        The size of the uploaded parts, which bounds the memory used.
+    """
+    with MultipartUploadWriter(client, bucket, key, part_size) as stream:
+        result_io.write_result(result_df, stream, output_format)
+
+
+def upload_results(client, bucket, results, output_format='csv',
+                   max_workers=None, part_size=MIN_PART_SIZE):
+    """
+    Uploads result dataframes concurrently, each one streamed into its own
+    multipart upload.
+
+    Peak memory for the uploads is about `max_workers` parts, whatever the
+    size of the results.
+
+    Parameters
+    ----------
+    client : botocore client
+        An S3 client or a stand-in; botocore clients are thread-safe.
+    bucket : str
+        The bucket to upload to.
+    results : dict
+        Object keys to result dataframes.
+    output_format : str
+        One of 'csv', 'parquet' or 'arrow'.
+    max_workers : int, optional
+        The number of uploads running at the same time.
+    part_size : int
+        The size of the uploaded parts.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(upload_result, client, bucket, key, result_df,
+                            output_format, part_size)
+            for key, result_df in results.items()
+        ]
+        # Raise the first failed upload, if any
+        for future in futures:
+            future.result()
+
+
+def upload_files(client, bucket, files, max_workers=None):
+    """
+    Uploads local files concurrently.
+
+    Parameters
+    ----------
+    client : botocore client
+        An S3 client or a stand-in.
+    bucket : str
+        The bucket to upload to.
+    files : dict
+        Object keys to local file paths.
+    max_workers : int, optional
+        The number of uploads running at the same time.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(client.upload_file, file_path, bucket, key)
+            for key, file_path in files.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+class FilesystemS3Client:
+    """
+    A local stand-in for the S3 client methods used by the Lambda handlers,
+    storing every bucket as a directory.
+
+    Lets the handlers run, and be tested, without AWS.
+
+    Parameters
+    ----------
+    root_directory : str
+        The directory holding the bucket directories.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> import pandas as pd
+    >>> root_directory = tempfile.TemporaryDirectory()
+    >>> client = FilesystemS3Client(root_directory.name)
+
+    A result smaller than one part is sent with a single put_object:
+
+    >>> result_df = pd.DataFrame({'licensee': ['Lac Tran'],
+    ...                           'imis_id': [83789]})
+    >>> upload_result(client, 'reinsw1', 'result.csv', result_df)
+    >>> result_io.read_result(
+    ...     client.get_object(Bucket='reinsw1', Key='result.csv')['Body'], 'csv')
+       licensee  imis_id
+    0  Lac Tran    83789
+
+    A larger object is sent as a multipart upload, here of two parts:
+
+    >>> data = bytes(range(256)) * (MIN_PART_SIZE * 3 // 2 // 256)
+    >>> with MultipartUploadWriter(client, 'reinsw1', 'data.bin') as stream:
+    ...     _ = stream.write(data)
+    >>> len(stream._parts)
+    2
+    >>> client.get_object(Bucket='reinsw1', Key='data.bin')['Body'].read() == data
+    True
+    >>> root_directory.cleanup()
+    """
+
+    def __init__(self, root_directory):
+        self.root_directory = root_directory
+        self._uploads = {}
+        self._upload_ids = itertools.count()
+
+    def _path(self, bucket, key):
+        path = os.path.join(self.root_directory, bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _etag(self, path):
+        # Stands in for the S3 ETag: changes whenever the file is rewritten
+        stat = os.stat(path)
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def head_object(self, Bucket, Key):
+        path = os.path.join(self.root_directory, Bucket, Key)
+        return {'ETag': self._etag(path),
+                'ContentLength': os.path.getsize(path)}
+
+    def get_object(self, Bucket, Key):
+        path = os.path.join(self.root_directory, Bucket, Key)
+        with open(path, 'rb') as file:
+            return {'ETag': self._etag(path), 'Body': io.BytesIO(file.read())}
+
+    def put_object(self, Bucket, Key, Body):
+        with open(self._path(Bucket, Key), 'wb') as file:
+            file.write(Body)
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, 'rb') as file:
+            self.put_object(Bucket, Key, file.read())
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"{Bucket}/{Key}/{next(self._upload_ids)}"
+        self._uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._uploads[UploadId][PartNumber] = Body
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId,
+                                  MultipartUpload):
+        parts = self._uploads.pop(UploadId)
+        self.put_object(Bucket, Key, b''.join(
+            parts[part['PartNumber']] for part in MultipartUpload['Parts']))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._uploads.pop(UploadId, None)
@@ -0,0 +1,197 @@
+import pandas as pd
+
+import filter_functions
+
+# Columns of the Fair Trading certificate and individual licence registers
+FAIR_TRADING_SCHEMA = {
+    'Licence Number': 'int',
+    'Issue Date': 'date',
+    'Expiry Date': 'date',
+    'Licensee': 'string',
+    'Address Type': 'string',
+    'Address': 'string',
+    'Birth Year': 'int',
+    'ACN': 'string',
+    'ABN': 'string',
+    'Classes': 'string',
+}
+
+# Columns of the REINSW report, as listed in config.CSV_HEADER plus the
+# company and iMIS id of every record
+REINSW_SCHEMA = {
+    'company': 'string',
+    'licensee': 'string',
+    'imis_id': 'int',
+    'state': 'string',
+    'suburb': 'string',
+    'license_is_valid': 'boolean',
+    'license_date': 'datetime',
+    'license_number': 'int',
+    'first_name': 'string',
+    'last_name': 'string',
+    'post_code': 'int',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+    'licence_status': 'string',
+    'licence_type': 'string',
+    'licence_id': 'string',
+    'classes': 'string',
+    'class_names': 'string',
+    'history': 'string',
+    'expiring': 'string',
+}
+
+# Schema of every input file
+SCHEMAS = {
+    'certificate': FAIR_TRADING_SCHEMA,
+    'individual': FAIR_TRADING_SCHEMA,
+    'reinsw': REINSW_SCHEMA,
+}
+
+# Date formats of the Fair Trading registers, after ISO 8601
+DATE_FORMATS = ['%d-%b-%Y', '%d/%m/%Y']
+
+
+def _arrow_types():
+    import pyarrow as pa
+
+    # Integer columns are parsed as strings, as the REINSW report writes
+    # them like '2138.0' next to values like 'V6E0C3', and cast to nullable
+    # integers afterwards
+    return {
+        'int': pa.string(),
+        'string': pa.string(),
+        'boolean': pa.bool_(),
+        'date': pa.timestamp('s'),
+        'datetime': pa.timestamp('us'),
+    }
+
+
+def _pandas_dtype(arrow_type):
+    import pyarrow as pa
+
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    if pa.types.is_integer(arrow_type):
+        return pd.Int64Dtype()
+    return None
+
+
+def read_input_csv(path_or_buffer, schema, columns=None):
+    """
+    Reads an input CSV file with the pyarrow CSV reader, with explicit
+    column types.
+
+    The file is parsed on several threads, only the selected columns are
+    kept, and they come back as Arrow-backed strings, nullable integers,
+    nullable booleans and datetimes instead of inferred object and float
+    columns. A selected column missing from the file is read as nulls.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like object
+        The CSV file, e.g. a path or an S3 streaming body.
+    schema : dict
+        Column names to types ('int', 'string', 'boolean', 'date' or
+        'datetime'), e.g. one of SCHEMAS.
+    columns : list, optional
+        The columns to load; defaults to every column of the schema.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The typed dataframe, with the columns in the order of `columns`.
+    """
+    from pyarrow import csv
+
+    columns = list(schema) if columns is None else list(columns)
+
+    table = csv.read_csv(
+        path_or_buffer,
+        read_options=csv.ReadOptions(use_threads=True),
+        convert_options=_convert_options(schema, columns))
+
+    return _to_dataframe(table, schema, columns)
+
+
+def read_input_csv_chunks(path_or_buffer, schema, chunksize, columns=None):
+    """
+    Reads an input CSV file chunk by chunk with the pyarrow streaming CSV
+    reader, typed like read_input_csv.
+
+    Only the block being parsed and one chunk are held in memory at a
+    time, e.g. to stream the REINSW report through the merge tiers.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like object
+        The CSV file, e.g. a path or an S3 streaming body.
+    schema : dict
+        Column names to types, e.g. one of SCHEMAS.
+    chunksize : int
+        The rows of every chunk but the last one.
+    columns : list, optional
+        The columns to load; defaults to every column of the schema.
+
+    Yields
+    ------
+    pandas.DataFrame
+        The typed chunks, with the columns in the order of `columns`.
+    """
+    import pyarrow as pa
+    from pyarrow import csv
+
+    columns = list(schema) if columns is None else list(columns)
+
+    reader = csv.open_csv(
+        path_or_buffer,
+        convert_options=_convert_options(schema, columns))
+
+    batches = []
+    rows = 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows < chunksize:
+            continue
+
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        while len(table) >= chunksize:
+            yield _to_dataframe(table.slice(0, chunksize), schema, columns)
+            table = table.slice(chunksize)
+        batches = table.to_batches()
+        rows = len(table)
+
+    if rows:
+        yield _to_dataframe(
+            pa.Table.from_batches(batches, schema=reader.schema),
+            schema, columns)
+
+
+def _convert_options(schema, columns):
+    from pyarrow import csv
+
+    arrow_types = _arrow_types()
+    return csv.ConvertOptions(
+        column_types={column: arrow_types[schema[column]]
+                      for column in columns},
+        include_columns=columns,
+        include_missing_columns=True,
+        strings_can_be_null=True,
+        timestamp_parsers=[csv.ISO8601] + DATE_FORMATS)
+
+
+def _to_dataframe(table, schema, columns):
+    """
+    Converts a table read with _convert_options into the typed dataframe.
+    """
+    dataframe = table.to_pandas(types_mapper=_pandas_dtype)
+
+    for column in columns:
+        if schema[column] == 'int':
+            dataframe[column] = filter_functions.to_nullable_int(
+                dataframe[column])
+
+    return dataframe
@@ -0,0 +1,182 @@
+import os
+
+import config as _config
+import filter_functions
+import instrumentation
+import normalization
+
+# Options of the whole-report pipeline the streaming mode does not run
+UNSUPPORTED_OPTIONS = [
+    'CASCADE_MATCHING', 'FUSED_PIPELINE', 'MERGE_PROCESSES',
+    'INCREMENTAL_STATE_DIRECTORY', 'REINSW_INDEX_PATH',
+    'REINSW_CACHE_MEMORY_BYTES', 'REINSW_CACHE_DIRECTORY',
+]
+
+
+def check_options(mode, option_names):
+    """
+    Raises ValueError when any of the given config options is set, so a
+    mode that does not run them fails instead of silently leaving them out.
+
+    Parameters
+    ----------
+    mode : str
+        The mode being run, for the error message.
+    option_names : list
+        Names of the config options the mode does not support, e.g.
+        UNSUPPORTED_OPTIONS.
+    """
+    set_options = [name for name in option_names if getattr(_config, name)]
+    if set_options:
+        raise ValueError(
+            f"{mode} does not support {', '.join(set_options)}; set "
+            f"{'it' if len(set_options) == 1 else 'them'} to 0, None or "
+            f"False")
+
+
+def align_to_columns(result_df, columns, merge_columns_dict):
+    """
+    Lays a chunk's tier result out with the columns already written
+    for that tier.
+
+    Two results of the same tier can disagree on whether e.g. 'post_code'
+    or 'post_code_fairtrade'/'post_code_reinsw' is present, e.g. with a
+    result stored by a run from before merge_columns_and_drop coalesced
+    every pair. The pair is coalesced or copied to match `columns`.
+
+    Parameters
+    ----------
+    result_df : pandas.DataFrame
+        The tier result of one REINSW chunk.
+    columns : list
+        The columns already written for the tier.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The tier result with exactly `columns`.
+    """
+    result_df = result_df.copy()
+
+    for new_column, columns_to_merge in merge_columns_dict.items():
+        present_columns = [
+            col for col in columns_to_merge if col in result_df.columns]
+
+        if new_column in columns and new_column not in result_df.columns \
+                and present_columns:
+            result_df[new_column] = filter_functions.coalesce_columns(
+                [result_df[column] for column in present_columns])
+
+        elif new_column in result_df.columns:
+            for column in columns_to_merge:
+                if column in columns and column not in result_df.columns:
+                    result_df[column] = result_df[new_column]
+
+    return result_df.reindex(columns=columns)
+
+
+def stream_merge_to_csv(sides, reinsw_chunks,
+                        merge_columns_dict=filter_functions.merge_columns_dict):
+    """
+    Merges Fairtrading dataframes with the REINSW report one chunk at a time
+    and appends every tier result to its CSV file as it goes.
+
+    Only one REINSW chunk and its tier results are held in memory at once.
+    Tiers whose merge function keeps a single REINSW row per key (see
+    filter_functions.deduplicating_merge_funcs) remember which Fairtrading
+    rows they have already written, so a key repeated in a later chunk is
+    not written twice.
+
+    Parameters
+    ----------
+    sides : list
+        (fairtrade_df, merge_mappings, output_directory) tuples, e.g. for
+        the certificate and individual dataframes.
+    reinsw_chunks : iterable
+        REINSW dataframe chunks, e.g. from schemas.read_input_csv_chunks.
+    merge_columns_dict : dict
+        A dictionary containing the merged column names as keys and the list of columns to merge as values.
+
+    Returns
+    -------
+    dict
+        A dictionary of the written file paths to their record counts.
+
+    Raises
+    ------
+    ValueError
+        When config.OUTPUT_FORMAT is not 'csv', or
+        config.JOIN_DUPLICATE_POLICY is not 'keep'.
+    """
+    # Appending needs a row-based format; Parquet and Arrow files are only
+    # written whole
+    if _config.OUTPUT_FORMAT != 'csv':
+        raise ValueError(
+            f"The output format {_config.OUTPUT_FORMAT!r} cannot be appended "
+            f"to chunk by chunk; use 'csv' with a REINSW chunk size")
+
+    # A key's REINSW rows can span chunks, so capping or dropping them chunk
+    # by chunk would not match the in-memory merges
+    if _config.JOIN_DUPLICATE_POLICY != 'keep':
+        raise ValueError(
+            f"The join duplicate policy {_config.JOIN_DUPLICATE_POLICY!r} "
+            f"needs the whole REINSW report; use 'keep' with a REINSW "
+            f"chunk size")
+
+    sides = [(fairtrade_df.assign(_fairtrade_row=range(len(fairtrade_df))),
+              merge_mappings,
+              output_directory)
+             for fairtrade_df, merge_mappings, output_directory in sides]
+
+    written_columns = {}
+    written_fairtrade_rows = {}
+    record_counts = {}
+
+    for chunk_idx, chunk_df in enumerate(reinsw_chunks):
+        chunk_df = filter_functions.keep_reinsw_text(chunk_df)
+        for column in filter_functions.numeric_join_keys:
+            if column in chunk_df.columns:
+                chunk_df[column] = filter_functions.to_nullable_int(
+                    chunk_df[column])
+        normalization.normalize_columns(
+            chunk_df, filter_functions.string_join_keys)
+
+        for fairtrade_df, merge_mappings, output_directory in sides:
+            for idx, (result_name, merge_func) in enumerate(
+                    merge_mappings.items(), 1):
+                file_path = os.path.join(
+                    output_directory, f"{idx}_{result_name}.csv")
+
+                with instrumentation.stage(
+                        'merge', input_rows=len(fairtrade_df),
+                        tier=result_name, chunk=chunk_idx) as stage:
+                    result_df = merge_func(fairtrade_df.copy(), chunk_df)
+
+                    if merge_func in filter_functions.deduplicating_merge_funcs:
+                        written_rows = written_fairtrade_rows.setdefault(
+                            file_path, set())
+                        result_df = result_df[
+                            ~result_df['_fairtrade_row'].isin(written_rows)]
+                        written_rows.update(result_df['_fairtrade_row'])
+
+                    result_df = filter_functions.merge_columns_and_drop(
+                        result_df.drop(columns='_fairtrade_row'),
+                        merge_columns_dict)
+                    stage.output_rows = len(result_df)
+
+                if file_path not in written_columns:
+                    written_columns[file_path] = list(result_df.columns)
+                    result_df.to_csv(file_path, index=False)
+                else:
+                    result_df = align_to_columns(
+                        result_df, written_columns[file_path],
+                        merge_columns_dict)
+                    result_df.to_csv(file_path, mode='a', header=False,
+                                     index=False)
+
+                record_counts[file_path] = record_counts.get(
+                    file_path, 0) + len(result_df)
+
+    return record_counts